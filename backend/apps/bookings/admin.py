@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Booking, PartyBooking, Waiver, Transaction, BookingBlock, SessionBookingHistory, PartyBookingHistory
+from .models import Customer, Booking, PartyBooking, Waiver, Transaction, BookingBlock, SessionBookingHistory, PartyBookingHistory, DailyBookingStats, SlotCapacity, SlotHold
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -188,3 +188,22 @@ class PartyBookingHistoryAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(DailyBookingStats)
+class DailyBookingStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'kind', 'status', 'bookings', 'revenue', 'pending_waivers', 'created', 'updated_at']
+    list_filter = ['kind', 'status', 'date']
+    ordering = ['-date', 'kind', 'status']
+    readonly_fields = ['date', 'kind', 'status', 'bookings', 'revenue', 'pending_waivers', 'created', 'updated_at']
+
+@admin.register(SlotCapacity)
+class SlotCapacityAdmin(admin.ModelAdmin):
+    list_display = ['date', 'time', 'kind', 'taken', 'capacity', 'updated_at']
+    list_filter = ['kind', 'date']
+    ordering = ['-date', 'time']
+    readonly_fields = ['taken', 'updated_at']
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ['token', 'slot', 'quantity', 'expires_at', 'created_at']
+    list_filter = ['expires_at']
+    readonly_fields = ['token', 'slot', 'quantity', 'expires_at', 'created_at']
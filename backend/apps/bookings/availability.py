@@ -0,0 +1,162 @@
+"""
+Per-slot availability for session bookings.
+
+Slots run from SessionBookingConfig.opening_time to closing_time in steps
+of duration_minutes. Occupancy for the whole date range comes from one
+grouped query over Booking (jumpers = adults + kids, spectators counted
+separately); a booking longer than one slot occupies every slot it
+overlaps, and places held by an unfinished checkout (SlotHold) are not
+free. BookingBlock windows close the slots they intersect, and recurring
+blocks repeat every week on the same weekday and hours.
+"""
+from collections import defaultdict
+from datetime import date as date_cls, datetime, timedelta
+
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Booking, BookingBlock, SlotHold
+
+MAX_RANGE_DAYS = 62
+
+# Bookings that no longer hold their places
+CANCELLED = Q(booking_status='CANCELLED') | Q(status='CANCELLED')
+
+
+def slot_times(config):
+    """Start times of every slot in a day for the given SessionBookingConfig."""
+    step = timedelta(minutes=max(config.duration_minutes or 60, 1))
+    day = date_cls.today()
+    current = datetime.combine(day, config.opening_time)
+    closing = datetime.combine(day, config.closing_time)
+    times = []
+    while current + step <= closing:
+        times.append(current.time())
+        current += step
+    return times
+
+
+def covered_slots(day, start, duration, slots, slot_minutes):
+    """Slots from `slots` that a booking at (day, start) lasting `duration` minutes overlaps."""
+    booking_start = datetime.combine(day, start)
+    booking_end = booking_start + timedelta(minutes=duration)
+    slot_length = timedelta(minutes=slot_minutes)
+    return [
+        slot for slot in slots
+        if datetime.combine(day, slot) < booking_end
+        and booking_start < datetime.combine(day, slot) + slot_length
+    ]
+
+
+def occupancy(start_date, end_date, slots, slot_minutes):
+    """
+    Map (date, slot time) -> {'jumpers', 'spectators'} for every slot with
+    bookings between start_date and end_date inclusive.
+    """
+    rows = (
+        Booking.objects.filter(date__range=(start_date, end_date))
+        .exclude(CANCELLED)
+        .order_by()
+        .values('date', 'time', 'duration')
+        .annotate(jumpers=Sum(F('adults') + F('kids')), spectators=Sum('spectators'))
+    )
+    totals = defaultdict(lambda: {'jumpers': 0, 'spectators': 0})
+    for row in rows:
+        for slot in covered_slots(row['date'], row['time'], row['duration'] or slot_minutes, slots, slot_minutes):
+            totals[(row['date'], slot)]['jumpers'] += row['jumpers'] or 0
+            totals[(row['date'], slot)]['spectators'] += row['spectators'] or 0
+    return totals
+
+
+def held(start_date, end_date):
+    """Map (date, slot time) -> places held by live checkout holds."""
+    rows = (
+        SlotHold.objects.filter(
+            slot__kind='SESSION', slot__date__range=(start_date, end_date), expires_at__gt=timezone.now()
+        )
+        .order_by()
+        .values('slot__date', 'slot__time')
+        .annotate(quantity=Sum('quantity'))
+    )
+    return {(row['slot__date'], row['slot__time']): row['quantity'] for row in rows}
+
+
+def _local(value):
+    return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+
+
+def blocked_windows(start_date, end_date):
+    """
+    Naive local (start, end) datetimes of every block touching the range,
+    with recurring blocks expanded week by week.
+    """
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    windows = []
+    for block in BookingBlock.objects.filter(
+        Q(recurring=True) | Q(start_date__lt=timezone.make_aware(range_end),
+                              end_date__gt=timezone.make_aware(range_start))
+    ):
+        block_start, block_end = _local(block.start_date), _local(block.end_date)
+        if not block.recurring:
+            windows.append((block_start, block_end))
+            continue
+        if block_start >= range_end:
+            continue
+        # Shift the weekly window into the requested range
+        weeks = max((range_start - block_end).days // 7, 0)
+        shift = timedelta(weeks=weeks)
+        while block_start + shift < range_end:
+            if block_end + shift > range_start:
+                windows.append((block_start + shift, block_end + shift))
+            shift += timedelta(weeks=1)
+    return windows
+
+
+def slot_availability(start_date, end_date, config=None, now=None):
+    """
+    Return {'capacity', 'duration_minutes', 'days': [...]} where each day
+    lists its slots with booked, spectators, remaining and available flags.
+    """
+    if config is None:
+        from apps.cms.models import SessionBookingConfig
+        config = SessionBookingConfig.get_config()
+    if end_date < start_date:
+        raise ValueError('end_date must not be before start_date')
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'Date range cannot exceed {MAX_RANGE_DAYS} days')
+
+    now = _local(now or timezone.now())
+    slot_minutes = config.duration_minutes or 60
+    slot_length = timedelta(minutes=slot_minutes)
+    slots = slot_times(config)
+    booked = occupancy(start_date, end_date, slots, slot_minutes)
+    holds = held(start_date, end_date)
+    blocks = blocked_windows(start_date, end_date)
+
+    days = []
+    day = start_date
+    while day <= end_date:
+        entries = []
+        for slot in slots:
+            slot_start = datetime.combine(day, slot)
+            slot_end = slot_start + slot_length
+            counts = booked.get((day, slot), {'jumpers': 0, 'spectators': 0})
+            remaining = max(config.slot_capacity - counts['jumpers'] - holds.get((day, slot), 0), 0)
+            blocked = any(start < slot_end and slot_start < end for start, end in blocks)
+            entries.append({
+                'time': slot.strftime('%H:%M'),
+                'booked': counts['jumpers'],
+                'spectators': counts['spectators'],
+                'remaining': 0 if blocked else remaining,
+                'blocked': blocked,
+                'available': not blocked and remaining > 0 and slot_start > now,
+            })
+        days.append({'date': day.isoformat(), 'slots': entries})
+        day += timedelta(days=1)
+
+    return {
+        'capacity': config.slot_capacity,
+        'duration_minutes': slot_minutes,
+        'days': days,
+    }
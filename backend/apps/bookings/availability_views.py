@@ -0,0 +1,76 @@
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from datetime import date, datetime, timedelta
+from .availability import slot_availability
+from . import reservations
+from .throttles import SlotHoldThrottle
+
+
+def _month_range(month):
+    first = datetime.strptime(month, '%Y-%m').date()
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def session_availability(request):
+    """
+    Remaining capacity for every session slot in a date range.
+    Accepts month=YYYY-MM, or start_date and end_date (YYYY-MM-DD).
+    Defaults to the current month.
+    """
+    month = request.GET.get('month')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+
+    try:
+        if start_date and end_date:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        else:
+            start, end = _month_range(month or date.today().strftime('%Y-%m'))
+        data = slot_availability(start, end)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([SlotHoldThrottle])
+def create_slot_hold(request):
+    """
+    Hold places on a slot while checkout completes. Pass the returned
+    token as `hold_token` when creating the booking.
+    Body: kind (SESSION/PARTY), date, time, adults, kids, duration.
+    At most MAX_HOLD_QUANTITY places per hold; holds per client are rate
+    limited (429 once the `slot_hold` rate is used up).
+    """
+    data = request.data
+    kind = str(data.get('kind', reservations.SESSION)).upper()
+    if kind not in (reservations.SESSION, reservations.PARTY):
+        return Response({'error': 'kind must be SESSION or PARTY'}, status=400)
+    if not data.get('date') or not data.get('time'):
+        return Response({'error': 'date and time are required'}, status=400)
+
+    try:
+        quantity = reservations.quantity_for(kind, data.get('adults'), data.get('kids'))
+        duration = int(data['duration']) if data.get('duration') else None
+        token, expires_at = reservations.hold(kind, data['date'], data['time'], quantity, duration=duration)
+    except reservations.SlotUnavailable as e:
+        return Response({'error': str(e)}, status=409)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({'token': str(token), 'expires_at': expires_at.isoformat()}, status=201)
+
+
+@api_view(['DELETE'])
+@permission_classes([AllowAny])
+def release_slot_hold(request, token):
+    """Give back the places of an abandoned checkout"""
+    reservations.release_hold(token)
+    return Response(status=204)
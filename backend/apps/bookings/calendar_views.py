@@ -1,109 +1,211 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+from datetime import date, datetime, timedelta
 from ..bookings.models import Booking, PartyBooking
 from ..bookings.permissions import IsStaffUser
+from ..core.caching import cache_is_shared
+
+# Whole past months are cached as tiles until a booking in them (or one of
+# their customers) changes. Invalidation only reaches other processes
+# through a shared cache; per-process tiles expire after a few minutes.
+TILE_TIMEOUT = 60 * 60 * 24 * 7
+LOCAL_TILE_TIMEOUT = 5 * 60
+PARTY_DURATION_MINUTES = 180  # Party bookings typically 3 hours
+
+SESSION_VALUES = [
+    'id', 'date', 'time', 'duration', 'name', 'email', 'phone', 'kids', 'adults',
+    'status', 'amount', 'arrived', 'customer__name', 'customer__email', 'customer__phone',
+]
+PARTY_VALUES = [
+    'id', 'date', 'time', 'name', 'email', 'phone', 'kids', 'adults', 'status', 'amount',
+    'arrived', 'package_name', 'birthday_child_name', 'birthday_child_age',
+]
+
+
+def tile_key(month_start):
+    return f"calendar:tile:{month_start.strftime('%Y-%m')}"
+
+
+def _tile_timeout():
+    return TILE_TIMEOUT if cache_is_shared() else LOCAL_TILE_TIMEOUT
+
+
+def invalidate_month_tiles(*days):
+    """
+    Drop the cached tiles for the months containing `days`, now and again
+    once the transaction commits, so a tile rebuilt from the old rows in
+    between does not survive.
+    """
+    keys = list({tile_key(day.replace(day=1)) for day in days if day})
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_customer_tiles(customer_ids):
+    """Drop the tiles of every month in which these customers have a session"""
+    customer_ids = [pk for pk in customer_ids if pk]
+    if customer_ids:
+        invalidate_month_tiles(*Booking.objects.filter(customer_id__in=customer_ids).dates('date', 'month'))
+
+
+def _session_event(row):
+    start_datetime = datetime.combine(row['date'], row['time'])
+    end_datetime = start_datetime + timedelta(minutes=row['duration'] or 120)
+    return {
+        'id': f"session-{row['id']}",
+        'title': f"Session #{row['id']}",
+        'start': start_datetime.isoformat(),
+        'end': end_datetime.isoformat(),
+        'type': 'session',
+        'bookingId': row['id'],
+        'customerName': row['customer__name'] or row['name'],
+        'customerEmail': row['customer__email'] or row['email'],
+        'customerPhone': row['customer__phone'] or row['phone'],
+        'participants': (row['kids'] or 0) + (row['adults'] or 0),
+        'kids': row['kids'] or 0,
+        'adults': row['adults'] or 0,
+        'status': row['status'].lower() if row['status'] else 'confirmed',
+        'amount': float(row['amount']) if row['amount'] else 0,
+        'arrived': row['arrived'],
+        'packageName': 'Session Booking',
+    }
+
+
+def _party_event(row):
+    start_datetime = datetime.combine(row['date'], row['time'])
+    end_datetime = start_datetime + timedelta(minutes=PARTY_DURATION_MINUTES)
+    return {
+        'id': f"party-{row['id']}",
+        'title': f"Party #{row['id']}",
+        'start': start_datetime.isoformat(),
+        'end': end_datetime.isoformat(),
+        'type': 'party',
+        'bookingId': row['id'],
+        'customerName': row['name'],
+        'customerEmail': row['email'],
+        'customerPhone': row['phone'],
+        'participants': (row['kids'] or 0) + (row['adults'] or 0),
+        'kids': row['kids'] or 0,
+        'adults': row['adults'] or 0,
+        'status': row['status'].lower() if row['status'] else 'pending',
+        'amount': float(row['amount']) if row['amount'] else 0,
+        'arrived': row['arrived'],
+        'packageName': row['package_name'],
+        'birthdayChildName': row['birthday_child_name'],
+        'birthdayChildAge': row['birthday_child_age'],
+    }
+
+
+def _totals(model, start, end):
+    """Booking count, revenue and participants for a range, computed in SQL"""
+    totals = model.objects.filter(date__range=(start, end)).aggregate(
+        bookings=Count('id'),
+        revenue=Coalesce(Sum('amount'), 0, output_field=model._meta.get_field('amount')),
+        participants=Coalesce(Sum(F('kids') + F('adults')), 0),
+    )
+    totals['revenue'] = float(totals['revenue'])
+    return totals
+
+
+def build_segment(start, end):
+    """Events and summary counters for the inclusive range start..end"""
+    sessions = Booking.objects.filter(date__range=(start, end)).order_by('date', 'time').values(*SESSION_VALUES)
+    parties = PartyBooking.objects.filter(date__range=(start, end)).order_by('date', 'time').values(*PARTY_VALUES)
+    return {
+        'sessions': [_session_event(row) for row in sessions],
+        'parties': [_party_event(row) for row in parties],
+        'session_totals': _totals(Booking, start, end),
+        'party_totals': _totals(PartyBooking, start, end),
+    }
+
+
+def _month_end(month_start):
+    return (month_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def get_segments(start, end, today=None):
+    """
+    Split start..end by month. Whole months that are already over come from
+    the tile cache; everything else is queried live.
+    """
+    today = today or date.today()
+    segments = []
+    month_start = start.replace(day=1)
+    while month_start <= end:
+        month_end = _month_end(month_start)
+        if month_start >= start and month_end <= end and month_end < today:
+            key = tile_key(month_start)
+            segment = cache.get(key)
+            if segment is None:
+                segment = build_segment(month_start, month_end)
+                cache.set(key, segment, _tile_timeout())
+        else:
+            segment = build_segment(max(start, month_start), min(end, month_end))
+        segments.append(segment)
+        month_start = month_end + timedelta(days=1)
+    return segments
+
+
+def _slim(event, fields):
+    return {key: value for key, value in event.items() if key in fields}
+
 
 @api_view(['GET'])
 @permission_classes([IsStaffUser])
 def calendar_bookings(request):
     """
     Get all bookings (session + party) for calendar display
-    Accepts start_date and end_date query parameters
+    Accepts start_date and end_date query parameters, and an optional
+    comma-separated fields= list to trim each event (id is always kept)
     """
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    
+
     # Default to current month if no dates provided
     if not start_date or not end_date:
         today = datetime.now()
         start_date = today.replace(day=1).strftime('%Y-%m-%d')
-        # Get last day of month
-        if today.month == 12:
-            end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-        end_date = end_date.strftime('%Y-%m-%d')
-    
-    events = []
-    
-    # Get session bookings
-    session_bookings = Booking.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    ).select_related('customer').order_by('date', 'time')
-    
-    for booking in session_bookings:
-        # Combine date and time for start datetime
-        start_datetime = datetime.combine(booking.date, booking.time)
-        # Add duration (default 2 hours if not specified)
-        duration_minutes = getattr(booking, 'duration', 120)
-        end_datetime = start_datetime + timedelta(minutes=duration_minutes)
-        
-        events.append({
-            'id': f'session-{booking.id}',
-            'title': f'Session #{booking.id}',
-            'start': start_datetime.isoformat(),
-            'end': end_datetime.isoformat(),
-            'type': 'session',
-            'bookingId': booking.id,
-            'customerName': booking.customer.name if booking.customer else booking.name,
-            'customerEmail': booking.customer.email if booking.customer else booking.email,
-            'customerPhone': booking.customer.phone if booking.customer else booking.phone,
-            'participants': (booking.kids or 0) + (booking.adults or 0),
-            'kids': booking.kids or 0,
-            'adults': booking.adults or 0,
-            'status': booking.status.lower() if hasattr(booking, 'status') else 'confirmed',
-            'amount': float(booking.amount) if booking.amount else 0,
-            'arrived': getattr(booking, 'arrived', False),
-            'packageName': booking.package_name if hasattr(booking, 'package_name') else 'Session Booking'
-        })
-    
-    # Get party bookings
-    party_bookings = PartyBooking.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    ).select_related('customer').order_by('date', 'time')
-    
-    for booking in party_bookings:
-        # Combine date and time for start datetime
-        start_datetime = datetime.combine(booking.date, booking.time)
-        # Party bookings typically 3 hours
-        duration_minutes = 180
-        end_datetime = start_datetime + timedelta(minutes=duration_minutes)
-        
-        events.append({
-            'id': f'party-{booking.id}',
-            'title': f'Party #{booking.id}',
-            'start': start_datetime.isoformat(),
-            'end': end_datetime.isoformat(),
-            'type': 'party',
-            'bookingId': booking.id,
-            'customerName': booking.name,
-            'customerEmail': booking.email,
-            'customerPhone': booking.phone,
-            'participants': (booking.kids or 0) + (booking.adults or 0),
-            'kids': booking.kids or 0,
-            'adults': booking.adults or 0,
-            'status': booking.status.lower() if booking.status else 'pending',
-            'amount': float(booking.amount) if booking.amount else 0,
-            'arrived': getattr(booking, 'arrived', False),
-            'packageName': booking.package_name,
-            'birthdayChildName': booking.birthday_child_name,
-            'birthdayChildAge': booking.birthday_child_age
-        })
-    
-    # Calculate summary
+        end_date = _month_end(today.date().replace(day=1)).strftime('%Y-%m-%d')
+
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    if end < start:
+        return Response({'error': 'end_date must not be before start_date'}, status=400)
+
+    segments = get_segments(start, end)
+    events = [event for segment in segments for event in segment['sessions']]
+    events += [event for segment in segments for event in segment['parties']]
+
+    fields = request.GET.get('fields')
+    if fields:
+        wanted = {field.strip() for field in fields.split(',')} | {'id'}
+        events = [_slim(event, wanted) for event in events]
+
+    # Calculate summary from the per-segment SQL totals
+    session_count = sum(segment['session_totals']['bookings'] for segment in segments)
+    party_count = sum(segment['party_totals']['bookings'] for segment in segments)
     summary = {
-        'totalBookings': len(events),
-        'sessionBookings': len([e for e in events if e['type'] == 'session']),
-        'partyBookings': len([e for e in events if e['type'] == 'party']),
-        'totalRevenue': sum(e['amount'] for e in events),
-        'totalParticipants': sum(e['participants'] for e in events)
+        'totalBookings': session_count + party_count,
+        'sessionBookings': session_count,
+        'partyBookings': party_count,
+        'totalRevenue': sum(
+            segment['session_totals']['revenue'] + segment['party_totals']['revenue'] for segment in segments
+        ),
+        'totalParticipants': sum(
+            segment['session_totals']['participants'] + segment['party_totals']['participants']
+            for segment in segments
+        ),
     }
-    
+
     return Response({
         'events': events,
         'summary': summary,
@@ -0,0 +1,168 @@
+"""
+Gate check-in by ticket scan.
+
+A ticket is a booking or party booking UUID (also when embedded in a QR
+code URL) or a session booking's `qr_code`. `check_in(scans)` handles any
+number of scans with a fixed number of queries: per booking table, one
+locking SELECT of the matching rows and one conditional UPDATE
+(`arrived = false` in the WHERE clause) that sets arrived / arrived_at for
+the rows that have not arrived yet. Scanning a ticket twice, or two gates
+scanning it at once, checks it in exactly once and reports the original
+arrival time.
+
+Offline devices queue scans and send them in a batch with the time of each
+scan, which becomes arrived_at (never later than now; a missing or
+unparseable time counts as now, so a bad clock never fails the batch or
+rejects a valid ticket). The UPDATE bypasses
+signals, so the occupancy counters are updated and the calendar tiles (which
+show arrival) invalidated here.
+"""
+import re
+import uuid as uuid_lib
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import occupancy
+from .calendar_views import invalidate_month_tiles
+from .models import Booking, PartyBooking
+from .stats import PARTY, SESSION
+
+CHECKED_IN = 'CHECKED_IN'
+ALREADY_ARRIVED = 'ALREADY_ARRIVED'
+CANCELLED = 'CANCELLED'
+NOT_FOUND = 'NOT_FOUND'
+
+MAX_BATCH = 500
+UUID_RE = re.compile(r'[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}', re.I)
+
+# kind -> (model, fields read, cancelled filter, headcount fields)
+TABLES = {
+    SESSION: (
+        Booking,
+        ['id', 'uuid', 'qr_code', 'name', 'date', 'time', 'adults', 'kids', 'spectators',
+         'arrived', 'arrived_at', 'status', 'booking_status'],
+        lambda row: CANCELLED in (row['status'], row['booking_status']),
+        ('adults', 'kids', 'spectators'),
+    ),
+    PARTY: (
+        PartyBooking,
+        ['id', 'uuid', 'name', 'date', 'time', 'adults', 'kids', 'arrived', 'arrived_at', 'status'],
+        lambda row: row['status'] == CANCELLED,
+        ('adults', 'kids'),
+    ),
+}
+
+
+def parse_ticket(ticket):
+    """(uuid or None, raw code) for a scanned string"""
+    code = str(ticket or '').strip()
+    match = UUID_RE.search(code)
+    return (uuid_lib.UUID(match.group(0)) if match else None), code
+
+
+def _scan_time(value, now):
+    try:
+        scanned = parse_datetime(value) if isinstance(value, str) else value
+    except ValueError:
+        # Well formed but impossible, e.g. month 13
+        return now
+    if not isinstance(scanned, datetime):
+        return now
+    if timezone.is_naive(scanned):
+        scanned = timezone.make_aware(scanned)
+    return min(scanned, now)
+
+
+def _result(ticket, status, kind=None, row=None, headcount_fields=()):
+    result = {'ticket': ticket, 'ok': status in (CHECKED_IN, ALREADY_ARRIVED), 'status': status}
+    if row is not None:
+        result.update({
+            'kind': kind,
+            'id': row['id'],
+            'name': row['name'],
+            'headcount': sum(row[field] or 0 for field in headcount_fields),
+            'arrived_at': row['arrived_at'],
+        })
+    return result
+
+
+def check_in(scans):
+    """
+    Check in a list of scans, each {'ticket': str, 'scanned_at': optional
+    ISO datetime}. Returns one lean result dict per scan, in order.
+    """
+    now = timezone.now()
+    parsed = [(scan.get('ticket'), *parse_ticket(scan.get('ticket')), _scan_time(scan.get('scanned_at'), now))
+              for scan in scans]
+    uuids = {ticket_uuid for _, ticket_uuid, _, _ in parsed if ticket_uuid}
+    codes = {code for _, _, code, _ in parsed if code}
+
+    found = {}  # uuid / qr_code -> (kind, row)
+    arrivals = {}  # (kind, id) -> earliest scan time of a ticket still to check in
+    with transaction.atomic():
+        for kind, (model, fields, is_cancelled, _) in TABLES.items():
+            match = Q(uuid__in=uuids)
+            if 'qr_code' in fields:
+                match |= Q(qr_code__in=codes)
+            if not uuids and not (codes and 'qr_code' in fields):
+                continue
+            rows = list(model.objects.select_for_update().filter(match).values(*fields))
+            for row in rows:
+                found.setdefault(row['uuid'], (kind, row))
+                if row.get('qr_code'):
+                    found.setdefault(row['qr_code'], (kind, row))
+
+            for ticket, ticket_uuid, code, scanned_at in parsed:
+                kind_row = found.get(ticket_uuid) or found.get(code)
+                if kind_row and kind_row[0] == kind:
+                    row = kind_row[1]
+                    if not row['arrived'] and not is_cancelled(row):
+                        key = (kind, row['id'])
+                        arrivals[key] = min(arrivals.get(key, scanned_at), scanned_at)
+
+            fresh = {row_id: at for (row_kind, row_id), at in arrivals.items() if row_kind == kind}
+            if fresh:
+                updated = model.objects.filter(pk__in=list(fresh), arrived=False).update(
+                    arrived=True,
+                    arrived_at=Case(*[When(pk=row_id, then=Value(at)) for row_id, at in fresh.items()]),
+                    updated_at=now,
+                )
+                if updated != len(fresh):
+                    # Another gate won a row between our SELECT and UPDATE
+                    # (databases without row locks, i.e. SQLite)
+                    current = dict(model.objects.filter(pk__in=list(fresh)).values_list('id', 'arrived_at'))
+                    for row in rows:
+                        if row['id'] in fresh and current[row['id']] != fresh[row['id']]:
+                            del arrivals[(kind, row['id'])]
+                            row.update(arrived=True, arrived_at=current[row['id']])
+                won = [row for row in rows if (kind, row['id']) in arrivals]
+                occupancy.apply_arrivals(kind, won)
+                for day in {row['date'] for row in won}:
+                    invalidate_month_tiles(day)
+
+    results, reported = [], set()
+    for ticket, ticket_uuid, code, _ in parsed:
+        kind_row = found.get(ticket_uuid) or found.get(code)
+        if not kind_row:
+            results.append(_result(ticket, NOT_FOUND))
+            continue
+        kind, row = kind_row
+        _, _, is_cancelled, headcount_fields = TABLES[kind]
+        key = (kind, row['id'])
+        if key in arrivals and key not in reported:
+            # This batch checked it in; later scans of it report ALREADY_ARRIVED
+            reported.add(key)
+            row = dict(row, arrived_at=arrivals[key])
+            status = CHECKED_IN
+        elif is_cancelled(row) and not row['arrived']:
+            status = CANCELLED
+        else:
+            if key in arrivals:
+                row = dict(row, arrived_at=arrivals[key])
+            status = ALREADY_ARRIVED
+        results.append(_result(ticket, status, kind, row, headcount_fields))
+    return results
@@ -0,0 +1,171 @@
+"""
+Set-based customer backfill shared by the backfill_customers,
+populate_customers and link_bookings_to_customers commands.
+
+Rather than get_or_create + save() per booking, a run:
+
+1. reads the distinct booking emails (with the name/phone of the first
+   booking for each) in primary-key batches,
+2. bulk_creates the missing customers with ignore_conflicts, so a
+   concurrent signup for the same email is not an error,
+3. maps every email to its customer id with one query per batch of emails,
+4. bulk_updates the unlinked bookings' customer_id, one transaction per
+   batch of `batch_size` rows.
+
+bulk_create and bulk_update skip signals, so the new and filled-in
+customers are added to the search index, the calendar tiles of the months
+they touch are dropped and the linked customers' lifetime stats are
+reconciled at the end. `created` counts the rows that exist after
+the insert with an id past the newest one before it, so emails skipped by
+ignore_conflicts are not counted.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from . import customer_stats, search
+from .calendar_views import invalidate_customer_tiles, invalidate_month_tiles
+from .models import Booking, Customer, PartyBooking
+
+BOOKING_MODELS = [('session', Booking), ('party', PartyBooking)]
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CustomerBackfill:
+    def __init__(self, batch_size=1000, dry_run=False, log=None):
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+        self.report = {
+            'emails': 0, 'created': 0, 'updated': 0,
+            'linked': {kind: 0 for kind, _ in BOOKING_MODELS},
+            'skipped': 0, 'not_found': 0,
+        }
+
+    def collect(self, unlinked_only=False):
+        """{email: {'name', 'phone'}} from the first booking using each email"""
+        candidates = {}
+        for kind, model in BOOKING_MODELS:
+            queryset = model.objects.order_by('pk')
+            if unlinked_only:
+                queryset = queryset.filter(customer__isnull=True)
+            last_pk = 0
+            while True:
+                rows = list(
+                    queryset.filter(pk__gt=last_pk)
+                    .values_list('pk', 'email', 'name', 'phone')[:self.batch_size]
+                )
+                if not rows:
+                    break
+                for pk, email, name, phone in rows:
+                    if not email:
+                        self.report['skipped'] += 1
+                    elif email not in candidates:
+                        candidates[email] = {'name': name or '', 'phone': phone}
+                last_pk = rows[-1][0]
+            self.log(f'Scanned {kind} bookings: {len(candidates)} distinct emails so far')
+        self.report['emails'] = len(candidates)
+        return candidates
+
+    def customer_ids(self, emails):
+        """{email: customer id} for the emails that have a customer"""
+        mapping = {}
+        for chunk in _chunks(emails, self.batch_size):
+            mapping.update(Customer.objects.filter(email__in=chunk).values_list('email', 'id'))
+        return mapping
+
+    def create_customers(self, candidates, fill_blanks=False):
+        """
+        Create customers for emails that have none; with `fill_blanks`,
+        also fill in an existing customer's missing name or phone.
+        """
+        existing = self.customer_ids(candidates)
+        missing = [email for email in candidates if email not in existing]
+        # What a dry run would create; replaced by the rows actually inserted
+        self.report['created'] = len(missing)
+
+        to_fill = []
+        if fill_blanks:
+            for chunk in _chunks(existing, self.batch_size):
+                for customer in Customer.objects.filter(email__in=chunk).only('id', 'email', 'name', 'phone'):
+                    data = candidates[customer.email]
+                    changed = False
+                    if not customer.name and data['name']:
+                        customer.name = data['name']
+                        changed = True
+                    if not customer.phone and data['phone']:
+                        customer.phone = data['phone']
+                        changed = True
+                    if changed:
+                        to_fill.append(customer)
+            self.report['updated'] = len(to_fill)
+
+        if self.dry_run:
+            return
+        newest = Customer.objects.aggregate(newest=Max('id'))['newest'] or 0
+        for done, chunk in enumerate(_chunks(missing, self.batch_size), 1):
+            Customer.objects.bulk_create(
+                [Customer(email=email, **candidates[email]) for email in chunk],
+                ignore_conflicts=True,
+            )
+            self.log(f'Created customers: batch {done} ({min(done * self.batch_size, len(missing))}/{len(missing)})')
+        if to_fill:
+            Customer.objects.bulk_update(to_fill, ['name', 'phone'], batch_size=self.batch_size)
+            for chunk in _chunks(to_fill, self.batch_size):
+                search.index_objects(chunk)
+                invalidate_customer_tiles([customer.pk for customer in chunk])
+        # ignore_conflicts leaves primary keys unset on some backends
+        new_ids = [pk for pk in self.customer_ids(missing).values() if pk > newest]
+        self.report['created'] = len(new_ids)
+        for chunk in _chunks(new_ids, self.batch_size):
+            search.index_objects(Customer.objects.filter(pk__in=chunk))
+
+    def link_bookings(self):
+        """Point every unlinked booking at the customer with its email"""
+        for kind, model in BOOKING_MODELS:
+            total = model.objects.filter(customer__isnull=True).exclude(email='').count()
+            last_pk, done = 0, 0
+            while True:
+                batch = list(
+                    model.objects.filter(customer__isnull=True, pk__gt=last_pk)
+                    .order_by('pk').only('pk', 'email', 'date')[:self.batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                mapping = self.customer_ids({booking.email for booking in batch if booking.email})
+                linked = []
+                for booking in batch:
+                    if booking.email in mapping:
+                        booking.customer_id = mapping[booking.email]
+                        linked.append(booking)
+                    elif booking.email:
+                        self.report['not_found'] += 1
+                if linked and not self.dry_run:
+                    with transaction.atomic():
+                        model.objects.bulk_update(linked, ['customer'])
+                        invalidate_month_tiles(*{booking.date for booking in linked})
+                self.report['linked'][kind] += len(linked)
+                done += len(batch)
+                self.log(f'Linked {kind} bookings: {done}/{total}')
+
+    def run(self, create=True, link=True, fill_blanks=False):
+        if create:
+            candidates = self.collect(unlinked_only=link and not fill_blanks)
+            self.create_customers(candidates, fill_blanks=fill_blanks)
+        if link:
+            if self.dry_run and create:
+                # Nothing was created, so count what would be linked instead
+                self.report['linked'] = {
+                    kind: model.objects.filter(customer__isnull=True).exclude(email='').count()
+                    for kind, model in BOOKING_MODELS
+                }
+            else:
+                self.link_bookings()
+                if not self.dry_run and any(self.report['linked'].values()):
+                    customer_stats.reconcile(batch_size=self.batch_size)
+        return self.report
@@ -0,0 +1,133 @@
+"""
+Lifetime stats stored on Customer: session and party booking counts,
+total spent and last visit, across both booking tables.
+
+The signals in signals.py pass each booking's old and new contribution to
+`apply_change`, which moves counts and spend with F() increments so
+concurrent writers never overwrite each other. last_visit only moves
+forward on inserts; when a booking's date, customer or existence changes
+it is recomputed for that customer from the (indexed) customer columns.
+`reconcile_customer_stats` recomputes everything and fixes drift, e.g.
+after queryset.update() calls, which bypass signals.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .stats import PARTY, SESSION, _as_date
+
+COUNT_FIELDS = {SESSION: 'booking_count', PARTY: 'party_count'}
+STAT_FIELDS = ['booking_count', 'party_count', 'total_spent', 'last_visit']
+
+
+def snapshot(values):
+    """A booking's contribution; `values` is an instance or a .values() dict"""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name, None)
+    return {
+        'customer_id': get('customer_id'),
+        'amount': Decimal(str(get('amount') or 0)),
+        'date': _as_date(get('date')),
+    }
+
+
+def snapshot_fields():
+    return ['customer_id', 'amount', 'date']
+
+
+def refresh_last_visit(customer_id):
+    from .models import Booking, Customer, PartyBooking
+
+    dates = [
+        model.objects.filter(customer_id=customer_id).aggregate(last=Max('date'))['last']
+        for model in (Booking, PartyBooking)
+    ]
+    dates = [day for day in dates if day]
+    Customer.objects.filter(pk=customer_id).update(last_visit=max(dates) if dates else None)
+
+
+def apply_change(kind, old=None, new=None):
+    """
+    Move a booking's contribution from its `old` snapshot to its `new` one.
+    Pass old=None for inserts and new=None for deletes.
+    """
+    from .models import Customer
+
+    count_field = COUNT_FIELDS[kind]
+    deltas = defaultdict(lambda: {'count': 0, 'spent': Decimal(0)})
+    if old and old['customer_id']:
+        deltas[old['customer_id']]['count'] -= 1
+        deltas[old['customer_id']]['spent'] -= old['amount']
+    if new and new['customer_id']:
+        deltas[new['customer_id']]['count'] += 1
+        deltas[new['customer_id']]['spent'] += new['amount']
+
+    for customer_id, delta in deltas.items():
+        moved_away = (
+            old and old['customer_id'] == customer_id and old['date']
+            and not (new and new['customer_id'] == customer_id and new['date'] == old['date'])
+        )
+        updates = {}
+        if delta['count']:
+            updates[count_field] = F(count_field) + delta['count']
+        if delta['spent']:
+            updates['total_spent'] = F('total_spent') + delta['spent']
+        if new and new['customer_id'] == customer_id and new['date'] and not moved_away:
+            day = Value(new['date'])
+            updates['last_visit'] = Greatest(Coalesce('last_visit', day), day)
+        if updates:
+            Customer.objects.filter(pk=customer_id).update(**updates)
+        if moved_away:
+            # A maximum cannot be decremented; look it up again
+            refresh_last_visit(customer_id)
+
+
+def compute_stats(booking_model=None, party_model=None):
+    """{customer_id: {field: value}} computed from the booking tables"""
+    if booking_model is None or party_model is None:
+        from .models import Booking, PartyBooking
+        booking_model = booking_model or Booking
+        party_model = party_model or PartyBooking
+
+    totals = defaultdict(lambda: {'booking_count': 0, 'party_count': 0, 'total_spent': Decimal(0), 'last_visit': None})
+    for model, kind in ((booking_model, SESSION), (party_model, PARTY)):
+        rows = (
+            model.objects.filter(customer__isnull=False).order_by()
+            .values('customer_id')
+            .annotate(count=Count('id'), spent=Coalesce(Sum('amount'), Decimal(0)), last=Max('date'))
+        )
+        for row in rows:
+            target = totals[row['customer_id']]
+            target[COUNT_FIELDS[kind]] = row['count']
+            target['total_spent'] += row['spent']
+            if row['last'] and (target['last_visit'] is None or row['last'] > target['last_visit']):
+                target['last_visit'] = row['last']
+    return totals
+
+
+def reconcile(customer_model=None, booking_model=None, party_model=None, batch_size=500, dry_run=False):
+    """
+    Compare stored stats with the booking tables and fix the rows that
+    differ. Models can be passed so migrations can use historical models.
+    Returns the number of customers whose stats were wrong.
+    """
+    if customer_model is None:
+        from .models import Customer
+        customer_model = Customer
+    expected = compute_stats(booking_model, party_model)
+    empty = {'booking_count': 0, 'party_count': 0, 'total_spent': Decimal(0), 'last_visit': None}
+
+    drifted = []
+    for customer in customer_model.objects.only('pk', *STAT_FIELDS).iterator(chunk_size=batch_size):
+        want = expected.get(customer.pk, empty)
+        if any(getattr(customer, field) != want[field] for field in STAT_FIELDS):
+            for field in STAT_FIELDS:
+                setattr(customer, field, want[field])
+            drifted.append(customer)
+
+    if drifted and not dry_run:
+        with transaction.atomic():
+            customer_model.objects.bulk_update(drifted, STAT_FIELDS, batch_size=batch_size)
+    return len(drifted)
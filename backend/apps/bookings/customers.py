@@ -0,0 +1,162 @@
+"""
+Customer resolution for every booking creation path.
+
+`resolve_customer(email, name, phone)` returns the Customer for an email,
+creating it if needed, with a single INSERT ... ON CONFLICT (email) DO
+UPDATE ... RETURNING statement on PostgreSQL and SQLite instead of
+get_or_create followed by save(). Two merge rules exist:
+
+- overwrite=True (public booking forms): the booking's name and phone
+  replace the stored ones, as the customer just typed them.
+- overwrite=False (signals, restores): they only fill in blanks.
+
+Within a request (CustomerMemoMiddleware) or a `customer_memo()` block the
+result is memoized per email, so resolving the same customer again in the
+serializer, the pre_save signal or a participant loop costs no query.
+
+The upsert bypasses post_save, so the search tokens are refreshed here
+whenever the returned row holds a value that was sent: a new customer, an
+overwrite, or a fill-blanks merge that filled a blank. For an existing
+customer the calendar tiles of their bookings are dropped after commit. Whether the row was
+inserted comes from the statement itself: `xmax = 0` on PostgreSQL and, on
+SQLite, an id above the table's AUTOINCREMENT sequence before the insert.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import search
+from .calendar_views import invalidate_customer_tiles
+from .models import Customer
+
+_memo = ContextVar('customer_memo', default=None)
+
+
+@contextmanager
+def customer_memo():
+    """Memoize resolved customers by email until the block exits."""
+    token = _memo.set({})
+    try:
+        yield
+    finally:
+        _memo.reset(token)
+
+
+class CustomerMemoMiddleware:
+    """One customer memo per request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with customer_memo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so the view's threads share the memo
+        with customer_memo():
+            return await self.get_response(request)
+
+
+def _upsert_sql(overwrite):
+    quote = connection.ops.quote_name
+    table = quote(Customer._meta.db_table)
+    insert_fields = ['name', 'email', 'phone', 'booking_count', 'party_count', 'total_spent', 'created_at', 'updated_at']
+    columns = ', '.join(quote(Customer._meta.get_field(name).column) for name in insert_fields)
+    returning = ', '.join(quote(field.column) for field in Customer._meta.concrete_fields)
+    name, phone, updated_at = (f'{table}.{quote(column)}' for column in ('name', 'phone', 'updated_at'))
+    if connection.vendor == 'postgresql':
+        inserted = 'xmax = 0'
+    else:
+        # Evaluated before this statement bumps the sequence
+        inserted = f"{quote('id')} > COALESCE((SELECT seq FROM sqlite_sequence WHERE name = %s), 0)"
+    if overwrite:
+        updates = (
+            f"{quote('name')} = COALESCE(NULLIF(EXCLUDED.{quote('name')}, ''), {name}), "
+            f"{quote('phone')} = COALESCE(NULLIF(EXCLUDED.{quote('phone')}, ''), {phone}), "
+            f"{quote('updated_at')} = EXCLUDED.{quote('updated_at')}"
+        )
+    else:
+        updates = (
+            f"{quote('name')} = CASE WHEN {name} = '' THEN EXCLUDED.{quote('name')} ELSE {name} END, "
+            f"{quote('phone')} = COALESCE(NULLIF({phone}, ''), EXCLUDED.{quote('phone')})"
+        )
+    return (
+        f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(insert_fields))}) '
+        f'ON CONFLICT ({quote("email")}) DO UPDATE SET {updates} '
+        f'RETURNING {returning}, ({inserted}) AS {quote("inserted")}'
+    ), insert_fields
+
+
+def _upsert(email, name, phone, overwrite):
+    """(customer, created) in one statement"""
+    now = timezone.now()
+    sql, fields = _upsert_sql(overwrite)
+    values = {
+        'name': name or '', 'email': email, 'phone': phone or None,
+        'booking_count': 0, 'party_count': 0, 'total_spent': 0,
+        'created_at': now, 'updated_at': now,
+    }
+    params = [Customer._meta.get_field(field).get_db_prep_save(values[field], connection) for field in fields]
+    if connection.vendor == 'sqlite':
+        params.append(Customer._meta.db_table)
+    customer = list(Customer.objects.raw(sql, params))[0]
+    created = bool(customer.inserted)
+    del customer.inserted
+    return customer, created
+
+
+def _holds_sent_values(customer, name, phone):
+    """Whether the merge may have written `name` or `phone` to the row."""
+    return bool((name and customer.name == name) or (phone and customer.phone == phone))
+
+
+def _get_or_create(email, name, phone, overwrite):
+    """Fallback for databases without ON CONFLICT ... RETURNING"""
+    customer, created = Customer.objects.get_or_create(email=email, defaults={'name': name or '', 'phone': phone})
+    if not created:
+        changed = False
+        if name and customer.name != name and (overwrite or not customer.name):
+            customer.name = name
+            changed = True
+        if phone and customer.phone != phone and (overwrite or not customer.phone):
+            customer.phone = phone
+            changed = True
+        if changed:
+            customer.save()
+    return customer, created
+
+
+def resolve_customer(email, name='', phone=None, overwrite=False):
+    """Return the Customer for `email` (None without one), creating it if needed."""
+    if not email:
+        return None
+    memo = _memo.get()
+    cached = memo.get(email) if memo is not None else None
+    if cached is not None and not (
+        overwrite and ((name and name != cached.name) or (phone and phone != cached.phone))
+    ):
+        return cached
+
+    if connection.vendor in ('postgresql', 'sqlite'):
+        customer, created = _upsert(email, name, phone, overwrite)
+        merged = _holds_sent_values(customer, name, phone)
+        if created or merged:
+            search.index_objects([customer])
+        if merged and not created:
+            transaction.on_commit(lambda: invalidate_customer_tiles([customer.pk]))
+    else:
+        customer, created = _get_or_create(email, name, phone, overwrite)
+    if memo is not None:
+        memo[email] = customer
+    return customer
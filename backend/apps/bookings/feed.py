@@ -0,0 +1,166 @@
+"""
+Unified, keyset-paginated feed of session and party bookings.
+
+Both tables are projected onto the same columns and combined with
+UNION ALL, newest first. Pages are addressed by an opaque cursor holding
+the (created_at, type, id) of the last row served, so fetching a page
+costs the same no matter how much history sits behind it.
+"""
+import base64
+
+from django.db import connection
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .models import Booking, PartyBooking
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SESSION = 'SESSION'
+PARTY = 'PARTY'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _null(field_class):
+    return Value(None, output_field=field_class())
+
+
+# Output key -> (session expression, party expression). Every column is an
+# annotation so both halves of the UNION select them in the same order.
+COLUMNS = {
+    'id': (F('id'), F('id')),
+    'uuid': (F('uuid'), F('uuid')),
+    'type': (Value(SESSION, output_field=CharField()), Value(PARTY, output_field=CharField())),
+    'name': (F('name'), F('name')),
+    'email': (F('email'), F('email')),
+    'phone': (F('phone'), F('phone')),
+    'date': (F('date'), F('date')),
+    'time': (F('time'), F('time')),
+    'duration': (F('duration'), Value(120, output_field=IntegerField())),  # Default party duration
+    'adults': (F('adults'), F('adults')),
+    'kids': (F('kids'), F('kids')),
+    'spectators': (F('spectators'), Value(0, output_field=IntegerField())),  # Not tracked for party bookings
+    'amount': (F('amount'), F('amount')),
+    'booking_status': (F('booking_status'), F('status')),
+    'payment_status': (F('payment_status'), Value('PENDING', output_field=CharField())),
+    'waiver_status': (
+        F('waiver_status'),
+        Case(When(waiver_signed=True, then=Value('SIGNED')), default=Value('PENDING'), output_field=CharField()),
+    ),
+    'created_at': (F('created_at'), F('created_at')),
+    'birthday_child_name': (_null(CharField), F('birthday_child_name')),
+    'birthday_child_age': (_null(IntegerField), F('birthday_child_age')),
+    'package_name': (_null(CharField), F('package_name')),
+    'customer_id': (F('customer_id'), F('customer_id')),
+    'customer_name': (F('customer__name'), F('customer__name')),
+    'customer_email': (F('customer__email'), F('customer__email')),
+    'customer_phone': (F('customer__phone'), F('customer__phone')),
+}
+
+# Annotation names must not clash with model fields
+ALIASES = {key: f'feed_{key}' for key in COLUMNS}
+ORDERING = ['-feed_created_at', '-feed_type', '-feed_id']
+
+
+def encode_cursor(row):
+    raw = f"{row['created_at'].isoformat()}|{row['type']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, kind, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None or kind not in (SESSION, PARTY):
+            raise ValueError
+        return created_at, kind, int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after_cursor(kind, cursor):
+    """
+    Keyset predicate for one half of the feed: rows strictly after `cursor`
+    in (created_at DESC, type DESC, id DESC) order. 'SESSION' sorts above
+    'PARTY', so on a created_at tie every party row follows a session row.
+    """
+    created_at, cursor_kind, cursor_id = cursor
+    older = Q(created_at__lt=created_at)
+    if kind == cursor_kind:
+        return older | Q(created_at=created_at, id__lt=cursor_id)
+    if kind == PARTY:
+        return older | Q(created_at=created_at)
+    return older
+
+
+def _project(model, kind, status=None, search=None, cursor=None, limit=None):
+    index = 0 if kind == SESSION else 1
+    queryset = model.objects.all()
+    if status:
+        queryset = queryset.filter(**{'booking_status' if kind == SESSION else 'status': status})
+    if search:
+        queryset = queryset.filter(Q(name__icontains=search) | Q(email__icontains=search))
+    if cursor:
+        queryset = queryset.filter(_after_cursor(kind, cursor))
+    queryset = queryset.annotate(
+        **{ALIASES[key]: expressions[index] for key, expressions in COLUMNS.items()}
+    ).values(*ALIASES.values())
+    if limit and connection.features.supports_slicing_ordering_in_compound:
+        # Let each half walk its own created_at index before the merge
+        queryset = queryset.order_by(*ORDERING)[:limit]
+    else:
+        queryset = queryset.order_by()
+    return queryset
+
+
+def _to_item(row):
+    item = {key: row[alias] for key, alias in ALIASES.items()}
+    customer = {
+        'id': item.pop('customer_id'),
+        'name': item.pop('customer_name'),
+        'email': item.pop('customer_email'),
+        'phone': item.pop('customer_phone'),
+    }
+    if customer['id'] is None:
+        customer.update(name=item['name'], email=item['email'], phone=item['phone'])
+    if item['type'] == SESSION:
+        for key in ('birthday_child_name', 'birthday_child_age', 'package_name'):
+            item.pop(key)
+    item.update(
+        uuid=str(item['uuid']),
+        date=str(item['date']) if item['date'] else None,
+        time=str(item['time']) if item['time'] else None,
+        amount=float(item['amount']) if item['amount'] else 0,
+        customer=customer,
+    )
+    return item
+
+
+def booking_feed(booking_type=None, status=None, search=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of the merged feed as (items, next_cursor).
+    `booking_type` is 'session', 'party' or None for both.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+
+    halves = []
+    if booking_type != 'party':
+        halves.append(_project(Booking, SESSION, status, search, position, limit + 1))
+    if booking_type != 'session':
+        halves.append(_project(PartyBooking, PARTY, status, search, position, limit + 1))
+
+    queryset = halves[0]
+    if len(halves) > 1:
+        queryset = queryset.union(*halves[1:], all=True)
+    rows = [_to_item(row) for row in queryset.order_by(*ORDERING)[:limit + 1]]
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    items = rows[:limit]
+    for item in items:
+        item['created_at'] = item['created_at'].isoformat()
+    return items, next_cursor
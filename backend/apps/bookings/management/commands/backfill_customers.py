@@ -1,5 +1,13 @@
+"""
+Create customers for bookings without one and link the bookings to them.
+Runs set-based in batches (see apps/bookings/customer_backfill.py).
+
+Usage:
+    python manage.py backfill_customers --dry-run
+    python manage.py backfill_customers --batch-size 2000
+"""
 from django.core.management.base import BaseCommand
-from apps.bookings.models import Customer, Booking, PartyBooking
+from apps.bookings.customer_backfill import CustomerBackfill
 
 
 class Command(BaseCommand):
@@ -11,6 +19,7 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be done without making changes',
         )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per query and bulk write')
     
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -18,93 +27,20 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
         
-        created_customers = 0
-        linked_bookings = 0
-        linked_parties = 0
-        skipped = 0
-        
-        # Process regular bookings
-        bookings = Booking.objects.filter(customer__isnull=True)
-        self.stdout.write(f'Found {bookings.count()} bookings without customers')
-        
-        for booking in bookings:
-            if not booking.email:
-                self.stdout.write(
-                    self.style.WARNING(f'  Skipping booking {booking.id} - no email')
-                )
-                skipped += 1
-                continue
-            
-            if not dry_run:
-                customer, created = Customer.objects.get_or_create(
-                    email=booking.email,
-                    defaults={
-                        'name': booking.name,
-                        'phone': booking.phone
-                    }
-                )
-                
-                booking.customer = customer
-                booking.save(update_fields=['customer'])
-                
-                if created:
-                    created_customers += 1
-                    self.stdout.write(f'  Created customer: {customer.email}')
-                else:
-                    self.stdout.write(f'  Linked to existing customer: {customer.email}')
-                linked_bookings += 1
-            else:
-                # Check if customer would be created
-                exists = Customer.objects.filter(email=booking.email).exists()
-                if not exists:
-                    created_customers += 1
-                linked_bookings += 1
-        
-        # Process party bookings
-        party_bookings = PartyBooking.objects.filter(customer__isnull=True)
-        self.stdout.write(f'\\nFound {party_bookings.count()} party bookings without customers')
-        
-        for pb in party_bookings:
-            if not pb.email:
-                self.stdout.write(
-                    self.style.WARNING(f'  Skipping party booking {pb.id} - no email')
-                )
-                skipped += 1
-                continue
-            
-            if not dry_run:
-                customer, created = Customer.objects.get_or_create(
-                    email=pb.email,
-                    defaults={
-                        'name': pb.name,
-                        'phone': pb.phone
-                    }
-                )
-                
-                pb.customer = customer
-                pb.save(update_fields=['customer'])
-                
-                if created:
-                    created_customers += 1
-                    self.stdout.write(f'  Created customer: {customer.email}')
-                else:
-                    self.stdout.write(f'  Linked to existing customer: {customer.email}')
-                linked_parties += 1
-            else:
-                exists = Customer.objects.filter(email=pb.email).exists()
-                if not exists:
-                    created_customers += 1
-                linked_parties += 1
+        report = CustomerBackfill(
+            batch_size=options['batch_size'], dry_run=dry_run, log=self.stdout.write,
+        ).run()
+        linked = report['linked']
         
         # Summary
-        self.stdout.write(self.style.SUCCESS('\\n=== SUMMARY ==='))
-        self.stdout.write(f'New customers created: {created_customers}')
-        self.stdout.write(f'Session bookings linked: {linked_bookings}')
-        self.stdout.write(f'Party bookings linked: {linked_parties}')
-        self.stdout.write(f'Total bookings processed: {linked_bookings + linked_parties}')
-        self.stdout.write(f'Skipped (no email): {skipped}')
+        self.stdout.write(self.style.SUCCESS('\n=== SUMMARY ==='))
+        self.stdout.write(f"New customers created: {report['created']}")
+        self.stdout.write(f"Session bookings linked: {linked['session']}")
+        self.stdout.write(f"Party bookings linked: {linked['party']}")
+        self.stdout.write(f"Total bookings processed: {linked['session'] + linked['party']}")
+        self.stdout.write(f"Skipped (no email): {report['skipped']}")
         
         if dry_run:
-            self.stdout.write(self.style.WARNING('\\nThis was a DRY RUN - run without --dry-run to apply changes'))
+            self.stdout.write(self.style.WARNING('\nThis was a DRY RUN - run without --dry-run to apply changes'))
         else:
-            self.stdout.write(self.style.SUCCESS('\\n✅ Backfill complete!'))
+            self.stdout.write(self.style.SUCCESS('\n✅ Backfill complete!'))
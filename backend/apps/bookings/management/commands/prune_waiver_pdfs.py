@@ -0,0 +1,28 @@
+"""
+Delete cached waiver PDFs older than WAIVER_PDF_CACHE_DAYS, so PDFs holding
+personal data of deleted or long-finished waivers do not pile up on disk.
+
+Usage:
+    python manage.py prune_waiver_pdfs
+    python manage.py prune_waiver_pdfs --days 7
+
+Safe to run from cron; anything still needed is rendered again on demand.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.bookings.waiver_pdf import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete cached waiver PDFs older than the cache lifetime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.WAIVER_PDF_CACHE_DAYS,
+                            help='Keep cached PDFs this many days')
+
+    def handle(self, *args, **options):
+        removed = prune(timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} cached waiver PDFs'))
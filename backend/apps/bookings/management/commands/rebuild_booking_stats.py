@@ -0,0 +1,19 @@
+"""
+Rebuild the DailyBookingStats rollup from the Booking and PartyBooking tables.
+
+Usage:
+    python manage.py rebuild_booking_stats
+"""
+from django.core.management.base import BaseCommand
+from apps.bookings.models import DailyBookingStats
+from apps.bookings.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily booking rollup used by the admin dashboard'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding daily booking stats...')
+        written = rebuild_daily_stats()
+        days = DailyBookingStats.objects.values('date').distinct().count()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows covering {days} days'))
@@ -0,0 +1,17 @@
+"""
+Recompute the live occupancy counters (people checked in per slot) from the
+arrived bookings.
+
+Usage:
+    python manage.py rebuild_occupancy
+"""
+from django.core.management.base import BaseCommand
+from apps.bookings.occupancy import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-slot occupancy counters from the booking tables'
+
+    def handle(self, *args, **options):
+        rows = rebuild_occupancy()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} occupancy rows'))
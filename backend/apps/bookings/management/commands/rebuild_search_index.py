@@ -0,0 +1,27 @@
+"""
+Refill the search token table used when the database has no pg_trgm.
+
+Usage:
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --kind waiver --batch-size 2000
+
+On PostgreSQL search runs on pg_trgm indexes and this does nothing.
+"""
+from django.core.management.base import BaseCommand
+from apps.bookings.search import SEARCH_FIELDS, get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search tokens for customers, bookings, party bookings and waivers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(SEARCH_FIELDS), help='Only rebuild this kind')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not get_backend().maintains_tokens:
+            self.stdout.write('Search uses pg_trgm indexes on this database; nothing to rebuild')
+            return
+        for kind in [options['kind']] if options['kind'] else SEARCH_FIELDS:
+            count = rebuild_index(kind, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {kind} rows'))
@@ -0,0 +1,25 @@
+"""
+Recompute customers' lifetime stats (booking/party counts, total spent,
+last visit) from the booking tables and fix the rows that drifted.
+
+Usage:
+    python manage.py reconcile_customer_stats
+    python manage.py reconcile_customer_stats --dry-run
+"""
+from django.core.management.base import BaseCommand
+from apps.bookings.customer_stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Repair the denormalized lifetime stats stored on customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--batch-size', type=int, default=500, help='Customers per bulk_update')
+
+    def handle(self, *args, **options):
+        drifted = reconcile(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} customers have stale stats'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed stats for {drifted} customers'))
@@ -0,0 +1,18 @@
+"""
+Release slot holds whose checkout was abandoned.
+
+Usage:
+    python manage.py release_expired_holds
+
+Safe to run from cron on every instance; each hold is released exactly once.
+"""
+from django.core.management.base import BaseCommand
+from apps.bookings.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Give the places of expired checkout holds back to their slots'
+
+    def handle(self, *args, **options):
+        released = release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired holds'))
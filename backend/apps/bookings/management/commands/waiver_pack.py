@@ -0,0 +1,44 @@
+"""
+Write every waiver for a visit date or a booking to a ZIP or one merged PDF.
+Cache misses are rendered in parallel (see apps/bookings/waiver_pdf.py).
+
+Usage:
+    python manage.py waiver_pack --date 2025-03-05
+    python manage.py waiver_pack --party-booking-id 12 --output pdf --file party_12.pdf
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.bookings import waiver_pdf
+
+
+class Command(BaseCommand):
+    help = 'Render a waiver pack for a date or booking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Visit date (YYYY-MM-DD)')
+        parser.add_argument('--booking-id', type=int)
+        parser.add_argument('--party-booking-id', type=int)
+        parser.add_argument('--output', choices=['zip', 'pdf'], default='zip')
+        parser.add_argument('--file', help='Output path (default waivers_<selection>.<output>)')
+        parser.add_argument('--workers', type=int, default=None, help='Render processes (default WAIVER_PDF_WORKERS)')
+
+    def handle(self, *args, **options):
+        date = options['date']
+        if date and not parse_date(date):
+            raise CommandError('--date must be YYYY-MM-DD')
+        try:
+            pages = waiver_pdf.pack_waivers(date, options['booking_id'], options['party_booking_id'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not pages:
+            raise CommandError('No waivers found')
+
+        selection = date or options['booking_id'] or f"party_{options['party_booking_id']}"
+        path = options['file'] or f"waivers_{selection}.{options['output']}"
+        with open(path, 'wb') as f:
+            if options['output'] == 'pdf':
+                f.write(waiver_pdf.merged_pdf(pages))
+            else:
+                for chunk in waiver_pdf.iter_zip(pages, options['workers']):
+                    f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(pages)} waivers to {path}'))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+def backfill_daily_stats(apps, schema_editor):
+    from apps.bookings.stats import rebuild_daily_stats
+
+    rebuild_daily_stats(
+        booking_model=apps.get_model('bookings', 'Booking'),
+        party_model=apps.get_model('bookings', 'PartyBooking'),
+        stats_model=apps.get_model('bookings', 'DailyBookingStats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_alter_booking_options_alter_customer_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(choices=[('SESSION', 'Session'), ('PARTY', 'Party')], max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending_waivers', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Booking Stats',
+                'verbose_name_plural': 'Daily Booking Stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['kind', 'status'], name='bookings_da_kind_e7058e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'kind', 'status'), name='unique_daily_booking_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
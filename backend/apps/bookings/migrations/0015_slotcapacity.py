@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:55
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_dailybookingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('kind', models.CharField(choices=[('SESSION', 'Session'), ('PARTY', 'Party')], max_length=20)),
+                ('capacity', models.IntegerField()),
+                ('taken', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Slot Capacity',
+                'verbose_name_plural': 'Slot Capacity',
+                'ordering': ['date', 'time'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time', 'kind'), name='unique_slot_capacity'), models.CheckConstraint(condition=models.Q(('taken__gte', 0)), name='slot_capacity_taken_gte_0')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(db_index=True, default=uuid.uuid4)),
+                ('quantity', models.IntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='bookings.slotcapacity')),
+            ],
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:13
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of apps.bookings.search as of this migration, so later
+# changes to the live field map or tokenizer cannot change what it does.
+# Tokens built by a newer tokenizer come from `rebuild_search_index`.
+SEARCH_FIELDS = {
+    'customer': ('Customer', {'name': 3, 'email': 4, 'phone': 4}),
+    'booking': ('Booking', {'name': 3, 'email': 4, 'phone': 4, 'uuid': 5}),
+    'party_booking': ('PartyBooking', {'name': 3, 'email': 4, 'phone': 4, 'uuid': 5, 'birthday_child_name': 2}),
+    'waiver': ('Waiver', {'name': 3, 'email': 4, 'phone': 4}),
+}
+PHONE_DIGITS = r"""(REGEXP_REPLACE("phone", '\D', '', 'g'))::text"""
+TRIGRAM_INDEXES = [
+    ('bookings_customer', 'UPPER(("name")::text)'),
+    ('bookings_customer', 'UPPER(("email")::text)'),
+    ('bookings_customer', PHONE_DIGITS),
+    ('bookings_booking', 'UPPER(("name")::text)'),
+    ('bookings_booking', 'UPPER(("email")::text)'),
+    ('bookings_booking', PHONE_DIGITS),
+    ('bookings_partybooking', 'UPPER(("name")::text)'),
+    ('bookings_partybooking', 'UPPER(("email")::text)'),
+    ('bookings_partybooking', 'UPPER(("birthday_child_name")::text)'),
+    ('bookings_partybooking', PHONE_DIGITS),
+    ('bookings_waiver', 'UPPER(("name")::text)'),
+    ('bookings_waiver', 'UPPER(("email")::text)'),
+    ('bookings_waiver', PHONE_DIGITS),
+]
+MAX_TOKEN_LENGTH = 100
+
+
+def field_tokens(field, value):
+    if value is None or value == '':
+        return set()
+    value = str(value).lower()
+    if field == 'phone':
+        digits = re.sub(r'\D', '', value)
+        variants = {digits}
+        if len(digits) > 10:
+            variants.add(digits[-10:])
+        if len(digits) > 4:
+            variants.add(digits[-4:])
+        if digits.startswith('0'):
+            variants.add(digits.lstrip('0'))
+        return variants - {''}
+    if field == 'uuid':
+        return {value.replace('-', '')}
+    tokens = set(re.findall(r'\w+', value))
+    if field == 'email':
+        local, _, domain = value.partition('@')
+        tokens |= {value, local, domain}
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens if token}
+
+
+def trigram_index_name(table, expression):
+    return f"{table[:40]}_trgm_{hashlib.md5(expression.encode()).hexdigest()[:8]}"
+
+
+def setup_search(apps, schema_editor):
+    """pg_trgm indexes on PostgreSQL, a filled token table elsewhere"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, expression in TRIGRAM_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{trigram_index_name(table, expression)}" '
+                f'ON "{table}" USING gin (({expression}) gin_trgm_ops)'
+            )
+        return
+
+    SearchToken = apps.get_model('bookings', 'SearchToken')
+    for kind, (model_name, fields) in SEARCH_FIELDS.items():
+        historical = apps.get_model('bookings', model_name)
+        rows = []
+        for obj in historical.objects.only('pk', *fields).iterator():
+            tokens = {}
+            for field, weight in fields.items():
+                for token in field_tokens(field, getattr(obj, field)):
+                    tokens[token] = max(weight, tokens.get(token, 0))
+            rows += [
+                SearchToken(kind=kind, object_id=obj.pk, token=token, weight=weight)
+                for token, weight in tokens.items()
+            ]
+        SearchToken.objects.bulk_create(rows, batch_size=500)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for table, expression in TRIGRAM_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{trigram_index_name(table, expression)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0015_slotcapacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('customer', 'Customer'), ('booking', 'Session Booking'), ('party_booking', 'Party Booking'), ('waiver', 'Waiver')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('token', models.CharField(max_length=100)),
+                ('weight', models.SmallIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'token'], name='bookings_se_kind_063581_idx'), models.Index(fields=['kind', 'object_id'], name='bookings_se_kind_5816af_idx')],
+            },
+        ),
+        migrations.RunPython(setup_search, drop_trigram_indexes),
+    ]
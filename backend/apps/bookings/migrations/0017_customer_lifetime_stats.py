@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+def backfill_customer_stats(apps, schema_editor):
+    from apps.bookings.customer_stats import reconcile
+
+    reconcile(
+        customer_model=apps.get_model('bookings', 'Customer'),
+        booking_model=apps.get_model('bookings', 'Booking'),
+        party_model=apps.get_model('bookings', 'PartyBooking'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_searchtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='booking_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_visit',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='party_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-total_spent'], name='bookings_cu_total_s_1523cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-last_visit'], name='bookings_cu_last_vi_6da35d_idx'),
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    from apps.bookings.occupancy import rebuild_occupancy
+
+    rebuild_occupancy(
+        booking_model=apps.get_model('bookings', 'Booking'),
+        party_model=apps.get_model('bookings', 'PartyBooking'),
+        occupancy_model=apps.get_model('bookings', 'SlotOccupancy'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0017_customer_lifetime_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('kind', models.CharField(choices=[('SESSION', 'Session'), ('PARTY', 'Party')], max_length=20)),
+                ('adults', models.IntegerField(default=0)),
+                ('kids', models.IntegerField(default=0)),
+                ('spectators', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Slot Occupancy',
+                'verbose_name_plural': 'Slot Occupancy',
+                'ordering': ['date', 'time', 'kind'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time', 'kind'), name='unique_slot_occupancy')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
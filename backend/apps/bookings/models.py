@@ -7,6 +7,12 @@ class Customer(models.Model):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=50, null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
+    # Lifetime stats over session and party bookings, kept current by signals
+    # (see customer_stats.py); `reconcile_customer_stats` repairs drift
+    booking_count = models.IntegerField(default=0)
+    party_count = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_visit = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -14,6 +20,8 @@ class Customer(models.Model):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['-created_at']),  # For sorting by newest
+            models.Index(fields=['-total_spent']),  # For sorting by spend
+            models.Index(fields=['-last_visit']),  # For sorting by recency
         ]
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
@@ -338,3 +346,154 @@ class PartyBookingHistory(models.Model):
     def __str__(self):
         status = "Restored" if self.restored else "Pending"
         return f"Party History #{self.id} - {self.name} ({status})"
+
+class DailyBookingStats(models.Model):
+    """
+    Materialized per-day rollup of Booking and PartyBooking rows.
+    One row per (date, kind, status), kept current by the booking signals
+    and rebuilt from scratch by the `rebuild_booking_stats` command.
+    """
+    KIND_CHOICES = [
+        ('SESSION', 'Session'),
+        ('PARTY', 'Party'),
+    ]
+
+    date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20)
+
+    # Keyed by visit date (Booking.date / PartyBooking.date)
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pending_waivers = models.IntegerField(default=0)
+
+    # Keyed by the day the booking row was created
+    created = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'kind', 'status'], name='unique_daily_booking_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'status']),  # For all-time totals
+        ]
+        ordering = ['-date']
+        verbose_name = 'Daily Booking Stats'
+        verbose_name_plural = 'Daily Booking Stats'
+
+    def __str__(self):
+        return f"{self.date} {self.kind} {self.status}: {self.bookings}"
+
+
+class SlotCapacity(models.Model):
+    """
+    Capacity counter for one bookable slot. `taken` counts confirmed
+    bookings plus live holds and is only ever changed with conditional
+    UPDATEs (see reservations.py), so concurrent checkouts cannot oversell.
+    Sessions count jumpers (adults + kids); parties count bookings.
+    """
+    KIND_CHOICES = [
+        ('SESSION', 'Session'),
+        ('PARTY', 'Party'),
+    ]
+
+    date = models.DateField()
+    time = models.TimeField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    capacity = models.IntegerField()
+    taken = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time', 'kind'], name='unique_slot_capacity'),
+            models.CheckConstraint(condition=models.Q(taken__gte=0), name='slot_capacity_taken_gte_0'),
+        ]
+        ordering = ['date', 'time']
+        verbose_name = 'Slot Capacity'
+        verbose_name_plural = 'Slot Capacity'
+
+    @property
+    def remaining(self):
+        return max(self.capacity - self.taken, 0)
+
+    def __str__(self):
+        return f"{self.kind} {self.date} {self.time}: {self.taken}/{self.capacity}"
+
+
+class SlotHold(models.Model):
+    """
+    Places held on a slot while a customer finishes checkout. All rows
+    sharing a token belong to one hold; expired holds are released by
+    `release_expired_holds` or when someone else needs the places.
+    """
+    token = models.UUIDField(default=uuid.uuid4, db_index=True)
+    slot = models.ForeignKey(SlotCapacity, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.IntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Hold {self.token} on {self.slot} x{self.quantity}"
+
+
+class SlotOccupancy(models.Model):
+    """
+    People checked in per booking slot: the arrived bookings' adults, kids
+    and spectators, grouped by visit date and start time. Kept current by
+    the booking signals and check-in (see occupancy.py) and streamed to
+    staff dashboards.
+    """
+    KIND_CHOICES = [
+        ('SESSION', 'Session'),
+        ('PARTY', 'Party'),
+    ]
+
+    date = models.DateField()
+    time = models.TimeField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    adults = models.IntegerField(default=0)
+    kids = models.IntegerField(default=0)
+    spectators = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time', 'kind'], name='unique_slot_occupancy'),
+        ]
+        ordering = ['date', 'time', 'kind']
+        verbose_name = 'Slot Occupancy'
+        verbose_name_plural = 'Slot Occupancy'
+
+    def __str__(self):
+        return f"{self.kind} {self.date} {self.time}: {self.adults + self.kids + self.spectators} in"
+
+
+class SearchToken(models.Model):
+    """
+    Normalized search terms for customers, bookings, party bookings and
+    waivers, matched by prefix (see search.py). Only maintained on
+    databases without pg_trgm.
+    """
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('booking', 'Session Booking'),
+        ('party_booking', 'Party Booking'),
+        ('waiver', 'Waiver'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    token = models.CharField(max_length=100)
+    weight = models.SmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'token']),  # Prefix range scans
+            models.Index(fields=['kind', 'object_id']),  # Reindexing one row
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id}: {self.token}"
@@ -0,0 +1,232 @@
+"""
+Live in-park occupancy.
+
+SlotOccupancy holds the adults, kids and spectators of the arrived
+bookings per (date, start time, kind). Like the daily rollup in stats.py,
+the booking signals move a booking's contribution between its old and new
+snapshot with F() increments; checkin.py, whose UPDATE bypasses signals,
+calls `apply_arrivals` itself. `rebuild_occupancy` recomputes the table.
+
+Every committed change to the counters bumps a cache version, like the
+notification versions in core/notifications.py. Staff dashboards read
+`day_occupancy()` once and then follow `stream_events()`, a Server-Sent
+Events stream served by an async view: it checks the version every
+POLL_SECONDS and re-reads the day's counter rows only when it moved, so
+with a shared cache (CACHE_URL) an idle stream runs no queries. With the
+per-process default cache the bump is also written to a ChangeMarker row
+and streams read that row by primary key every LOCAL_CHECK_SECONDS.
+Streaming needs the ASGI entry point (ninja_backend.asgi); under WSGI
+Django would buffer the whole stream.
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..core.caching import bump_marker, cache_is_shared, read_markers
+from .reservations import PARTY, SESSION, _as_date, _as_time
+
+COUNT_FIELDS = ('adults', 'kids', 'spectators')
+VERSION_KEY = 'occupancy:version'
+SEEN_KEY = 'occupancy:seen'
+MARKER = 'occupancy'
+POLL_SECONDS = 1
+# Between database checks when the cache is not shared
+LOCAL_CHECK_SECONDS = 5
+HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource reconnects on its own
+STREAM_SECONDS = 5 * 60
+
+
+def snapshot(kind, values):
+    """A booking's contribution, or None when it has not arrived"""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name, None)
+    if not get('arrived') or not get('date') or not get('time'):
+        return None
+    return {
+        'date': _as_date(get('date')),
+        'time': _as_time(get('time')),
+        'adults': int(get('adults') or 0),
+        'kids': int(get('kids') or 0),
+        'spectators': int(get('spectators') or 0) if kind == SESSION else 0,
+    }
+
+
+def snapshot_fields(kind):
+    fields = ['arrived', 'date', 'time', 'adults', 'kids']
+    return fields + ['spectators'] if kind == SESSION else fields
+
+
+def _add(deltas, kind, snap, sign):
+    if snap:
+        row = deltas[(snap['date'], snap['time'], kind)]
+        for field in COUNT_FIELDS:
+            row[field] += sign * snap[field]
+
+
+def _bump_local_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key missing; a clock seed differs from any old version
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _bump_version():
+    _bump_local_version()
+    if not cache_is_shared():
+        # Tell the other processes (see _sync_from_database)
+        bump_marker(MARKER)
+
+
+def occupancy_changed():
+    """Wake the open streams once the transaction commits."""
+    transaction.on_commit(_bump_version)
+
+
+def _sync_from_database():
+    """Bump this process's version if another process changed the counters."""
+    version = read_markers([MARKER])[MARKER]
+    if cache.get(SEEN_KEY) != version:
+        cache.set(SEEN_KEY, version, None)
+        _bump_local_version()
+
+
+def _apply(deltas):
+    from .models import SlotOccupancy
+
+    for (day, slot, kind), row in deltas.items():
+        changes = {field: value for field, value in row.items() if value}
+        if not changes:
+            continue
+        rows = SlotOccupancy.objects.filter(date=day, time=slot, kind=kind)
+        increments = {field: F(field) + value for field, value in changes.items()}
+        if rows.update(updated_at=timezone.now(), **increments):
+            continue
+        try:
+            with transaction.atomic():
+                SlotOccupancy.objects.create(date=day, time=slot, kind=kind, **changes)
+        except IntegrityError:
+            # Another writer created the row first
+            rows.update(updated_at=timezone.now(), **increments)
+    if any(any(row.values()) for row in deltas.values()):
+        occupancy_changed()
+
+
+def apply_change(kind, old=None, new=None):
+    """
+    Move a booking's contribution from its `old` snapshot to its `new` one.
+    Pass old=None for inserts and new=None for deletes.
+    """
+    if old == new:
+        return
+    deltas = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))
+    _add(deltas, kind, old, -1)
+    _add(deltas, kind, new, 1)
+    _apply(deltas)
+
+
+def apply_arrivals(kind, rows):
+    """Count bookings that were just checked in (rows from .values())"""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))
+    for row in rows:
+        _add(deltas, kind, snapshot(kind, dict(row, arrived=True)), 1)
+    _apply(deltas)
+
+
+def rebuild_occupancy(booking_model=None, party_model=None, occupancy_model=None):
+    """
+    Recompute the table from the arrived bookings. Models can be passed
+    so migrations can use historical models. Returns the rows written.
+    """
+    live = occupancy_model is None
+    if booking_model is None or party_model is None or occupancy_model is None:
+        from .models import Booking, PartyBooking, SlotOccupancy
+        booking_model = booking_model or Booking
+        party_model = party_model or PartyBooking
+        occupancy_model = occupancy_model or SlotOccupancy
+
+    rows = []
+    for model, kind in ((booking_model, SESSION), (party_model, PARTY)):
+        fields = [field for field in COUNT_FIELDS if kind == SESSION or field != 'spectators']
+        grouped = (
+            model.objects.filter(arrived=True).order_by()
+            .values('date', 'time')
+            .annotate(**{f'total_{field}': Sum(field) for field in fields})
+        )
+        for row in grouped:
+            counts = {field: row.get(f'total_{field}') or 0 for field in fields}
+            rows.append(occupancy_model(date=row['date'], time=row['time'], kind=kind, **counts))
+    with transaction.atomic():
+        occupancy_model.objects.all().delete()
+        occupancy_model.objects.bulk_create(rows, batch_size=500)
+    if live:
+        # Migrations run before the change marker table may exist
+        occupancy_changed()
+    return len(rows)
+
+
+def day_occupancy(day=None):
+    """Totals and per-slot counts of people checked in on `day` (today)"""
+    from .models import SlotOccupancy
+
+    day = day or timezone.localdate()
+    slots = [
+        {
+            'time': row.time.strftime('%H:%M'),
+            'kind': row.kind,
+            **{field: getattr(row, field) for field in COUNT_FIELDS},
+        }
+        for row in SlotOccupancy.objects.filter(date=day).order_by('time', 'kind')
+        if row.adults or row.kids or row.spectators
+    ]
+    totals = {field: sum(slot[field] for slot in slots) for field in COUNT_FIELDS}
+    totals['total'] = sum(totals.values())
+    return {'date': day.isoformat(), 'totals': totals, 'slots': slots}
+
+
+def sse_event(data, event='occupancy'):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def stream_events(day=None, poll=POLL_SECONDS, duration=STREAM_SECONDS, heartbeat=HEARTBEAT_SECONDS,
+                        local_check=LOCAL_CHECK_SECONDS):
+    """
+    Yield an SSE event with the day's occupancy now and whenever it
+    changes. The counters are re-read only when the version moved;
+    without a shared cache the change marker is read every `local_check`
+    seconds (see _sync_from_database).
+    """
+    from asgiref.sync import sync_to_async
+
+    read = sync_to_async(day_occupancy)
+    sync = sync_to_async(_sync_from_database)
+    shared = cache_is_shared()
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + duration
+    last, quiet_since = None, loop.time()
+    version, synced_at = None, None
+    # Ask EventSource to reconnect quickly when the stream ends
+    yield f'retry: {int(poll * 1000)}\n\n'
+    while True:
+        if not shared and (synced_at is None or loop.time() - synced_at >= local_check):
+            synced_at = loop.time()
+            await sync()
+        seen, version = version, await cache.aget(VERSION_KEY)
+        current = await read(day) if last is None or version != seen else last
+        if current != last:
+            last, quiet_since = current, loop.time()
+            yield sse_event(current)
+        elif loop.time() - quiet_since >= heartbeat:
+            quiet_since = loop.time()
+            # Comment line: keeps proxies from closing an idle stream
+            yield ': keepalive\n\n'
+        if loop.time() >= ends_at:
+            return
+        await asyncio.sleep(poll)
@@ -0,0 +1,52 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from . import occupancy
+from .permissions import IsStaffUser, authenticate_staff
+
+
+def _day(request):
+    value = request.GET.get('date')
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError('date must be YYYY-MM-DD')
+    return day
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffUser])
+def occupancy_view(request):
+    """People checked in per slot on ?date= (default today)"""
+    try:
+        day = _day(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(occupancy.day_occupancy(day))
+
+
+async def occupancy_stream_view(request):
+    """
+    Server-Sent Events stream of ?date='s occupancy (default today): an
+    `occupancy` event now and on every change, for EventSource clients.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    _, status = await sync_to_async(authenticate_staff)(request)
+    if status:
+        message = 'Authentication required' if status == 401 else 'Permission denied'
+        return JsonResponse({'error': message}, status=status)
+    try:
+        day = _day(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(occupancy.stream_events(day), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx / Azure front ends from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
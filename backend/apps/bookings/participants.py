@@ -0,0 +1,183 @@
+"""
+Participant ingestion for party bookings.
+
+The party wizard posts every adult and minor in one payload. The payload
+is validated once, then diffed against the waivers already stored for the
+booking: matching rows (same name and email) are updated in place, new
+participants are inserted and dropped ones removed, using one
+bulk_create / bulk_update / delete each inside a single transaction. The
+primary adult's waiver carries the minors and the other adults in its
+legacy JSON fields, as before.
+
+A waiver's signed_at is when its current contents were submitted: new and
+updated rows get the submission time, while a participant re-submitted
+unchanged keeps the time they first signed.
+"""
+import time
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import search, waiver_pdf
+from .models import Waiver
+
+WAIVER_VERSION = '1.0'
+
+# Fields compared between a stored waiver and the submitted participant
+DIFF_FIELDS = ['phone', 'dob', 'is_primary_signer', 'minors', 'adults', 'customer_id', 'ip_address']
+
+
+class ParticipantError(ValueError):
+    pass
+
+
+def _dob(value, label):
+    if value in (None, ''):
+        return None
+    if isinstance(value, date):
+        return value
+    parsed = parse_date(str(value))
+    if parsed is None:
+        raise ParticipantError(f'{label}: invalid date of birth "{value}"')
+    return parsed
+
+
+def _clean_adult(adult, index):
+    if not isinstance(adult, dict):
+        raise ParticipantError(f'adults[{index}] must be an object')
+    name = (adult.get('name') or '').strip()
+    if not name:
+        raise ParticipantError(f'adults[{index}]: name is required')
+    return {
+        'name': name,
+        'email': (adult.get('email') or '').strip() or None,
+        'phone': adult.get('phone') or None,
+        'dob': _dob(adult.get('dob'), f'adults[{index}]'),
+        'is_primary': bool(adult.get('is_primary', False)),
+    }
+
+
+def validate_participants(participants):
+    """
+    Check the submitted payload and split it into
+    (primary adult, additional adults, raw additional adults, minors).
+    """
+    if not isinstance(participants, dict):
+        raise ParticipantError('participants must be an object with adults and minors')
+    adults = participants.get('adults') or []
+    minors = participants.get('minors') or []
+    if not isinstance(adults, list) or not isinstance(minors, list):
+        raise ParticipantError('adults and minors must be lists')
+    for index, minor in enumerate(minors):
+        if not isinstance(minor, dict) or not (minor.get('name') or '').strip():
+            raise ParticipantError(f'minors[{index}]: name is required')
+
+    cleaned = [_clean_adult(adult, index) for index, adult in enumerate(adults)]
+    if not cleaned:
+        return None, [], [], minors
+    # The last adult marked primary wins, otherwise the first adult signs
+    primary_index = max((i for i, adult in enumerate(cleaned) if adult['is_primary']), default=0)
+    primary = cleaned[primary_index]
+    others = [adult for i, adult in enumerate(cleaned) if i != primary_index]
+    raw_others = [adult for i, adult in enumerate(adults) if i != primary_index]
+    return primary, others, raw_others, minors
+
+
+def _key(name, email):
+    return (name or '').strip().lower(), (email or '').strip().lower()
+
+
+def ingest_party_participants(party_booking, participants, waiver_signed=False, ip_address=None):
+    """
+    Store the participants on `party_booking` and bring its waivers in line.
+    Returns a summary with created/updated/deleted/unchanged counts and
+    timings in milliseconds. Raises ParticipantError for a bad payload.
+    """
+    started = time.perf_counter()
+    primary, others, raw_others, minors = validate_participants(participants)
+    validated = time.perf_counter()
+
+    desired = []
+    if primary:
+        desired.append(dict(primary, is_primary_signer=True, minors=minors, adults=raw_others))
+    desired.extend(dict(adult, is_primary_signer=False, minors=None, adults=None) for adult in others)
+
+    with transaction.atomic():
+        now = timezone.now()
+        party_booking.participants = participants
+        party_booking.waiver_signed = waiver_signed
+        update_fields = ['participants', 'waiver_signed', 'updated_at']
+        if waiver_signed:
+            party_booking.waiver_signed_at = now
+            party_booking.waiver_ip_address = ip_address
+            update_fields += ['waiver_signed_at', 'waiver_ip_address']
+        party_booking.save(update_fields=update_fields)
+
+        existing = {}
+        stale = []
+        for waiver in Waiver.objects.filter(party_booking=party_booking).order_by('id'):
+            key = _key(waiver.name, waiver.email)
+            if key in existing:
+                stale.append(waiver.pk)  # Duplicate left by older clients
+            else:
+                existing[key] = waiver
+        loaded = time.perf_counter()
+
+        to_create, to_update, unchanged = [], [], 0
+        for row in desired:
+            values = {
+                'phone': row['phone'],
+                'dob': row['dob'],
+                'is_primary_signer': row['is_primary_signer'],
+                'minors': row['minors'],
+                'adults': row['adults'],
+                'customer_id': party_booking.customer_id,
+                'ip_address': ip_address,
+            }
+            waiver = existing.pop(_key(row['name'], row['email']), None)
+            if waiver is None:
+                to_create.append(Waiver(
+                    name=row['name'], email=row['email'], participant_type='ADULT',
+                    party_booking=party_booking, version=WAIVER_VERSION, **values
+                ))
+            elif any(getattr(waiver, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(waiver, field, value)
+                waiver.updated_at = waiver.signed_at = now
+                to_update.append(waiver)
+            else:
+                unchanged += 1
+        stale.extend(waiver.pk for waiver in existing.values())
+        diffed = time.perf_counter()
+
+        if stale:
+            Waiver.objects.filter(pk__in=stale).delete()
+            search.remove_objects(Waiver, stale)
+        if to_update:
+            Waiver.objects.bulk_update(to_update, DIFF_FIELDS + ['signed_at', 'updated_at'])
+        if to_create:
+            Waiver.objects.bulk_create(to_create)
+        # Bulk writes skip post_save, so refresh search tokens and drop
+        # the cached PDFs of changed and removed waivers here
+        search.index_objects(to_update + to_create, kind='waiver')
+        evicted = stale + [waiver.pk for waiver in to_update]
+        if evicted:
+            transaction.on_commit(lambda: waiver_pdf.evict(evicted))
+    finished = time.perf_counter()
+
+    return {
+        'waiver_count': len(desired) + len(minors),
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(stale),
+        'unchanged': unchanged,
+        'timings_ms': {
+            'validate': round((validated - started) * 1000, 2),
+            'load': round((loaded - validated) * 1000, 2),
+            'diff': round((diffed - loaded) * 1000, 2),
+            'write': round((finished - diffed) * 1000, 2),
+            'total': round((finished - started) * 1000, 2),
+        },
+    }
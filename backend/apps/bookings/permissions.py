@@ -1,7 +1,9 @@
 """
 Custom permissions for the Ninja Inflatable Park application.
 """
-from rest_framework import permissions
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 
 
 class IsStaffUser(permissions.BasePermission):
@@ -23,3 +25,21 @@ class IsSuperAdminOnly(permissions.BasePermission):
     """
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.is_superuser
+
+
+def authenticate_staff(request):
+    """
+    (user, None) for a staff request to a plain Django view (e.g. an async
+    streaming view), else (None, 401 or 403). Uses the same authentication
+    classes and staff check as the DRF views.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.AuthenticationFailed:
+        return None, 401
+    if not user.is_authenticated:
+        return None, 401
+    if not IsStaffUser().has_permission(drf_request, None):
+        return None, 403
+    return user, None
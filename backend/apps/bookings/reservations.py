@@ -0,0 +1,260 @@
+"""
+Race-free slot reservations backed by SlotCapacity counters.
+
+Every booking takes its places from one counter row per slot it covers
+(a two hour session covers two hourly slots) inside the transaction that
+inserts the booking. The increment is a single conditional UPDATE
+(`taken <= capacity - n`), so two workers can never both take the last
+places. On PostgreSQL the rows are additionally locked with
+select_for_update in slot order, which serialises checkouts for the same
+slot without deadlocks; SQLite relies on the conditional UPDATE alone.
+
+Holds take places the same way but expire: checkout can hold places
+first and pass the hold token when the booking is created. Expired holds
+are released by the `release_expired_holds` command and lazily whenever
+a full slot is asked for more places.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from .availability import CANCELLED, covered_slots, slot_times
+from .models import Booking, PartyBooking, SlotCapacity, SlotHold
+
+SESSION = 'SESSION'
+PARTY = 'PARTY'
+
+HOLD_TTL = timedelta(minutes=10)
+# Largest single hold; more places than a checkout can plausibly need
+MAX_HOLD_QUANTITY = 50
+# Counter capacity for slots without a limit (parties_per_slot left empty)
+UNLIMITED = 2 ** 31 - 1
+
+
+class SlotUnavailable(Exception):
+    """Raised when a slot has fewer places left than requested."""
+
+
+def _as_date(value):
+    return parse_date(value) if isinstance(value, str) else value
+
+
+def _as_time(value):
+    if isinstance(value, str):
+        parsed = parse_time(value)
+        if parsed is None:
+            # Party slots arrive as "12:00 PM"
+            parsed = datetime.strptime(value.strip(), '%I:%M %p').time()
+        return parsed
+    return value
+
+
+def _configs():
+    from apps.cms.models import SessionBookingConfig, PartyBookingConfig
+    return SessionBookingConfig.get_config(), PartyBookingConfig.get_config()
+
+
+def capacity_for(kind, session_config=None, party_config=None):
+    if kind == SESSION:
+        return (session_config or _configs()[0]).slot_capacity
+    limit = (party_config or _configs()[1]).parties_per_slot
+    return UNLIMITED if limit is None else limit
+
+
+def slots_for(kind, day, start, duration=None, session_config=None):
+    """Slot start times a booking of `kind` at (day, start) occupies."""
+    if kind == PARTY:
+        return [start]
+    config = session_config or _configs()[0]
+    slot_minutes = config.duration_minutes or 60
+    return covered_slots(day, start, duration or slot_minutes, slot_times(config), slot_minutes) or [start]
+
+
+def _booked(kind, day, slot, session_config):
+    """Places already used by stored bookings, for a counter's first value."""
+    if kind == PARTY:
+        return PartyBooking.objects.filter(date=day, time=slot).exclude(status='CANCELLED').count()
+    slot_minutes = session_config.duration_minutes or 60
+    total = 0
+    rows = (
+        Booking.objects.filter(date=day).exclude(CANCELLED).order_by()
+        .values('time', 'duration').annotate(jumpers=Sum(F('adults') + F('kids')))
+    )
+    for row in rows:
+        if slot in covered_slots(day, row['time'], row['duration'] or slot_minutes, [slot], slot_minutes):
+            total += row['jumpers'] or 0
+    return total
+
+
+def _counter(kind, day, slot, capacity, session_config):
+    """Return the counter's pk, creating it from current bookings if needed."""
+    existing = SlotCapacity.objects.filter(kind=kind, date=day, time=slot).values_list('pk', flat=True).first()
+    if existing:
+        return existing
+    try:
+        with transaction.atomic():
+            return SlotCapacity.objects.create(
+                kind=kind, date=day, time=slot, capacity=capacity,
+                taken=_booked(kind, day, slot, session_config),
+            ).pk
+    except IntegrityError:
+        # Another worker created it first
+        return SlotCapacity.objects.get(kind=kind, date=day, time=slot).pk
+
+
+def _release_expired(slot_ids, now=None):
+    """Give back the places of expired holds on the given counters."""
+    expired = SlotHold.objects.filter(slot_id__in=slot_ids, expires_at__lte=now or timezone.now())
+    released = 0
+    for hold in expired.values('pk', 'slot_id', 'quantity'):
+        # Only the worker whose DELETE hits the row returns its places
+        if SlotHold.objects.filter(pk=hold['pk']).delete()[0]:
+            _give_back([hold['slot_id']], hold['quantity'])
+            released += 1
+    return released
+
+
+def _take(counter_ids, quantity, capacity, force=False):
+    """Take `quantity` places on every counter or raise SlotUnavailable."""
+    counters = SlotCapacity.objects.filter(pk__in=counter_ids)
+    if connection.features.has_select_for_update:
+        list(counters.select_for_update().order_by('date', 'time', 'kind').values_list('pk', flat=True))
+
+    for pk in counter_ids:
+        row = SlotCapacity.objects.filter(pk=pk)
+        increment = {'taken': F('taken') + quantity, 'capacity': capacity, 'updated_at': timezone.now()}
+        if force:
+            row.update(**increment)
+            continue
+        available = row.filter(taken__lte=capacity - quantity)
+        if available.update(**increment):
+            continue
+        if _release_expired([pk]) and available.update(**increment):
+            continue
+        raise SlotUnavailable('Not enough places left in this slot')
+
+
+def _give_back(counter_ids, quantity):
+    SlotCapacity.objects.filter(pk__in=counter_ids).update(
+        taken=Greatest(F('taken') - quantity, 0), updated_at=timezone.now()
+    )
+
+
+def _counters_for(kind, day, start, duration):
+    session_config, party_config = _configs()
+    day, start = _as_date(day), _as_time(start)
+    capacity = capacity_for(kind, session_config, party_config)
+    slots = slots_for(kind, day, start, duration, session_config)
+    return [_counter(kind, day, slot, capacity, session_config) for slot in sorted(slots)], capacity
+
+
+def quantity_for(kind, adults=0, kids=0):
+    """Places a booking uses: jumpers for sessions, one per party."""
+    if kind == PARTY:
+        return 1
+    return int(adults or 0) + int(kids or 0)
+
+
+def hold(kind, day, start, quantity, duration=None, ttl=HOLD_TTL):
+    """Hold places for checkout. Returns (token, expires_at)."""
+    if quantity <= 0:
+        raise ValueError('Nothing to hold')
+    if quantity > MAX_HOLD_QUANTITY:
+        raise ValueError(f'At most {MAX_HOLD_QUANTITY} places can be held at once')
+    with transaction.atomic():
+        counter_ids, capacity = _counters_for(kind, day, start, duration)
+        _take(counter_ids, quantity, capacity)
+        expires_at = timezone.now() + ttl
+        holds = [SlotHold(slot_id=pk, quantity=quantity, expires_at=expires_at) for pk in counter_ids]
+        token = holds[0].token
+        for item in holds:
+            item.token = token
+        SlotHold.objects.bulk_create(holds)
+    return token, expires_at
+
+
+def release_hold(token):
+    """Release an unconsumed hold. Returns True if anything was released."""
+    released = False
+    with transaction.atomic():
+        for item in SlotHold.objects.filter(token=token).values('pk', 'slot_id', 'quantity'):
+            if SlotHold.objects.filter(pk=item['pk']).delete()[0]:
+                _give_back([item['slot_id']], item['quantity'])
+                released = True
+    return released
+
+
+def reserve(kind, day, start, quantity, duration=None, hold_token=None, force=False):
+    """
+    Take places for a booking about to be inserted. Call inside the
+    transaction that creates the booking so a failed insert gives them back.
+    A live hold for the same slots and quantity is consumed instead of
+    taking new places; anything else about the hold is released first.
+    `force` skips the capacity check (staff overbooking).
+    """
+    if quantity <= 0:
+        return
+    counter_ids, capacity = _counters_for(kind, day, start, duration)
+    if hold_token:
+        live = SlotHold.objects.filter(token=hold_token, expires_at__gt=timezone.now())
+        held = {row['slot_id']: row['quantity'] for row in live.values('slot_id', 'quantity')}
+        if held == {pk: quantity for pk in counter_ids} and live.delete()[0] == len(counter_ids):
+            return
+        release_hold(hold_token)
+    _take(counter_ids, quantity, capacity, force=force)
+
+
+def release_expired_holds(now=None):
+    """Release every expired hold. Returns the number of hold rows released."""
+    slot_ids = SlotHold.objects.filter(expires_at__lte=now or timezone.now()).values_list('slot_id', flat=True).distinct()
+    return _release_expired(list(slot_ids), now)
+
+
+def booking_snapshot(kind, values):
+    """Reduce a booking to what its reservation depends on."""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name, None)
+    if kind == SESSION:
+        cancelled = 'CANCELLED' in (get('booking_status'), get('status'))
+        duration = get('duration')
+    else:
+        cancelled = get('status') == 'CANCELLED'
+        duration = None
+    return {
+        'date': _as_date(get('date')),
+        'time': _as_time(get('time')),
+        'duration': duration,
+        'quantity': 0 if cancelled else quantity_for(kind, get('adults'), get('kids')),
+    }
+
+
+def snapshot_fields(kind):
+    if kind == SESSION:
+        return ['date', 'time', 'duration', 'adults', 'kids', 'status', 'booking_status']
+    return ['date', 'time', 'adults', 'kids', 'status']
+
+
+def _existing_counters(kind, snap):
+    if not snap or not snap['quantity'] or not snap['date'] or not snap['time']:
+        return []
+    slots = slots_for(kind, snap['date'], snap['time'], snap['duration'])
+    return list(SlotCapacity.objects.filter(kind=kind, date=snap['date'], time__in=slots).values_list('pk', flat=True))
+
+
+def apply_change(kind, old, new):
+    """
+    Move a stored booking's places after an edit, cancellation or delete.
+    Only counters that already exist are touched; new ones start from the
+    bookings table. Edits are applied without a capacity check.
+    """
+    if old == new:
+        return
+    old_ids = _existing_counters(kind, old)
+    if old_ids:
+        _give_back(old_ids, old['quantity'])
+    new_ids = _existing_counters(kind, new)
+    if new_ids:
+        SlotCapacity.objects.filter(pk__in=new_ids).update(taken=F('taken') + new['quantity'])
@@ -0,0 +1,254 @@
+"""
+Search for customers, session bookings, party bookings and waivers.
+
+`search(queryset, query)` filters a queryset of any of those models so that
+every word of `query` matches one of the model's search fields, and
+annotates `search_rank` (higher is better). Two backends implement it:
+
+- TrigramBackend (PostgreSQL): substring matches served by pg_trgm GIN
+  indexes (created in migration 0016), ranked by trigram similarity.
+- TokenBackend (everything else, i.e. SQLite in development): a
+  SearchToken table of normalized terms kept up to date by signals and
+  matched by prefix with index range scans instead of LIKE '%...%'.
+
+Phones are compared as digits only, so "+91 98765-43210", "9876543210"
+and "98765" all find the same booking. Booking references match on a
+prefix of the UUID with or without dashes.
+
+SEARCH_BACKEND ('auto', 'trigram' or 'tokens') overrides the choice;
+`rebuild_search_index` refills the token table.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (
+    Case, CharField, Exists, F, Func, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Replace
+
+from .models import Booking, Customer, PartyBooking, SearchToken, Waiver
+
+# kind -> (model, {field: weight})
+SEARCH_FIELDS = {
+    'customer': (Customer, {'name': 3, 'email': 4, 'phone': 4}),
+    'booking': (Booking, {'name': 3, 'email': 4, 'phone': 4, 'uuid': 5}),
+    'party_booking': (PartyBooking, {'name': 3, 'email': 4, 'phone': 4, 'uuid': 5, 'birthday_child_name': 2}),
+    'waiver': (Waiver, {'name': 3, 'email': 4, 'phone': 4}),
+}
+KIND_FOR_MODEL = {model: kind for kind, (model, _) in SEARCH_FIELDS.items()}
+
+MAX_TOKEN_LENGTH = 100
+# Sorts after every real character, so [term, term + PREFIX_END) is "starts with term"
+PREFIX_END = '\U0010ffff'
+PHONE_RE = re.compile(r'^\+?[\d\s().-]{4,}$')
+UUID_RE = re.compile(r'^[0-9a-f-]{6,36}$')
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_phone(value):
+    """
+    Digits only. The national number (without country code or leading
+    zeros) and the last four digits are kept too, since staff often search
+    by those.
+    """
+    digits = re.sub(r'\D', '', value or '')
+    variants = {digits} if digits else set()
+    if len(digits) > 10:
+        variants.add(digits[-10:])
+    if len(digits) > 4:
+        variants.add(digits[-4:])
+    if digits.startswith('0'):
+        variants.add(digits.lstrip('0'))
+    return variants - {''}
+
+
+def field_tokens(field, value):
+    """Normalized tokens for one field value"""
+    if value is None or value == '':
+        return set()
+    value = str(value).lower()
+    if field == 'phone':
+        return normalize_phone(value)
+    if field == 'uuid':
+        return {value.replace('-', '')}
+    tokens = set(WORD_RE.findall(value))
+    if field == 'email':
+        local, _, domain = value.partition('@')
+        tokens |= {value, local, domain}
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens if token}
+
+
+def query_terms(query):
+    """Split a search string into normalized terms that must all match"""
+    query = (query or '').strip()
+    if PHONE_RE.match(query) and sum(c.isdigit() for c in query) >= 4 and ' ' in query:
+        # A phone number typed with spaces is one term
+        return [re.sub(r'\D', '', query).lstrip('0') or '0']
+    terms = []
+    for part in query.lower().split():
+        if PHONE_RE.match(part) and sum(c.isdigit() for c in part) >= 4:
+            terms.append(re.sub(r'\D', '', part).lstrip('0') or '0')
+        elif '@' in part:
+            terms.append(part)
+        elif UUID_RE.match(part) and '-' in part:
+            terms.append(part.replace('-', ''))
+        else:
+            terms.extend(WORD_RE.findall(part))
+    return list(dict.fromkeys(term[:MAX_TOKEN_LENGTH] for term in terms if term))
+
+
+def build_tokens(kind, obj):
+    """{token: weight} for one object (any object with the kind's fields)"""
+    _, fields = SEARCH_FIELDS[kind]
+    tokens = {}
+    for field, weight in fields.items():
+        for token in field_tokens(field, getattr(obj, field, None)):
+            tokens[token] = max(weight, tokens.get(token, 0))
+    return tokens
+
+
+class TokenBackend:
+    maintains_tokens = True
+
+    def _prefix(self, term):
+        return Q(token__gte=term, token__lt=term + PREFIX_END)
+
+    def filter(self, queryset, kind, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        tokens = SearchToken.objects.filter(kind=kind, object_id=OuterRef('pk'))
+        for term in terms:
+            queryset = queryset.filter(Exists(tokens.filter(self._prefix(term))))
+
+        any_term = Q()
+        for term in terms:
+            any_term |= self._prefix(term)
+        rank = (
+            tokens.filter(any_term)
+            .values('object_id')
+            # Whole-token matches count double
+            .annotate(score=Sum(Case(
+                When(token__in=terms, then=F('weight') * 2), default=F('weight'), output_field=IntegerField(),
+            )))
+            .values('score')[:1]
+        )
+        return queryset.annotate(search_rank=Coalesce(Subquery(rank, output_field=IntegerField()), 0))
+
+    def index(self, kind, objects):
+        """Replace the tokens of `objects`"""
+        objects = list(objects)
+        if not objects:
+            return
+        rows = [
+            SearchToken(kind=kind, object_id=obj.pk, token=token, weight=weight)
+            for obj in objects
+            for token, weight in build_tokens(kind, obj).items()
+        ]
+        with transaction.atomic():
+            SearchToken.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).delete()
+            SearchToken.objects.bulk_create(rows, batch_size=500)
+
+    def remove(self, kind, ids):
+        SearchToken.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+class PhoneDigits(Func):
+    """Phone number with everything but digits stripped (PostgreSQL)"""
+    function = 'REGEXP_REPLACE'
+    template = "%(function)s(%(expressions)s, '\\D', '', 'g')"
+
+
+class TrigramBackend:
+    maintains_tokens = False
+
+    def filter(self, queryset, kind, query):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        _, fields = SEARCH_FIELDS[kind]
+        text_fields = [field for field in fields if field not in ('phone', 'uuid')]
+        if 'phone' in fields:
+            queryset = queryset.annotate(_phone_digits=PhoneDigits('phone'))
+        if 'uuid' in fields:
+            queryset = queryset.annotate(_uuid_hex=Replace(Cast('uuid', CharField()), Value('-'), Value('')))
+
+        for term in terms:
+            match = Q()
+            for field in text_fields:
+                match |= Q(**{f'{field}__icontains': term})
+            if 'phone' in fields and term.isdigit():
+                match |= Q(_phone_digits__contains=term)
+            if 'uuid' in fields:
+                match |= Q(_uuid_hex__startswith=term)
+            queryset = queryset.filter(match)
+
+        query_text = ' '.join(terms)
+        similarities = [
+            TrigramSimilarity(field, query_text) * weight
+            for field, weight in fields.items() if field in text_fields
+        ]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return queryset.annotate(search_rank=rank)
+
+    def index(self, kind, objects):
+        pass
+
+    def remove(self, kind, ids):
+        pass
+
+
+def get_backend():
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if choice == 'trigram' or (choice == 'auto' and connection.vendor == 'postgresql'):
+        return TrigramBackend()
+    return TokenBackend()
+
+
+def search(queryset, query):
+    """Filter `queryset` by `query` and annotate `search_rank`"""
+    return get_backend().filter(queryset, KIND_FOR_MODEL[queryset.model], query)
+
+
+def index_objects(objects, kind=None):
+    """Refresh search tokens for saved objects (no-op with pg_trgm)"""
+    objects = list(objects)
+    if objects:
+        get_backend().index(kind or KIND_FOR_MODEL[type(objects[0])], objects)
+
+
+def remove_objects(model, ids):
+    get_backend().remove(KIND_FOR_MODEL[model], ids)
+
+
+def rebuild_index(kind, model=None, batch_size=1000):
+    """Recreate the tokens of every row of `kind`; returns the row count"""
+    backend = get_backend()
+    if not backend.maintains_tokens:
+        return 0
+    model = model or SEARCH_FIELDS[kind][0]
+    fields = list(SEARCH_FIELDS[kind][1])
+    SearchToken.objects.filter(kind=kind).delete()
+    count, last_pk = 0, 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:batch_size])
+        if not batch:
+            return count
+        backend.index(kind, batch)
+        count += len(batch)
+        last_pk = batch[-1].pk
+
+
+# (table, expression) pairs given a pg_trgm GIN index; expressions match
+# what the ORM emits for __icontains so the planner can use them
+TRIGRAM_INDEXES = [
+    (model._meta.db_table, expression)
+    for kind, (model, fields) in SEARCH_FIELDS.items()
+    for expression in (
+        [f'UPPER(("{field}")::text)' for field in fields if field not in ('phone', 'uuid')]
+        + ([r"""(REGEXP_REPLACE("phone", '\D', '', 'g'))::text"""] if 'phone' in fields else [])
+    )
+]
@@ -1,16 +1,19 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
+from . import reservations
+from .customers import resolve_customer
 from .models import Customer, Booking, Waiver, Transaction, BookingBlock, PartyBooking, SessionBookingHistory, PartyBookingHistory
 # from apps.shop.serializers import VoucherSerializer
 
 class CustomerSerializer(serializers.ModelSerializer):
-    booking_count = serializers.IntegerField(read_only=True)
-    total_spent = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    last_visit = serializers.DateField(read_only=True)
-
     class Meta:
         model = Customer
         fields = ['id', 'name', 'email', 'phone', 'notes', 'created_at', 'updated_at', 
-                  'booking_count', 'total_spent', 'last_visit']
+                  'booking_count', 'party_count', 'total_spent', 'last_visit']
+        # Maintained by the booking signals (customer_stats.py)
+        read_only_fields = ['booking_count', 'party_count', 'total_spent', 'last_visit']
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,6 +33,22 @@ class SimpleBookingSerializer(serializers.ModelSerializer):
                   'adults', 'kids', 'spectators', 'amount', 'status', 'booking_status',
                   'payment_status', 'waiver_status', 'type', 'created_at', 'updated_at']
 
+def with_booking_info(queryset):
+    """
+    Annotate a Waiver queryset with the linked booking's arrival, which
+    WaiverSerializer reports, so listing waivers joins once instead of
+    loading each waiver's booking / party booking row by row.
+    """
+    return queryset.annotate(
+        booking_arrived=Coalesce('booking__arrived', 'party_booking__arrived', Value(False)),
+        booking_arrived_at=Case(
+            When(booking__arrived=True, then=F('booking__arrived_at')),
+            When(party_booking__arrived=True, then=F('party_booking__arrived_at')),
+            default=None,
+        ),
+    )
+
+
 class WaiverSerializer(serializers.ModelSerializer):
     # booking_details = SimpleBookingSerializer(source='booking', read_only=True)  # Temporarily disabled
     # party_booking_details = serializers.SerializerMethodField()  # Temporarily disabled
@@ -61,7 +80,11 @@ class WaiverSerializer(serializers.ModelSerializer):
             }
         return None
     
+    # The arrival fields read with_booking_info() annotations when present
+    # and fall back to the related rows for single waivers
     def get_arrived(self, obj):
+        if hasattr(obj, 'booking_arrived'):
+            return obj.booking_arrived
         if obj.booking:
             return obj.booking.arrived
         elif obj.party_booking:
@@ -69,24 +92,27 @@ class WaiverSerializer(serializers.ModelSerializer):
         return False
 
     def get_arrived_at(self, obj):
+        if hasattr(obj, 'booking_arrived_at'):
+            return obj.booking_arrived_at
         if obj.booking and obj.booking.arrived:
             return obj.booking.arrived_at
         elif obj.party_booking and obj.party_booking.arrived:
             return obj.party_booking.arrived_at
         return None
     
+    # Type and reference only need the foreign key ids
     def get_booking_type(self, obj):
-        if obj.booking:
+        if obj.booking_id:
             return 'SESSION'
-        elif obj.party_booking:
+        elif obj.party_booking_id:
             return 'PARTY'
         return 'UNKNOWN'
     
     def get_booking_reference(self, obj):
-        if obj.booking:
-            return f"Session #{obj.booking.id}"
-        elif obj.party_booking:
-            return f"Party #{obj.party_booking.id}"
+        if obj.booking_id:
+            return f"Session #{obj.booking_id}"
+        elif obj.party_booking_id:
+            return f"Party #{obj.party_booking_id}"
         return "Walk-in"
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -94,6 +120,7 @@ class BookingSerializer(serializers.ModelSerializer):
     # voucher_details = VoucherSerializer(source='voucher', read_only=True)
     transactions = TransactionSerializer(many=True, read_only=True)
     waiver_status = serializers.SerializerMethodField()
+    hold_token = serializers.UUIDField(write_only=True, required=False, allow_null=True)
     # waivers = WaiverSerializer(many=True, read_only=True)  # Temporarily disabled due to IPAddressField error
 
     class Meta:
@@ -104,6 +131,7 @@ class BookingSerializer(serializers.ModelSerializer):
                   'type', 'qr_code', 'customer', 'customer_details', 'voucher', 'transactions',
                   'arrived', 'arrived_at',  # Arrival tracking
                   # 'waivers',  # Temporarily removed
+                  'hold_token',  # Slot hold from POST /bookings/holds/
                   'created_at', 'updated_at']
 
     def get_waiver_status(self, obj):
@@ -119,35 +147,37 @@ class BookingSerializer(serializers.ModelSerializer):
         name = validated_data.get('name')
         phone = validated_data.get('phone')
         
-        # Get or create customer by email
-        if email:
-            customer, created = Customer.objects.get_or_create(
-                email=email,
-                defaults={
-                    'name': name,
-                    'phone': phone
-                }
-            )
-            
-            # Update customer info if changed
-            if not created:
-                updated = False
-                if customer.name != name:
-                    customer.name = name
-                    updated = True
-                if phone and customer.phone != phone:
-                    customer.phone = phone
-                    updated = True
-                if updated:
-                    customer.save()
-            
-            # Link customer to booking
-            validated_data['customer'] = customer
-        
-        # Create booking with linked customer
-        booking = super().create(validated_data)
+        # Take the slot's places in the same transaction as the insert so
+        # concurrent checkouts cannot oversell it. Staff may overbook. The
+        # customer is resolved only once the slot is ours, so a rejected
+        # checkout leaves their record untouched.
+        hold_token = validated_data.pop('hold_token', None)
+        request = self.context.get('request')
+        with transaction.atomic():
+            try:
+                reservations.reserve(
+                    reservations.SESSION,
+                    validated_data['date'],
+                    validated_data['time'],
+                    reservations.quantity_for(reservations.SESSION, validated_data.get('adults'), validated_data.get('kids')),
+                    duration=validated_data.get('duration'),
+                    hold_token=hold_token,
+                    force=bool(request and request.user.is_staff),
+                )
+            except reservations.SlotUnavailable as e:
+                raise serializers.ValidationError({'time': str(e)})
+            # Get or create customer by email, updating their details
+            if email:
+                validated_data['customer'] = resolve_customer(email, name, phone, overwrite=True)
+            booking = Booking(**validated_data)
+            booking._slot_reserved = True
+            booking.save()
         return booking
 
+    def update(self, instance, validated_data):
+        validated_data.pop('hold_token', None)
+        return super().update(instance, validated_data)
+
 class PartyBookingSerializer(serializers.ModelSerializer):
     duration = serializers.SerializerMethodField()
     spectators = serializers.SerializerMethodField()
@@ -197,30 +227,9 @@ class PartyBookingSerializer(serializers.ModelSerializer):
         name = validated_data.get('name')
         phone = validated_data.get('phone')
         
-        # Get or create customer by email
+        # Get or create customer by email, updating their details
         if email:
-            customer, created = Customer.objects.get_or_create(
-                email=email,
-                defaults={
-                    'name': name,
-                    'phone': phone
-                }
-            )
-            
-            # Update customer info if changed
-            if not created:
-                updated = False
-                if customer.name != name:
-                    customer.name = name
-                    updated = True
-                if phone and customer.phone != phone:
-                    customer.phone = phone
-                    updated = True
-                if updated:
-                    customer.save()
-            
-            # Link customer to booking
-            validated_data['customer'] = customer
+            validated_data['customer'] = resolve_customer(email, name, phone, overwrite=True)
         
         # Create party booking with linked customer
         party_booking = super().create(validated_data)
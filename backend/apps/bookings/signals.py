@@ -1,55 +1,219 @@
 """
-Django signals to automatically create Customer records when bookings are created.
+Django signals to automatically create Customer records when bookings are created,
+and to keep the DailyBookingStats rollup, SlotCapacity counters and cached
+calendar month tiles, the customers' lifetime stats and the live occupancy
+counters in step with booking changes, and to refresh search tokens when a
+searchable row changes.
 """
 
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Booking, PartyBooking, Customer
+from .models import Booking, PartyBooking, Customer, Waiver
+from . import customer_stats, occupancy, reservations, search, stats, waiver_pdf
+from .calendar_views import invalidate_customer_tiles, invalidate_month_tiles
+from .customers import resolve_customer
 
 @receiver(pre_save, sender=Booking)
 def create_customer_for_booking(sender, instance, **kwargs):
     """
     Automatically create or link a Customer record when a Booking is created.
+    Paths that already resolved the customer (see customers.py) set it first.
     """
-    if not instance.customer and instance.email:
-        # Try to find existing customer by email
-        customer, created = Customer.objects.get_or_create(
-            email=instance.email,
-            defaults={
-                'name': instance.name,
-                'phone': instance.phone,
-            }
-        )
-        
-        # Update customer info if it was just created or if fields are empty
-        if created or not customer.name:
-            customer.name = instance.name
-            customer.phone = instance.phone
-            customer.save()
-        
-        # Link the booking to the customer
-        instance.customer = customer
+    if not instance.customer_id and instance.email:
+        instance.customer = resolve_customer(instance.email, instance.name, instance.phone)
 
 @receiver(pre_save, sender=PartyBooking)
 def create_customer_for_party_booking(sender, instance, **kwargs):
     """
     Automatically create or link a Customer record when a PartyBooking is created.
+    Paths that already resolved the customer (see customers.py) set it first.
     """
-    if not instance.customer and instance.email:
-        # Try to find existing customer by email
-        customer, created = Customer.objects.get_or_create(
-            email=instance.email,
-            defaults={
-                'name': instance.name,
-                'phone': instance.phone,
-            }
-        )
-        
-        # Update customer info if it was just created or if fields are empty
-        if created or not customer.name:
-            customer.name = instance.name
-            customer.phone = instance.phone
-            customer.save()
-        
-        # Link the booking to the customer
-        instance.customer = customer
+    if not instance.customer_id and instance.email:
+        instance.customer = resolve_customer(instance.email, instance.name, instance.phone)
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=PartyBooking)
+def remember_stats_snapshot(sender, instance, raw=False, **kwargs):
+    """
+    Capture the stored row before it is overwritten so post_save can move
+    its contribution in the daily rollup, the slot capacity counters, the
+    customer's lifetime stats and the occupancy counters.
+    """
+    kind = stats.booking_kind(instance)
+    instance._stats_snapshot = None
+    instance._slot_snapshot = None
+    instance._customer_snapshot = None
+    instance._occupancy_snapshot = None
+    instance._previous_date = None
+    if raw or not instance.pk:
+        return
+    fields = (
+        set(stats.snapshot_fields(kind))
+        | set(reservations.snapshot_fields(kind))
+        | set(customer_stats.snapshot_fields())
+        | set(occupancy.snapshot_fields(kind))
+    )
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if previous:
+        instance._stats_snapshot = stats.snapshot(kind, previous)
+        instance._slot_snapshot = reservations.booking_snapshot(kind, previous)
+        instance._customer_snapshot = customer_stats.snapshot(previous)
+        instance._occupancy_snapshot = occupancy.snapshot(kind, previous)
+        instance._previous_date = previous['date']
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+def update_daily_stats_on_save(sender, instance, raw=False, **kwargs):
+    """Keep DailyBookingStats in step with booking inserts and updates."""
+    if raw:
+        return
+    kind = stats.booking_kind(instance)
+    stats.apply_change(
+        kind,
+        old=getattr(instance, '_stats_snapshot', None),
+        new=stats.snapshot(kind, instance),
+    )
+    instance._stats_snapshot = None
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def update_daily_stats_on_delete(sender, instance, **kwargs):
+    """Remove a deleted booking's contribution from DailyBookingStats."""
+    kind = stats.booking_kind(instance)
+    stats.apply_change(kind, old=stats.snapshot(kind, instance))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+def update_customer_stats_on_save(sender, instance, raw=False, **kwargs):
+    """Move the booking's count, spend and visit date between customers."""
+    if raw:
+        return
+    customer_stats.apply_change(
+        stats.booking_kind(instance),
+        old=getattr(instance, '_customer_snapshot', None),
+        new=customer_stats.snapshot(instance),
+    )
+    instance._customer_snapshot = None
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def update_customer_stats_on_delete(sender, instance, **kwargs):
+    """Remove a deleted booking from its customer's lifetime stats."""
+    customer_stats.apply_change(stats.booking_kind(instance), old=customer_stats.snapshot(instance))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+def update_occupancy_on_save(sender, instance, raw=False, **kwargs):
+    """Count a booking in (or out of) its slot when arrival changes."""
+    if raw:
+        return
+    kind = stats.booking_kind(instance)
+    occupancy.apply_change(
+        kind,
+        old=getattr(instance, '_occupancy_snapshot', None),
+        new=occupancy.snapshot(kind, instance),
+    )
+    instance._occupancy_snapshot = None
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def update_occupancy_on_delete(sender, instance, **kwargs):
+    kind = stats.booking_kind(instance)
+    occupancy.apply_change(kind, old=occupancy.snapshot(kind, instance))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+def update_slot_capacity_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Move a booking's places when it is edited or cancelled. Inserts that
+    went through reservations.reserve() have already taken theirs.
+    """
+    if raw or (created and getattr(instance, '_slot_reserved', False)):
+        return
+    kind = stats.booking_kind(instance)
+    reservations.apply_change(
+        kind,
+        old=getattr(instance, '_slot_snapshot', None),
+        new=reservations.booking_snapshot(kind, instance),
+    )
+    instance._slot_snapshot = None
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def update_slot_capacity_on_delete(sender, instance, **kwargs):
+    """Give a deleted booking's places back to its slot counters."""
+    kind = stats.booking_kind(instance)
+    reservations.apply_change(kind, old=reservations.booking_snapshot(kind, instance), new=None)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+def invalidate_calendar_on_save(sender, instance, raw=False, **kwargs):
+    """Drop the calendar tiles for the booking's old and new month."""
+    if raw:
+        return
+    invalidate_month_tiles(stats._as_date(instance.date), getattr(instance, '_previous_date', None))
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def invalidate_calendar_on_delete(sender, instance, **kwargs):
+    invalidate_month_tiles(stats._as_date(instance.date))
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_calendar_on_customer_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Session events show the customer's name, email and phone."""
+    if raw or created:
+        return
+    if update_fields is not None and not set(update_fields) & {'name', 'email', 'phone'}:
+        return
+    invalidate_customer_tiles([instance.pk])
+
+
+@receiver(pre_delete, sender=Customer)
+def invalidate_calendar_on_customer_delete(sender, instance, **kwargs):
+    # Before SET_NULL unlinks the bookings
+    invalidate_customer_tiles([instance.pk])
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=PartyBooking)
+@receiver(post_save, sender=Waiver)
+def update_search_tokens_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    searchable = search.SEARCH_FIELDS[search.KIND_FOR_MODEL[sender]][1]
+    if update_fields is not None and not set(update_fields) & set(searchable):
+        return
+    search.index_objects([instance])
+
+
+@receiver(post_save, sender=Waiver)
+def evict_waiver_pdfs_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Cached PDFs of the old version hold personal data that just changed."""
+    if raw or created:
+        return
+    transaction.on_commit(lambda: waiver_pdf.evict([instance.pk]))
+
+
+# Not connected for Waiver: a post_delete receiver would make the bulk waiver
+# deletes in participants.py fetch and signal row by row; that code drops
+# the tokens and cached PDFs itself, WaiverViewSet evicts the PDFs of a
+# single delete, and tokens of other deleted waivers never match a row.
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=PartyBooking)
+def remove_search_tokens_on_delete(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk])
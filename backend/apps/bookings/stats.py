@@ -0,0 +1,169 @@
+"""
+Daily booking rollups for the admin dashboard.
+
+Every Booking / PartyBooking contributes to two DailyBookingStats rows:
+its visit date (bookings, revenue, pending waivers) and the day it was
+created (created). The signals in signals.py apply the difference between
+a row's old and new contribution as F() increments, so concurrent writers
+never overwrite each other. `rebuild_daily_stats` recomputes everything
+from the booking tables and is the repair path for drift (e.g. rows changed
+with queryset.update(), which bypasses signals).
+"""
+from collections import defaultdict
+from datetime import date as date_cls, datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+SESSION = 'SESSION'
+PARTY = 'PARTY'
+
+COUNTER_FIELDS = ('bookings', 'revenue', 'pending_waivers', 'created')
+
+# Per-kind definition of a "pending waiver", mirroring the dashboard rules
+PENDING_WAIVER_FILTERS = {
+    SESSION: Q(waiver_status='PENDING'),
+    PARTY: Q(waiver_signed=False),
+}
+
+
+def booking_kind(instance):
+    """Return the rollup kind for a Booking or PartyBooking instance."""
+    from .models import PartyBooking
+    return PARTY if isinstance(instance, PartyBooking) else SESSION
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if isinstance(value, date_cls):
+        return value
+    if value:
+        return parse_date(str(value))
+    return None
+
+
+def _is_pending(kind, waiver_value):
+    if kind == SESSION:
+        return waiver_value == 'PENDING'
+    return not waiver_value
+
+
+def snapshot(kind, values):
+    """
+    Reduce a booking row to the fields the rollup depends on.
+    `values` is either a model instance or a dict from .values().
+    """
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name, None)
+    waiver_field = 'waiver_status' if kind == SESSION else 'waiver_signed'
+    return {
+        'date': _as_date(get('date')),
+        'status': get('status') or '',
+        'amount': Decimal(str(get('amount') or 0)),
+        'pending': _is_pending(kind, get(waiver_field)),
+        'created_date': _as_date(get('created_at')),
+    }
+
+
+def snapshot_fields(kind):
+    """Columns to fetch when snapshotting a stored row."""
+    waiver_field = 'waiver_status' if kind == SESSION else 'waiver_signed'
+    return ['date', 'status', 'amount', waiver_field, 'created_at']
+
+
+def _contribution(snap, sign):
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    if snap is None:
+        return deltas
+    if snap['date']:
+        row = deltas[(snap['date'], snap['status'])]
+        row['bookings'] += sign
+        row['revenue'] += sign * snap['amount']
+        row['pending_waivers'] += sign if snap['pending'] else 0
+    if snap['created_date']:
+        deltas[(snap['created_date'], snap['status'])]['created'] += sign
+    return deltas
+
+
+def apply_change(kind, old=None, new=None):
+    """
+    Move a booking's contribution from its `old` snapshot to its `new` one.
+    Pass old=None for inserts and new=None for deletes.
+    """
+    from .models import DailyBookingStats
+
+    deltas = _contribution(old, -1)
+    for key, row in _contribution(new, 1).items():
+        for field, value in row.items():
+            deltas[key][field] += value
+
+    for (day, status), row in deltas.items():
+        changes = {field: value for field, value in row.items() if value}
+        if not changes:
+            continue
+        rows = DailyBookingStats.objects.filter(date=day, kind=kind, status=status)
+        increments = {field: F(field) + value for field, value in changes.items()}
+        if rows.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                DailyBookingStats.objects.create(date=day, kind=kind, status=status, **changes)
+        except IntegrityError:
+            # Another writer created the row first
+            rows.update(**increments)
+
+
+def collect_rows(model, kind, stats_model):
+    """Aggregate every row of `model` into unsaved `stats_model` instances."""
+    rows = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+
+    by_visit = (
+        model.objects.order_by()
+        .values('date', 'status')
+        .annotate(
+            bookings=Count('id'),
+            revenue=Sum('amount'),
+            pending_waivers=Count('id', filter=PENDING_WAIVER_FILTERS[kind]),
+        )
+    )
+    for row in by_visit:
+        target = rows[(row['date'], row['status'] or '')]
+        target['bookings'] = row['bookings']
+        target['revenue'] = row['revenue'] or 0
+        target['pending_waivers'] = row['pending_waivers']
+
+    by_created = (
+        model.objects.order_by()
+        .values('created_at__date', 'status')
+        .annotate(created=Count('id'))
+    )
+    for row in by_created:
+        if row['created_at__date']:
+            rows[(row['created_at__date'], row['status'] or '')]['created'] = row['created']
+
+    return [
+        stats_model(date=day, kind=kind, status=status, **counters)
+        for (day, status), counters in rows.items()
+    ]
+
+
+def rebuild_daily_stats(booking_model=None, party_model=None, stats_model=None):
+    """
+    Recompute the whole rollup table from the booking tables.
+    Models can be passed explicitly so migrations can use historical models.
+    Returns the number of rollup rows written.
+    """
+    if booking_model is None or party_model is None or stats_model is None:
+        from .models import Booking, PartyBooking, DailyBookingStats
+        booking_model = booking_model or Booking
+        party_model = party_model or PartyBooking
+        stats_model = stats_model or DailyBookingStats
+
+    rows = collect_rows(booking_model, SESSION, stats_model) + collect_rows(party_model, PARTY, stats_model)
+    with transaction.atomic():
+        stats_model.objects.all().delete()
+        stats_model.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
@@ -0,0 +1,81 @@
+"""
+Tests for session slot availability
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.bookings.models import Booking, BookingBlock
+from apps.bookings.availability import slot_availability
+from apps.cms.models import SessionBookingConfig
+
+
+def make_booking(day, slot, **overrides):
+    data = dict(name="Jumper", email="jumper@example.com", phone="1", date=day,
+                time=slot, duration=60, amount=100, adults=2, kids=1, spectators=1)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+def slots_for(data, day):
+    entry = next(d for d in data['days'] if d['date'] == day.isoformat())
+    return {slot['time']: slot for slot in entry['slots']}
+
+
+@pytest.mark.django_db
+class TestSlotAvailability:
+
+    def setup_method(self):
+        self.day = date.today() + timedelta(days=3)
+        self.config = SessionBookingConfig.get_config()
+        self.config.slot_capacity = 10
+        self.config.save()
+
+    def test_occupancy_spans_booking_duration(self):
+        make_booking(self.day, time(10, 0))
+        make_booking(self.day, time(11, 0), duration=120, adults=4, kids=0, spectators=0)
+        make_booking(self.day, time(11, 0), adults=5, booking_status='CANCELLED')
+
+        slots = slots_for(slot_availability(self.day, self.day), self.day)
+
+        assert slots['10:00']['booked'] == 3
+        assert slots['10:00']['spectators'] == 1
+        assert slots['10:00']['remaining'] == 7
+        assert slots['11:00']['booked'] == 4
+        assert slots['12:00']['booked'] == 4
+        assert slots['13:00']['booked'] == 0
+        assert slots['20:00']['available'] is True
+        assert '21:00' not in slots
+
+    def test_blocks_close_overlapping_slots(self):
+        start = timezone.make_aware(datetime.combine(self.day, time(14, 30)))
+        BookingBlock.objects.create(start_date=start, end_date=start + timedelta(hours=1), reason="Maintenance")
+        weekly = timezone.make_aware(datetime.combine(self.day - timedelta(weeks=3), time(18, 0)))
+        BookingBlock.objects.create(start_date=weekly, end_date=weekly + timedelta(hours=1),
+                                    reason="Staff training", recurring=True)
+
+        slots = slots_for(slot_availability(self.day, self.day), self.day)
+
+        assert slots['14:00']['blocked'] and slots['15:00']['blocked']
+        assert not slots['16:00']['blocked']
+        assert slots['18:00']['blocked'] and slots['18:00']['remaining'] == 0
+        assert not slots['19:00']['blocked']
+
+    def test_month_served_in_constant_queries(self):
+        for offset in range(20):
+            make_booking(self.day + timedelta(days=offset), time(12, 0))
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/bookings/availability/',
+                                  {'month': self.day.strftime('%Y-%m')})
+        assert response.status_code == 200
+        assert len(response.data['days']) >= 28
+        # Config, occupancy, holds and blocks
+        assert len(queries) <= 4
+
+    def test_rejects_bad_range(self):
+        response = APIClient().get('/api/v1/bookings/availability/',
+                                   {'start_date': '2026-01-10', 'end_date': '2026-01-01'})
+        assert response.status_code == 400
@@ -0,0 +1,106 @@
+"""
+Tests for the staff calendar endpoint
+"""
+import pytest
+from datetime import date, time
+from django.core.cache import cache
+from apps.bookings import calendar_views
+from apps.bookings.models import Booking, Customer, PartyBooking
+from apps.bookings.calendar_views import LOCAL_TILE_TIMEOUT, TILE_TIMEOUT, tile_key
+from apps.bookings.customer_backfill import CustomerBackfill
+
+
+def make_session(day, **overrides):
+    data = dict(name="Jumper", email="jumper@example.com", phone="1", date=day, time=time(10, 0),
+                duration=60, adults=2, kids=1, amount=300)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestCalendar:
+
+    def test_events_and_sql_summary(self, staff_client):
+        make_session(date(2025, 3, 4))
+        PartyBooking.objects.create(name="Party", email="p@example.com", phone="1", date=date(2025, 3, 9),
+                                    time=time(14, 0), package_name="Standard", kids=10, adults=2, amount=5000)
+        make_session(date(2025, 4, 1))
+
+        response = staff_client.get('/api/v1/bookings/calendar/', {'start_date': '2025-03-01', 'end_date': '2025-03-31'})
+        data = response.json()
+        assert [event['id'] for event in data['events']][0].startswith('session-')
+        assert data['summary'] == {
+            'totalBookings': 2, 'sessionBookings': 1, 'partyBookings': 1,
+            'totalRevenue': 5300.0, 'totalParticipants': 15,
+        }
+        party = data['events'][1]
+        assert party['end'] == '2025-03-09T17:00:00'
+        assert party['packageName'] == 'Standard'
+
+    def test_past_month_tile_cached_and_invalidated(self, staff_client, django_assert_num_queries):
+        booking = make_session(date(2025, 3, 4))
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        staff_client.get('/api/v1/bookings/calendar/', params)
+        assert cache.get(tile_key(date(2025, 3, 1))) is not None
+
+        # Session/auth lookups only; no booking queries
+        with django_assert_num_queries(2):
+            staff_client.get('/api/v1/bookings/calendar/', params)
+
+        booking.date = date(2025, 5, 2)
+        booking.save()
+        assert cache.get(tile_key(date(2025, 3, 1))) is None
+        data = staff_client.get('/api/v1/bookings/calendar/', params).json()
+        assert data['summary']['totalBookings'] == 0
+
+    def test_tile_rebuilt_before_commit_is_dropped(self, staff_client, django_capture_on_commit_callbacks):
+        booking = make_session(date(2025, 3, 4))
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        with django_capture_on_commit_callbacks(execute=True):
+            booking.amount = 500
+            booking.save()
+            # Another request caches the month before the save commits
+            staff_client.get('/api/v1/bookings/calendar/', params)
+            assert cache.get(tile_key(date(2025, 3, 1))) is not None
+        assert cache.get(tile_key(date(2025, 3, 1))) is None
+
+    def test_per_process_tiles_expire_quickly(self, monkeypatch):
+        assert calendar_views._tile_timeout() == LOCAL_TILE_TIMEOUT
+        monkeypatch.setattr(calendar_views, 'cache_is_shared', lambda: True)
+        assert calendar_views._tile_timeout() == TILE_TIMEOUT
+
+    def test_customer_changes_drop_their_tiles(self, staff_client, django_capture_on_commit_callbacks):
+        make_session(date(2025, 3, 4))
+        customer = Customer.objects.get()
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        staff_client.get('/api/v1/bookings/calendar/', params)
+
+        customer.name = "Renamed"
+        customer.save()
+        data = staff_client.get('/api/v1/bookings/calendar/', params).json()
+        assert data['events'][0]['customerName'] == "Renamed"
+
+        # The booking form's upsert bypasses post_save
+        with django_capture_on_commit_callbacks(execute=True):
+            response = staff_client.post('/api/v1/bookings/bookings/', dict(
+                name="Jumper Again", email="jumper@example.com", phone="1", date="2030-01-02",
+                time="10:00", duration=60, adults=1, kids=0, amount=100,
+            ), format='json')
+        assert response.status_code == 201
+        assert cache.get(tile_key(date(2025, 3, 1))) is None
+
+    def test_backfill_linking_drops_tiles(self, staff_client):
+        make_session(date(2025, 3, 4))
+        Booking.objects.update(customer=None)
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        staff_client.get('/api/v1/bookings/calendar/', params)
+
+        CustomerBackfill().run()
+        assert cache.get(tile_key(date(2025, 3, 1))) is None
+
+    def test_fields_param_slims_events(self, staff_client):
+        make_session(date(2025, 3, 4))
+        data = staff_client.get('/api/v1/bookings/calendar/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-31', 'fields': 'start,end,type',
+        }).json()
+        assert set(data['events'][0]) == {'id', 'start', 'end', 'type'}
@@ -0,0 +1,122 @@
+"""
+Tests for gate check-in by ticket scan
+"""
+import threading
+import time as time_mod
+import pytest
+from datetime import date, time, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+from apps.bookings import checkin
+from apps.bookings.models import Booking, PartyBooking
+from apps.core.querycount import assert_query_budget
+
+URL = '/api/v1/bookings/check-in/'
+
+
+def make_booking(**overrides):
+    data = dict(name="Jumper", email="j@example.com", phone="1", date=date.today(), time=time(10, 0),
+                duration=60, adults=2, kids=3, spectators=1, amount=100)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+def make_party(**overrides):
+    data = dict(name="Party", email="p@example.com", phone="1", date=str(date.today()), time="16:00",
+                package_name="Standard", adults=4, kids=10, amount=100)
+    data.update(overrides)
+    return PartyBooking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestCheckIn:
+
+    def test_single_scan_is_idempotent(self, staff_client):
+        booking = make_booking()
+        first = staff_client.post(URL, {'ticket': str(booking.uuid)}, content_type='application/json')
+        assert first.status_code == 200
+        assert first.json()['status'] == 'CHECKED_IN'
+        assert first.json()['headcount'] == 6
+        assert set(first.json()) == {'ticket', 'ok', 'status', 'kind', 'id', 'name', 'headcount', 'arrived_at'}
+
+        again = staff_client.post(URL, {'ticket': str(booking.uuid)}, content_type='application/json').json()
+        assert again['status'] == 'ALREADY_ARRIVED' and again['ok']
+        booking.refresh_from_db()
+        assert booking.arrived
+        assert again['arrived_at'] == first.json()['arrived_at']
+
+    def test_resolves_qr_code_and_party_qr_url(self, staff_client):
+        booking = make_booking(qr_code='NINJA-1234')
+        party = make_party()
+        qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=150x150&data={party.uuid}"
+
+        by_code = staff_client.post(URL, {'ticket': 'NINJA-1234'}, content_type='application/json').json()
+        by_url = staff_client.post(URL, {'ticket': qr_url}, content_type='application/json').json()
+        assert (by_code['kind'], by_code['id']) == ('SESSION', booking.id)
+        assert (by_url['kind'], by_url['id'], by_url['headcount']) == ('PARTY', party.id, 14)
+        assert PartyBooking.objects.get().arrived
+
+    def test_unknown_and_cancelled(self, staff_client):
+        cancelled = make_booking(booking_status='CANCELLED')
+        missing = staff_client.post(URL, {'ticket': 'nope'}, content_type='application/json')
+        assert missing.status_code == 404
+        result = staff_client.post(URL, {'ticket': str(cancelled.uuid)}, content_type='application/json').json()
+        assert result['status'] == 'CANCELLED' and not result['ok']
+        assert not Booking.objects.get().arrived
+
+    def test_offline_batch_uses_scan_times(self, staff_client):
+        bookings = [make_booking(email=f"j{i}@example.com") for i in range(20)]
+        party = make_party()
+        scanned_at = timezone.now() - timedelta(minutes=30)
+        scans = [{'ticket': str(b.uuid), 'scanned_at': scanned_at.isoformat()} for b in bookings]
+        scans += [{'ticket': str(party.uuid)}, {'ticket': str(bookings[0].uuid)}, {'ticket': 'nope'}]
+
+        # Lock-select and update per table, whatever the batch size, plus
+        # creating the occupancy rows of the two slots (update, insert in a savepoint)
+        with assert_query_budget(16, 'batch check-in'):
+            response = staff_client.post(URL, {'scans': scans}, content_type='application/json')
+        statuses = [row['status'] for row in response.json()['results']]
+        assert statuses == ['CHECKED_IN'] * 21 + ['ALREADY_ARRIVED', 'NOT_FOUND']
+        assert Booking.objects.filter(arrived=True, arrived_at=scanned_at).count() == 20
+
+    def test_malformed_scan_times_count_as_now(self, staff_client):
+        bookings = [make_booking(email=f"j{i}@example.com") for i in range(4)]
+        bad_times = ['2025-13-45T10:00:00', 1700000000, 'yesterday', ['2025-01-01']]
+        scans = [{'ticket': str(b.uuid), 'scanned_at': value} for b, value in zip(bookings, bad_times)]
+        before = timezone.now()
+        response = staff_client.post(URL, {'scans': scans}, content_type='application/json')
+        assert response.status_code == 200
+        assert [row['status'] for row in response.json()['results']] == ['CHECKED_IN'] * 4
+        assert Booking.objects.filter(arrived=True, arrived_at__gte=before).count() == 4
+
+    def test_requires_staff(self, client):
+        assert client.post(URL, {'ticket': 'x'}, content_type='application/json').status_code in (401, 403)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.slow
+def test_concurrent_scans_check_in_once():
+    booking = make_booking()
+    gates = 8
+    barrier = threading.Barrier(gates)
+
+    def scan(_):
+        barrier.wait()
+        try:
+            for _ in range(50):
+                try:
+                    return checkin.check_in([{'ticket': str(booking.uuid)}])[0]
+                except OperationalError:
+                    # SQLite writer lock; the scanner would retry
+                    time_mod.sleep(0.01)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=gates) as pool:
+        results = list(pool.map(scan, range(gates)))
+
+    assert [result['status'] for result in results].count('CHECKED_IN') == 1
+    booking.refresh_from_db()
+    assert {result['arrived_at'] for result in results} == {booking.arrived_at}
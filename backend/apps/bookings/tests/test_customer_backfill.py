@@ -0,0 +1,94 @@
+"""
+Tests for the set-based customer backfill commands
+"""
+import pytest
+from datetime import date, time
+from django.core.management import call_command
+from apps.bookings.models import Booking, Customer, PartyBooking
+from apps.bookings.customer_backfill import CustomerBackfill
+from apps.bookings.search import search
+from apps.core.querycount import track_queries
+
+
+def make_unlinked(count, emails=3):
+    """Bookings as they looked before customers existed"""
+    for i in range(count):
+        Booking.objects.create(name=f"Jumper {i}", email=f"j{i % emails}@example.com", phone=f"98765{i:05d}",
+                               date=date(2025, 3, 4), time=time(10, 0), duration=60, adults=1, amount=100)
+    PartyBooking.objects.create(name="Party", email="party@example.com", phone="1",
+                                date="2025-03-05", time="16:00", package_name="Standard", amount=2500)
+    Booking.objects.update(customer=None)
+    PartyBooking.objects.update(customer=None)
+    Customer.objects.all().delete()
+
+
+@pytest.mark.django_db
+class TestCustomerBackfill:
+
+    def test_backfill_creates_and_links(self):
+        make_unlinked(6)
+        Customer.objects.create(name="", email="j0@example.com")
+
+        call_command('backfill_customers', '--batch-size', '2')
+
+        assert Customer.objects.count() == 4
+        assert not Booking.objects.filter(customer__isnull=True).exists()
+        assert PartyBooking.objects.get().customer.email == 'party@example.com'
+        for booking in Booking.objects.select_related('customer'):
+            assert booking.customer.email == booking.email
+        # Signals were skipped, so the index and stats are filled in afterwards
+        assert Customer.objects.get(email='j1@example.com').booking_count == 2
+        assert search(Customer.objects.all(), 'j2@example.com').count() == 1
+
+    def test_dry_run_changes_nothing(self):
+        make_unlinked(4)
+        report = CustomerBackfill(dry_run=True).run()
+        assert report['created'] == 4
+        assert report['linked'] == {'session': 4, 'party': 1}
+        assert not Customer.objects.exists()
+        assert Booking.objects.filter(customer__isnull=True).count() == 4
+
+    def test_query_count_does_not_grow_with_bookings(self):
+        make_unlinked(5, emails=5)
+        with track_queries() as small:
+            CustomerBackfill(batch_size=100).run()
+        make_unlinked(40, emails=40)
+        with track_queries() as large:
+            CustomerBackfill(batch_size=100).run()
+        # Eight times the bookings, (almost) the same number of queries
+        assert large.count <= small.count + 2
+
+    def test_link_only_and_populate(self):
+        make_unlinked(2)
+        Customer.objects.create(name="Known", email="j0@example.com")
+        call_command('link_bookings_to_customers')
+        assert Booking.objects.filter(customer__isnull=True).count() == 1
+        assert Customer.objects.count() == 1
+
+        Customer.objects.filter(email='j0@example.com').update(phone=None)
+        call_command('populate_customers')
+        assert Customer.objects.count() == 3
+        assert Customer.objects.get(email='j0@example.com').phone == '9876500000'
+
+    def test_filled_blanks_are_reindexed(self):
+        make_unlinked(1)
+        Customer.objects.create(name="", email="j0@example.com")
+        report = CustomerBackfill().run(fill_blanks=True)
+        assert report['updated'] == 1
+        assert search(Customer.objects.all(), 'jumper').get().email == 'j0@example.com'
+
+    def test_created_counts_only_inserted_rows(self, monkeypatch):
+        make_unlinked(2)
+        Customer.objects.create(name="Signed Up", email="j0@example.com")
+        lookups = []
+        real_lookup = CustomerBackfill.customer_ids
+
+        def stale_first_lookup(self, emails):
+            # As if j0 signed up between the lookup and the insert
+            lookups.append(emails)
+            return {} if len(lookups) == 1 else real_lookup(self, emails)
+
+        monkeypatch.setattr(CustomerBackfill, 'customer_ids', stale_first_lookup)
+        report = CustomerBackfill().run(link=False)
+        assert report['created'] == 2
+        assert Customer.objects.get(email='j0@example.com').name == "Signed Up"
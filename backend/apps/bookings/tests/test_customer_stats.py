@@ -0,0 +1,121 @@
+"""
+Tests for the lifetime stats stored on Customer
+"""
+import pytest
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from apps.bookings.models import Booking, Customer, PartyBooking
+from apps.bookings.customer_stats import reconcile, STAT_FIELDS
+
+
+def make_booking(**overrides):
+    data = dict(
+        name="Test User",
+        email="test@example.com",
+        phone="1234567890",
+        date=date.today(),
+        time=time(14, 0),
+        duration=60,
+        amount=Decimal('1000.00'),
+    )
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+def make_party(**overrides):
+    data = dict(
+        name="Party", email="test@example.com", phone="1",
+        date=str(date.today()), time="16:00", package_name="Standard",
+        amount=2500.0,
+    )
+    data.update(overrides)
+    return PartyBooking.objects.create(**data)
+
+
+def stored_stats():
+    return sorted(Customer.objects.values_list('email', *STAT_FIELDS))
+
+
+@pytest.mark.django_db
+class TestCustomerStats:
+    """Signals keep the stored stats identical to a full reconcile"""
+
+    def test_insert_counts_sessions_and_parties(self):
+        make_booking(amount=Decimal('1500.00'), date=date.today() - timedelta(days=5))
+        make_party(date=str(date.today() + timedelta(days=2)))
+
+        customer = Customer.objects.get(email='test@example.com')
+        assert customer.booking_count == 1
+        assert customer.party_count == 1
+        assert customer.total_spent == Decimal('4000.00')
+        assert customer.last_visit == date.today() + timedelta(days=2)
+
+    def test_update_amount_and_date(self):
+        later = make_booking(date=date.today() + timedelta(days=10))
+        make_booking(date=date.today())
+        later.amount = Decimal('400.00')
+        later.date = date.today() - timedelta(days=1)
+        later.save()
+
+        customer = Customer.objects.get(email='test@example.com')
+        assert customer.booking_count == 2
+        assert customer.total_spent == Decimal('1400.00')
+        assert customer.last_visit == date.today()
+
+    def test_reassign_and_delete(self):
+        booking = make_booking()
+        other = Customer.objects.create(name="Other", email="other@example.com")
+        booking.customer = other
+        booking.save()
+
+        original = Customer.objects.get(email='test@example.com')
+        other.refresh_from_db()
+        assert (original.booking_count, original.total_spent, original.last_visit) == (0, 0, None)
+        assert (other.booking_count, other.total_spent, other.last_visit) == (1, Decimal('1000.00'), date.today())
+
+        booking.delete()
+        other.refresh_from_db()
+        assert (other.booking_count, other.total_spent, other.last_visit) == (0, 0, None)
+
+    def test_signals_match_reconcile(self):
+        make_booking(amount=Decimal('900.00'))
+        make_booking(email='b@example.com', amount=Decimal('300.00'), date=date.today() - timedelta(days=3))
+        make_party(email='b@example.com')
+        make_booking(amount=Decimal('50.00')).delete()
+
+        incremental = stored_stats()
+        assert reconcile() == 0
+        assert stored_stats() == incremental
+
+    def test_reconcile_command_fixes_drift(self):
+        make_booking()
+        # queryset.update() bypasses the signals
+        Booking.objects.update(amount=Decimal('700.00'))
+        Customer.objects.update(party_count=3)
+
+        call_command('reconcile_customer_stats', '--dry-run')
+        assert Customer.objects.get().party_count == 3
+        call_command('reconcile_customer_stats')
+        customer = Customer.objects.get()
+        assert (customer.party_count, customer.total_spent) == (0, Decimal('700.00'))
+
+
+@pytest.mark.django_db
+def test_customer_list_orders_by_stored_stats(staff_client):
+    make_booking(email='small@example.com', amount=Decimal('100.00'))
+    make_booking(email='big@example.com', amount=Decimal('900.00'), date=date.today() - timedelta(days=30))
+
+    response = staff_client.get('/api/v1/bookings/customers/?ordering=-total_spent')
+    assert response.status_code == 200
+    assert [row['email'] for row in response.json()] == ['big@example.com', 'small@example.com']
+    assert response.json()[0]['total_spent'] == '900.00'
+
+    response = staff_client.get('/api/v1/bookings/customers/?ordering=-last_visit')
+    assert [row['email'] for row in response.json()] == ['small@example.com', 'big@example.com']
+
+    # Unknown fields fall back to the default order instead of a 500
+    for ordering in ('-nope', 'customer__password', 'search_rank'):
+        response = staff_client.get('/api/v1/bookings/customers/', {'ordering': ordering})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
@@ -0,0 +1,113 @@
+"""
+Tests for customer resolution on booking create
+"""
+import pytest
+from datetime import date, time, timedelta
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from rest_framework.test import APIClient
+from apps.bookings.customers import CustomerMemoMiddleware, _upsert, customer_memo, resolve_customer
+from apps.bookings.models import Booking, Customer
+from apps.bookings.search import search
+from apps.core.querycount import track_queries
+
+
+def legacy_resolve(email, name, phone):
+    """What the serializers did before customers.py"""
+    customer, created = Customer.objects.get_or_create(email=email, defaults={'name': name, 'phone': phone})
+    if not created and (customer.name != name or customer.phone != phone):
+        customer.name = name
+        customer.phone = phone
+        customer.save()
+    return customer
+
+
+def customer_queries(stats):
+    return [sql for sql in stats.statements if 'bookings_customer' in sql]
+
+
+@pytest.mark.django_db
+class TestResolveCustomer:
+
+    def test_upsert_creates_then_merges(self):
+        created = resolve_customer('kim@example.com', 'Kim', '111', overwrite=True)
+        assert created.pk and created.booking_count == 0
+        assert search(Customer.objects.all(), 'kim').get() == created
+
+        # Signals only fill blanks; booking forms overwrite
+        assert resolve_customer('kim@example.com', 'Someone Else', '222').name == 'Kim'
+        updated = resolve_customer('kim@example.com', 'Kim Lee', '', overwrite=True)
+        assert (updated.pk, updated.name, updated.phone) == (created.pk, 'Kim Lee', '111')
+        assert Customer.objects.count() == 1
+
+        Customer.objects.filter(pk=created.pk).update(name='', phone=None)
+        filled = resolve_customer('kim@example.com', 'Kim', '333')
+        assert (filled.name, filled.phone) == ('Kim', '333')
+
+    def test_upsert_reports_inserts_from_the_statement(self):
+        first, created = _upsert('kim@example.com', 'Kim', '111', overwrite=True)
+        assert created and not hasattr(first, 'inserted')
+        # A second write in the same clock tick is still an update
+        again, created = _upsert('kim@example.com', 'Kim', '111', overwrite=False)
+        assert not created and again.pk == first.pk
+        Customer.objects.filter(pk=first.pk).delete()
+        _, created = _upsert('kim@example.com', 'Kim', '111', overwrite=False)
+        assert created
+
+    def test_filling_blanks_refreshes_search(self):
+        customer = resolve_customer('kim@example.com', '', '111')
+        assert not search(Customer.objects.all(), 'kimberly').exists()
+
+        resolve_customer('kim@example.com', 'Kimberly', '222')
+        assert search(Customer.objects.all(), 'kimberly').get() == customer
+
+    def test_memo_resolves_each_email_once(self):
+        with customer_memo():
+            first = resolve_customer('kim@example.com', 'Kim', '111')
+            with track_queries() as stats:
+                again = resolve_customer('kim@example.com', 'Kim', '111')
+                Booking.objects.create(name="Kim", email="kim@example.com", phone="111", date=date.today(),
+                                       time=time(10, 0), duration=60, amount=100)
+        assert again is first
+        assert [sql for sql in customer_queries(stats) if 'INSERT' in sql] == []
+
+    def test_async_middleware_shares_the_memo_with_view_threads(self):
+        async def view(request):
+            first = await sync_to_async(resolve_customer)('kim@example.com', 'Kim', '111')
+            again = await sync_to_async(resolve_customer)('kim@example.com', 'Kim', '111')
+            return again is first
+
+        middleware = CustomerMemoMiddleware(view)
+        assert iscoroutinefunction(middleware)
+        assert async_to_sync(middleware)(None) is True
+
+    def test_benchmark_queries_per_booking(self, settings):
+        # pg_trgm indexes need no token writes, as in production
+        settings.SEARCH_BACKEND = 'trigram'
+        Customer.objects.create(name="Old Name", email="known@example.com", phone="1")
+
+        with track_queries() as legacy_new:
+            legacy_resolve('new1@example.com', 'New', '1')
+        with track_queries() as legacy_known:
+            legacy_resolve('known@example.com', 'New Name', '2')
+        with track_queries() as upsert_new:
+            resolve_customer('new2@example.com', 'New', '1', overwrite=True)
+        with track_queries() as upsert_known:
+            resolve_customer('known@example.com', 'Newer Name', '3', overwrite=True)
+
+        assert upsert_new.count == upsert_known.count == 1
+        assert legacy_new.count >= 2 and legacy_known.count >= 2
+
+    def test_booking_post_touches_customer_table_once(self, settings):
+        settings.SEARCH_BACKEND = 'trigram'
+        Customer.objects.create(name="Jumper", email="jumper@example.com", phone="1")
+        payload = dict(name="Jumper J", email="jumper@example.com", phone="99", date=(date.today() + timedelta(days=3)).isoformat(),
+                       time="10:00", duration=60, adults=2, kids=0, amount=100)
+
+        with track_queries() as stats:
+            response = APIClient().post('/api/v1/bookings/bookings/', payload, format='json')
+        assert response.status_code == 201
+        # The upsert, then the lifetime stats increment
+        assert len([sql for sql in customer_queries(stats) if 'booking_count' in sql or 'ON CONFLICT' in sql]) == 2
+        assert [sql for sql in customer_queries(stats) if sql.lstrip().upper().startswith('SELECT')] == []
+        customer = Customer.objects.get()
+        assert (customer.name, customer.phone, customer.booking_count) == ('Jumper J', '99', 1)
@@ -0,0 +1,46 @@
+"""
+Tests for the streaming export endpoints
+"""
+import json
+import pytest
+from datetime import date, time
+from apps.bookings.models import Booking, Waiver
+
+
+@pytest.mark.django_db
+class TestExports:
+
+    def setup_bookings(self):
+        booking = Booking.objects.create(
+            name="Test User", email="test@example.com", phone="1234567890",
+            date=date(2025, 1, 5), time=time(14, 0), duration=60, amount=1000,
+        )
+        Waiver.objects.create(name="Test User", email="test@example.com", booking=booking)
+        Waiver.objects.create(name="Walk In")
+        return booking
+
+    def test_waiver_csv_streams_without_per_row_queries(self, staff_client, django_assert_max_num_queries):
+        booking = self.setup_bookings()
+        with django_assert_max_num_queries(6):
+            response = staff_client.get('/api/v1/bookings/waivers/export_csv/')
+            body = b''.join(response.streaming_content).decode()
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/csv'
+        lines = body.strip().splitlines()
+        assert lines[0].startswith('ID,Name,Email')
+        assert len(lines) == 3
+        assert f'Session,{booking.id}' in body
+        assert 'Walk-in,N/A' in body
+
+    def test_booking_ndjson(self, staff_client):
+        booking = self.setup_bookings()
+        response = staff_client.get('/api/v1/bookings/bookings/export_ndjson/')
+        assert response.status_code == 200
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        assert records[0]['id'] == booking.id
+        assert records[0]['date'] == '2025-01-05'
+        assert records[0]['amount'] == '1000.00'
+
+    def test_exports_require_staff(self, client):
+        response = client.get('/api/v1/bookings/customers/export_csv/')
+        assert response.status_code in (401, 403)
@@ -0,0 +1,74 @@
+"""
+Tests for the unified bookings feed
+"""
+import pytest
+from datetime import date, time
+from django.utils import timezone
+from apps.bookings.models import Booking, PartyBooking
+from apps.bookings.feed import booking_feed
+
+
+def make_session(name, **overrides):
+    data = dict(name=name, email=f"{name}@example.com", phone="1", date=date.today(),
+                time=time(10, 0), duration=60, amount=100)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+def make_party(name, **overrides):
+    data = dict(name=name, email=f"{name}@example.com", phone="1", date=date.today(),
+                time=time(12, 0), package_name="Standard", amount=200)
+    data.update(overrides)
+    return PartyBooking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestBookingFeed:
+
+    def test_pages_cover_both_tables_in_order(self):
+        for i in range(4):
+            make_session(f"s{i}")
+            make_party(f"p{i}")
+        # Force a created_at tie across tables
+        tie = timezone.now()
+        Booking.objects.filter(name='s1').update(created_at=tie)
+        PartyBooking.objects.filter(name='p1').update(created_at=tie)
+
+        seen, cursor = [], None
+        while True:
+            items, cursor = booking_feed(cursor=cursor, limit=3)
+            seen.extend(items)
+            if not cursor:
+                break
+
+        assert len(seen) == 8
+        assert len({(item['type'], item['id']) for item in seen}) == 8
+        keys = [item['created_at'] for item in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_filters_are_applied_per_table(self):
+        make_session("alice", booking_status='CONFIRMED')
+        make_session("bob")
+        make_party("alice-party", status='CONFIRMED')
+
+        items, cursor = booking_feed(status='CONFIRMED', search='alice')
+        assert {item['type'] for item in items} == {'SESSION', 'PARTY'}
+        assert cursor is None
+
+        items, _ = booking_feed(booking_type='party')
+        assert [item['name'] for item in items] == ['alice-party']
+        assert items[0]['waiver_status'] == 'PENDING'
+        assert items[0]['customer']['email'] == 'alice-party@example.com'
+
+    def test_endpoint_reports_only_bad_input_as_400(self, staff_client, monkeypatch):
+        url = '/api/v1/core/dashboard/all_bookings/'
+        make_session("s0")
+        assert staff_client.get(url, {'limit': 'ten'}).json() == {'error': 'limit must be an integer'}
+        assert staff_client.get(url, {'cursor': 'nope'}).json() == {'error': 'Invalid cursor'}
+        assert staff_client.get(url).json()['count'] == 1
+
+        def broken(**kwargs):
+            raise ValueError('unrelated')
+        monkeypatch.setattr('apps.core.views.booking_feed', broken)
+        with pytest.raises(ValueError, match='unrelated'):
+            staff_client.get(url)
@@ -0,0 +1,174 @@
+"""
+Tests for the live occupancy counters and their SSE stream
+"""
+import json
+import pytest
+from datetime import date, time
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from apps.bookings import occupancy
+from apps.bookings.models import Booking, PartyBooking, SlotOccupancy
+from apps.core.caching import bump_marker
+from apps.core.querycount import track_queries
+
+URL = '/api/v1/bookings/occupancy/'
+STREAM_URL = '/api/v1/bookings/occupancy/stream/'
+
+
+def make_booking(**overrides):
+    data = dict(name="Jumper", email="j@example.com", phone="1", date=date.today(), time=time(10, 0),
+                duration=60, adults=2, kids=3, spectators=1, amount=100)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+def make_party(**overrides):
+    data = dict(name="Party", email="p@example.com", phone="1", date=str(date.today()), time="16:00",
+                package_name="Standard", adults=4, kids=10, amount=100)
+    data.update(overrides)
+    return PartyBooking.objects.create(**data)
+
+
+def counters():
+    return {
+        (row.time.strftime('%H:%M'), row.kind): (row.adults, row.kids, row.spectators)
+        for row in SlotOccupancy.objects.all()
+        if row.adults or row.kids or row.spectators
+    }
+
+
+def read_stream(**kwargs):
+    async def collect():
+        return [chunk async for chunk in occupancy.stream_events(**kwargs)]
+    return async_to_sync(collect)()
+
+
+@pytest.mark.django_db
+class TestOccupancyCounters:
+
+    def test_arrival_changes_move_counts(self):
+        booking = make_booking()
+        party = make_party()
+        assert counters() == {}
+
+        booking.arrived = True
+        booking.save()
+        party.arrived = True
+        party.save()
+        assert counters() == {('10:00', 'SESSION'): (2, 3, 1), ('16:00', 'PARTY'): (4, 10, 0)}
+
+        booking.adults = 5
+        booking.time = time(11, 0)
+        booking.save()
+        assert counters() == {('11:00', 'SESSION'): (5, 3, 1), ('16:00', 'PARTY'): (4, 10, 0)}
+
+        booking.arrived = False
+        booking.save()
+        party.delete()
+        assert counters() == {}
+
+    def test_check_in_endpoint_counts_each_booking_once(self, staff_client):
+        first = make_booking()
+        second = make_booking(adults=1, kids=0, spectators=0)
+        party = make_party()
+        scans = [{'ticket': str(first.uuid)}, {'ticket': str(first.uuid)},
+                 {'ticket': str(second.uuid)}, {'ticket': str(party.uuid)}]
+        response = staff_client.post('/api/v1/bookings/check-in/', {'scans': scans}, content_type='application/json')
+        assert response.status_code == 200
+        staff_client.post('/api/v1/bookings/check-in/', {'ticket': str(first.uuid)}, content_type='application/json')
+        assert counters() == {('10:00', 'SESSION'): (3, 3, 1), ('16:00', 'PARTY'): (4, 10, 0)}
+
+    def test_rebuild_matches_incremental_counts(self):
+        for hour in (10, 10, 12):
+            make_booking(time=time(hour, 0), arrived=True)
+        make_booking(time=time(14, 0))
+        make_party(arrived=True)
+        incremental = counters()
+        SlotOccupancy.objects.update(adults=99)
+
+        call_command('rebuild_occupancy', stdout=open('/dev/null', 'w'))
+        assert counters() == incremental == {
+            ('10:00', 'SESSION'): (4, 6, 2), ('12:00', 'SESSION'): (2, 3, 1), ('16:00', 'PARTY'): (4, 10, 0),
+        }
+
+
+@pytest.mark.django_db
+class TestOccupancyViews:
+
+    def test_snapshot(self, staff_client):
+        make_booking(arrived=True)
+        make_party(arrived=True)
+        make_booking(date=date(2020, 1, 1), arrived=True)
+        data = staff_client.get(URL).json()
+        assert data['date'] == date.today().isoformat()
+        assert data['totals'] == {'adults': 6, 'kids': 13, 'spectators': 1, 'total': 20}
+        assert [(slot['time'], slot['kind']) for slot in data['slots']] == [('10:00', 'SESSION'), ('16:00', 'PARTY')]
+        assert staff_client.get(URL, {'date': '2020-01-01'}).json()['totals']['total'] == 6
+        assert staff_client.get(URL, {'date': 'soon'}).status_code == 400
+
+    def test_staff_only(self, django_user_model):
+        assert APIClient().get(URL).status_code in (401, 403)
+        assert APIClient().get(STREAM_URL).status_code == 401
+        customer = APIClient()
+        customer.force_login(django_user_model.objects.create_user(
+            username='visitor', email='v@example.com', password='pass', role='CUSTOMER'))
+        assert customer.get(URL).status_code == 403
+        assert customer.get(STREAM_URL).status_code == 403
+
+    def test_stream_headers(self, staff_client):
+        response = staff_client.get(STREAM_URL, {'date': 'soon'})
+        assert response.status_code == 400
+        # Only the headers: the body is consumed by TestStream below
+        response = staff_client.get(STREAM_URL)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert response['Cache-Control'] == 'no-cache'
+        assert response.streaming
+
+
+@pytest.mark.django_db(transaction=True)
+class TestStream:
+
+    def test_sends_state_then_keepalives(self):
+        make_booking(arrived=True)
+        chunks = read_stream(poll=0.01, duration=0.05, heartbeat=0)
+        assert chunks[0] == 'retry: 10\n\n'
+        event, data = chunks[1].rstrip('\n').split('\n')
+        assert event == 'event: occupancy'
+        assert json.loads(data.removeprefix('data: '))['totals']['total'] == 6
+        # Unchanged counters only produce keepalive comments
+        assert chunks[2:] and set(chunks[2:]) == {': keepalive\n\n'}
+
+    def test_sends_event_on_change(self):
+        booking = make_booking()
+        chunks = read_stream(poll=0.01, duration=0)
+        assert json.loads(chunks[1].split('data: ')[1])['totals']['total'] == 0
+
+        booking.arrived = True
+        booking.save()
+        chunks = read_stream(poll=0.01, duration=0)
+        assert json.loads(chunks[1].split('data: ')[1])['totals']['total'] == 6
+
+    def test_idle_stream_reads_only_the_cache(self, monkeypatch):
+        monkeypatch.setattr(occupancy, 'cache_is_shared', lambda: True)
+        make_booking(arrived=True)
+        with track_queries() as tracked:
+            read_stream(poll=0.01, duration=0.1, heartbeat=1)
+        # The initial read only
+        assert tracked.count == 1
+
+    def test_rereads_when_another_process_bumps_the_marker(self):
+        booking = make_booking()
+        occupancy._sync_from_database()
+        # Counters written by another process: only its marker bump is seen here
+        SlotOccupancy.objects.create(date=booking.date, time=booking.time, kind='SESSION', adults=7)
+        with track_queries() as tracked:
+            chunks = read_stream(poll=0.01, duration=0.1, heartbeat=1, local_check=1)
+        assert 'event: occupancy' in chunks[1] and len(chunks) == 2
+        # Marker read and the initial counter read
+        assert tracked.count == 2
+
+        bump_marker(occupancy.MARKER)
+        chunks = read_stream(poll=0.01, duration=0, local_check=0)
+        assert json.loads(chunks[1].split('data: ')[1])['totals']['total'] == 7
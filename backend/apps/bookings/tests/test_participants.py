@@ -0,0 +1,84 @@
+"""
+Tests for party participant ingestion
+"""
+import pytest
+from datetime import date, time, timedelta
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.bookings.models import PartyBooking, Waiver
+
+
+def make_party():
+    return PartyBooking.objects.create(name="Host", email="host@example.com", phone="1", date=date.today(),
+                                       time=time(14, 0), package_name="Standard", amount=5000)
+
+
+def adults(count):
+    return [{'name': f'Adult {i}', 'email': f'adult{i}@example.com', 'phone': '1', 'dob': '1990-01-01',
+             'is_primary': i == 0} for i in range(count)]
+
+
+def post(party, participants):
+    return APIClient().post(f'/api/v1/bookings/party-bookings/{party.uuid}/add_participants/',
+                            {'participants': participants, 'waiver_signed': True}, format='json')
+
+
+@pytest.mark.django_db
+class TestAddParticipants:
+
+    def test_large_party_uses_constant_queries(self):
+        party = make_party()
+        with CaptureQueriesContext(connection) as small:
+            post(party, {'adults': adults(3), 'minors': []})
+        Waiver.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            response = post(party, {'adults': adults(40), 'minors': [{'name': 'Kid', 'dob': '2018-01-01'}]})
+
+        assert response.status_code == 200
+        assert response.data['created'] == 40
+        assert response.data['waiver_count'] == 41
+        assert 'total' in response.data['timings_ms']
+        assert len(large) <= len(small)
+        primary = Waiver.objects.get(is_primary_signer=True)
+        assert primary.name == 'Adult 0'
+        assert len(primary.adults) == 39 and primary.minors == [{'name': 'Kid', 'dob': '2018-01-01'}]
+
+    def test_resubmission_diffs_instead_of_recreating(self):
+        party = make_party()
+        post(party, {'adults': adults(3), 'minors': []})
+        kept = Waiver.objects.get(name='Adult 1').pk
+
+        changed = adults(3)
+        changed[2] = {'name': 'Adult 9', 'email': 'adult9@example.com', 'phone': '2'}
+        response = post(party, {'adults': changed, 'minors': []})
+
+        assert response.data['created'] == 1
+        assert response.data['deleted'] == 1
+        assert response.data['unchanged'] == 1
+        assert response.data['updated'] == 1  # Primary's nested adults changed
+        assert Waiver.objects.get(name='Adult 1').pk == kept
+        assert set(Waiver.objects.values_list('name', flat=True)) == {'Adult 0', 'Adult 1', 'Adult 9'}
+
+    def test_resubmission_refreshes_signed_at_of_changed_rows(self):
+        party = make_party()
+        post(party, {'adults': adults(3), 'minors': []})
+        yesterday = timezone.now() - timedelta(days=1)
+        Waiver.objects.update(signed_at=yesterday)
+
+        changed = adults(3)
+        changed[1] = dict(changed[1], phone='999')
+        response = post(party, {'adults': changed, 'minors': []})
+        # Adult 1 and the primary (whose nested adults changed) signed again
+        assert (response.data['updated'], response.data['unchanged']) == (2, 1)
+        signed = dict(Waiver.objects.values_list('name', 'signed_at'))
+        assert signed['Adult 0'] > yesterday and signed['Adult 1'] > yesterday
+        assert signed['Adult 2'] == yesterday
+
+    def test_invalid_payload_changes_nothing(self):
+        party = make_party()
+        post(party, {'adults': adults(2), 'minors': []})
+        response = post(party, {'adults': [{'name': 'Bad', 'dob': 'not-a-date'}], 'minors': []})
+        assert response.status_code == 400
+        assert Waiver.objects.count() == 2
@@ -0,0 +1,105 @@
+"""
+Query budgets for hot endpoints
+"""
+import pytest
+from datetime import date, time
+from asgiref.sync import async_to_sync, sync_to_async
+from django.utils import timezone
+from apps.bookings.models import Booking, PartyBooking, Waiver
+from apps.core.querycount import assert_query_budget, track_queries
+
+
+def make_bookings(count):
+    for i in range(count):
+        Booking.objects.create(name=f"Jumper {i}", email=f"j{i}@example.com", phone="1", date=date(2025, 3, 4),
+                               time=time(10, 0), duration=60, adults=1, amount=100)
+
+
+def make_waivers(count):
+    """Waivers for arrived session bookings, party bookings and walk-ins"""
+    for i in range(count):
+        booking = Booking.objects.create(name=f"Jumper {i}", email=f"w{i}@example.com", phone="1", date=date(2025, 3, 4),
+                                         time=time(10, 0), duration=60, adults=1, amount=100,
+                                         arrived=True, arrived_at=timezone.now())
+        party = PartyBooking.objects.create(name=f"Party {i}", email=f"p{i}@example.com", phone="1",
+                                            date="2025-03-05", time="16:00", package_name="Standard", amount=100)
+        Waiver.objects.create(name=f"Adult {i}", booking=booking)
+        Waiver.objects.create(name=f"Kid {i}", party_booking=party, participant_type='MINOR')
+        Waiver.objects.create(name=f"Walk-in {i}")
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+
+    def test_booking_list_is_constant(self, staff_client):
+        make_bookings(2)
+        with track_queries() as small:
+            staff_client.get('/api/v1/bookings/bookings/')
+        make_bookings(10)
+        with assert_query_budget(small.count, 'booking list'):
+            response = staff_client.get('/api/v1/bookings/bookings/')
+        assert response.status_code == 200
+        assert len(response.json()) == 12
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/bookings/waivers-old/',
+        '/api/v1/bookings/waivers/',
+    ])
+    def test_waiver_list_is_constant(self, staff_client, django_user_model, url):
+        django_user_model.objects.filter(username='staff').update(is_staff=True)
+        make_waivers(1)
+        with track_queries() as small:
+            staff_client.get(url)
+        make_waivers(10)
+        with assert_query_budget(small.count, 'waiver list'):
+            response = staff_client.get(url)
+        assert response.status_code == 200
+        assert len(response.json()) == 33
+        rows = {row['name']: row for row in response.json()}
+        assert rows['Adult 3']['booking_reference'].startswith('Session #')
+        assert rows['Kid 3']['booking_type'] == 'PARTY'
+        assert rows['Walk-in 3']['booking_reference'] == 'Walk-in'
+
+    def test_waiver_serializer_reads_arrival_annotations(self, staff_client):
+        make_waivers(2)
+        rows = {row['name']: row for row in staff_client.get('/api/v1/bookings/waivers-old/').json()}
+        assert rows['Adult 1']['arrived'] is True and rows['Adult 1']['arrived_at']
+        assert rows['Kid 1']['arrived'] is False and rows['Kid 1']['arrived_at'] is None
+        assert rows['Walk-in 1']['arrived'] is False
+
+    def test_waivers_by_booking_is_constant(self, staff_client):
+        make_waivers(1)
+        booking = Booking.objects.get(email='w0@example.com')
+        Waiver.objects.bulk_create([Waiver(name=f"Extra {i}", booking=booking) for i in range(10)])
+        with assert_query_budget(3, 'waivers by booking'):
+            response = staff_client.get(f'/api/v1/bookings/waivers-old/by_booking/?booking_id={booking.id}')
+        assert response.status_code == 200
+        assert len(response.json()) == 11
+        assert all(row['arrived'] and row['booking_type'] == 'SESSION' for row in response.json())
+
+    def test_budget_failure_lists_repeats(self):
+        make_bookings(3)
+        with pytest.raises(AssertionError, match='Repeated statements'):
+            with assert_query_budget(1, 'loop'):
+                for booking in Booking.objects.all():
+                    Booking.objects.filter(pk=booking.pk).exists()
+
+    def test_header_and_middleware(self, staff_client, settings):
+        settings.QUERY_COUNT_HEADER = True
+        response = staff_client.get('/api/v1/bookings/bookings/')
+        assert int(response['X-Query-Count']) > 0
+        assert 'X-Query-Time-Ms' in response
+
+    def test_async_middleware_counts_queries(self, async_client, django_user_model, settings):
+        settings.QUERY_COUNT_HEADER = True
+        async_client.force_login(django_user_model.objects.create_user(
+            username='async-staff', email='async@example.com', password='pass', is_staff=True))
+        response = async_to_sync(async_client.get)('/api/v1/core/notifications/wait/')
+        assert response.status_code == 200
+        assert int(response['X-Query-Count']) > 0
+
+    def test_counts_queries_in_worker_threads(self):
+        count = sync_to_async(lambda: Booking.objects.count(), thread_sensitive=False)
+        with track_queries() as stats:
+            async_to_sync(count)()
+        assert stats.count == 1
@@ -0,0 +1,177 @@
+"""
+Tests for slot reservations and capacity counters
+"""
+import contextlib
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.bookings import reservations
+from apps.bookings.models import Booking, Customer, PartyBooking, SlotCapacity, SlotHold
+from apps.bookings.throttles import SlotHoldThrottle
+from apps.cms.models import PartyBookingConfig, SessionBookingConfig
+
+DAY = date.today() + timedelta(days=5)
+
+
+def set_capacity(places):
+    config = SessionBookingConfig.get_config()
+    config.slot_capacity = places
+    config.save()
+
+
+def session_payload(**overrides):
+    data = dict(name="Jumper", email="jumper@example.com", phone="1", date=DAY.isoformat(),
+                time="10:00", duration=60, adults=2, kids=0, amount=100)
+    data.update(overrides)
+    return data
+
+
+def counter(slot=time(10, 0), kind='SESSION'):
+    return SlotCapacity.objects.get(date=DAY, time=slot, kind=kind)
+
+
+@pytest.mark.django_db
+class TestReservations:
+
+    def test_session_booking_rejected_when_full(self):
+        set_capacity(5)
+        Booking.objects.create(name="Early", email="early@example.com", phone="1", date=DAY,
+                               time=time(10, 0), duration=60, adults=2, amount=100)
+        client = APIClient()
+        assert client.post('/api/v1/bookings/bookings/', session_payload(), format='json').status_code == 201
+        response = client.post('/api/v1/bookings/bookings/', session_payload(), format='json')
+        assert response.status_code == 400
+        assert 'time' in response.data
+        # Counter started from the existing booking
+        assert counter().taken == 4
+
+    def test_rejected_checkout_leaves_customer_untouched(self):
+        set_capacity(2)
+        client = APIClient()
+        assert client.post('/api/v1/bookings/bookings/', session_payload(), format='json').status_code == 201
+        response = client.post('/api/v1/bookings/bookings/',
+                               session_payload(name="Someone Else", phone="999"), format='json')
+        assert response.status_code == 400
+        customer = Customer.objects.get(email="jumper@example.com")
+        assert (customer.name, customer.phone) == ("Jumper", "1")
+        response = client.post('/api/v1/bookings/bookings/',
+                               session_payload(email="new@example.com"), format='json')
+        assert response.status_code == 400
+        assert not Customer.objects.filter(email="new@example.com").exists()
+
+    def test_long_session_takes_every_covered_slot(self):
+        set_capacity(5)
+        client = APIClient()
+        response = client.post('/api/v1/bookings/bookings/',
+                               session_payload(duration=120, adults=4), format='json')
+        assert response.status_code == 201
+        assert counter(time(10, 0)).taken == 4
+        assert counter(time(11, 0)).taken == 4
+        response = client.post('/api/v1/bookings/bookings/',
+                               session_payload(time="11:00", adults=2), format='json')
+        assert response.status_code == 400
+
+    def test_cancel_and_delete_give_places_back(self):
+        set_capacity(5)
+        client = APIClient()
+        client.post('/api/v1/bookings/bookings/', session_payload(adults=3), format='json')
+        booking = Booking.objects.get()
+        booking.booking_status = 'CANCELLED'
+        booking.save()
+        assert counter().taken == 0
+        booking.booking_status = 'CONFIRMED'
+        booking.save()
+        assert counter().taken == 3
+        booking.delete()
+        assert counter().taken == 0
+
+    def test_hold_is_consumed_and_expired_holds_released(self):
+        set_capacity(4)
+        client = APIClient()
+        response = client.post('/api/v1/bookings/holds/',
+                               {'kind': 'SESSION', 'date': DAY.isoformat(), 'time': '10:00', 'adults': 3},
+                               format='json')
+        assert response.status_code == 201
+        token = response.data['token']
+        assert counter().taken == 3
+
+        # The held places are not available to anyone else
+        assert client.post('/api/v1/bookings/bookings/', session_payload(adults=2),
+                           format='json').status_code == 400
+        assert client.post('/api/v1/bookings/bookings/', session_payload(adults=3, hold_token=token),
+                           format='json').status_code == 201
+        assert counter().taken == 3
+        assert not SlotHold.objects.exists()
+
+        reservations.hold('SESSION', DAY, time(10, 0), 1, ttl=timedelta(seconds=-1))
+        assert counter().taken == 4
+        assert reservations.release_expired_holds() == 1
+        assert counter().taken == 3
+
+    def test_party_slot_limit(self):
+        client = APIClient()
+        payload = dict(name="Party", email="party@example.com", phone="1", date=DAY.isoformat(),
+                       time="14:00", kids=10, adults=2, amount=5000)
+        # No limit unless the venue sets one
+        assert PartyBookingConfig.get_config().parties_per_slot is None
+        assert client.post('/api/v1/bookings/party-bookings/', payload, format='json').status_code == 201
+        assert client.post('/api/v1/bookings/party-bookings/', payload, format='json').status_code == 201
+
+        config = PartyBookingConfig.get_config()
+        config.parties_per_slot = 2
+        config.save()
+        assert client.post('/api/v1/bookings/party-bookings/', payload, format='json').status_code == 409
+        assert PartyBooking.objects.count() == 2
+        assert counter(time(14, 0), 'PARTY').taken == 2
+
+    def test_holds_are_capped_and_rate_limited(self, monkeypatch):
+        # DRF reads the rates once at import
+        monkeypatch.setattr(SlotHoldThrottle, 'THROTTLE_RATES', {'slot_hold': '2/hour'})
+        client = APIClient()
+        hold = {'kind': 'SESSION', 'date': DAY.isoformat(), 'time': '10:00', 'adults': 1}
+        too_many = client.post('/api/v1/bookings/holds/', {**hold, 'adults': reservations.MAX_HOLD_QUANTITY + 1},
+                               format='json')
+        assert too_many.status_code == 400
+        assert client.post('/api/v1/bookings/holds/', hold, format='json').status_code == 201
+        assert client.post('/api/v1/bookings/holds/', hold, format='json').status_code == 429
+        assert SlotHold.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.slow
+def test_concurrent_checkouts_never_oversell():
+    set_capacity(10)
+    attempts, places = 24, 3
+    barrier = threading.Barrier(attempts)
+    # SQLite has no row locks and fails concurrent writers with "database is
+    # locked", so contenders take turns there; PostgreSQL races them for real.
+    turn = contextlib.nullcontext() if connection.features.has_select_for_update else threading.Lock()
+
+    def checkout(index):
+        barrier.wait()
+        try:
+            with turn:
+                with transaction.atomic():
+                    reservations.reserve('SESSION', DAY, time(12, 0), places)
+                    booking = Booking(name=f"Racer {index}", email=f"r{index}@example.com", phone="1",
+                                      date=DAY, time=time(12, 0), duration=60, adults=places, amount=100)
+                    booking._slot_reserved = True
+                    booking.save()
+            return True
+        except reservations.SlotUnavailable:
+            return False
+        finally:
+            close_old_connections()
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=attempts) as pool:
+        results = list(pool.map(checkout, range(attempts)))
+
+    confirmed = Booking.objects.filter(date=DAY, time=time(12, 0)).count()
+    assert results.count(True) == confirmed
+    assert confirmed * places <= 10
+    assert counter(time(12, 0)).taken == confirmed * places
@@ -0,0 +1,88 @@
+"""
+Tests for customer / booking / waiver search on the token backend
+"""
+import pytest
+from datetime import date, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from apps.bookings.models import Booking, Customer, PartyBooking, SearchToken, Waiver
+from apps.bookings.participants import ingest_party_participants
+from apps.bookings.search import query_terms, search
+
+DAY = date.today() + timedelta(days=4)
+
+
+def make_booking(name, email, phone, **extra):
+    return Booking.objects.create(name=name, email=email, phone=phone, date=DAY, time=time(10, 0),
+                                  duration=60, adults=1, amount=100, **extra)
+
+
+def names(queryset):
+    return [obj.name for obj in queryset]
+
+
+@pytest.mark.django_db
+class TestSearch:
+
+    def test_query_terms_normalize(self):
+        assert query_terms('+91 98765-43210') == ['919876543210']
+        assert query_terms('(987) 654-3210') == ['9876543210']
+        assert query_terms('asha 3210') == ['asha', '3210']
+        assert query_terms('Asha.K@Mail.com') == ['asha.k@mail.com']
+        assert query_terms("  O'Brien  ") == ['o', 'brien']
+
+    def test_prefix_phone_email_and_uuid(self):
+        asha = make_booking('Asha Kumar', 'asha@example.com', '+91 98765-43210')
+        make_booking('Ravi Shah', 'ravi@example.org', '080 2345 6789')
+
+        qs = Booking.objects.all()
+        assert names(search(qs, 'ash')) == ['Asha Kumar']
+        assert names(search(qs, 'ASHA kum')) == ['Asha Kumar']
+        assert names(search(qs, 'asha shah')) == []
+        assert names(search(qs, 'example.org')) == ['Ravi Shah']
+        assert names(search(qs, 'ravi@example.org')) == ['Ravi Shah']
+        assert names(search(qs, '9876543210')) == ['Asha Kumar']
+        assert names(search(qs, '98765 43210')) == ['Asha Kumar']
+        assert names(search(qs, '3210')) == ['Asha Kumar']
+        assert names(search(qs, '080 2345')) == ['Ravi Shah']
+        assert names(search(qs, str(asha.uuid)[:13])) == ['Asha Kumar']
+        assert names(search(qs, str(asha.uuid).replace('-', '')[:8])) == ['Asha Kumar']
+        assert names(search(qs, '!!!')) == []
+
+    def test_exact_matches_rank_first(self):
+        make_booking('Samantha Jones', 'sj@example.com', '1111')
+        make_booking('Sam Jones', 'sam@example.com', '2222')
+        ranked = search(Booking.objects.all(), 'sam').order_by('-search_rank')
+        assert names(ranked) == ['Sam Jones', 'Samantha Jones']
+
+    def test_tokens_follow_edits_and_deletes(self):
+        booking = make_booking('Old Name', 'guest@example.com', '5555')
+        booking.name = 'New Name'
+        booking.save()
+        qs = Booking.objects.all()
+        assert names(search(qs, 'old name')) == []
+        assert names(search(qs, 'new')) == ['New Name']
+        booking.delete()
+        assert not SearchToken.objects.filter(kind='booking').exists()
+
+    def test_participants_are_searchable(self):
+        party = PartyBooking.objects.create(name='Host', email='host@example.com', phone='1', date=DAY,
+                                            time=time(12, 0), package_name='Mega', kids=2, adults=2, amount=10)
+        ingest_party_participants(party, {
+            'adults': [{'name': 'Priya Nair', 'email': 'priya@example.com', 'phone': '99887 76655', 'is_primary': True}],
+            'minors': [{'name': 'Kid One', 'dob': '2018-01-01'}],
+        }, waiver_signed=True, ip_address='127.0.0.1')
+        assert names(search(Waiver.objects.all(), 'priya')) == ['Priya Nair']
+        assert names(search(Waiver.objects.all(), '7665')) == []
+        assert names(search(Waiver.objects.all(), '6655')) == ['Priya Nair']
+
+    def test_rebuild_command_and_endpoints(self, staff_client):
+        make_booking('Meera Das', 'meera@example.com', '7000000001')
+        SearchToken.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        assert Customer.objects.get(email='meera@example.com')
+
+        response = staff_client.get('/api/v1/bookings/bookings/', {'search': 'meer'})
+        assert [row['name'] for row in response.json()] == ['Meera Das']
+        response = staff_client.get('/api/v1/bookings/customers/', {'search': '7000000001'})
+        assert [row['email'] for row in response.json()] == ['meera@example.com']
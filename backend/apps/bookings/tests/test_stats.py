@@ -0,0 +1,86 @@
+"""
+Tests for the DailyBookingStats rollup
+"""
+import pytest
+from datetime import date, time, timedelta
+from decimal import Decimal
+from apps.bookings.models import Booking, PartyBooking, DailyBookingStats
+from apps.bookings.stats import rebuild_daily_stats
+
+
+def rollup_snapshot():
+    return sorted(
+        DailyBookingStats.objects.filter(bookings__gt=0)
+        .values_list('date', 'kind', 'status', 'bookings', 'revenue', 'pending_waivers')
+    )
+
+
+def make_booking(**overrides):
+    data = dict(
+        name="Test User",
+        email="test@example.com",
+        phone="1234567890",
+        date=date.today(),
+        time=time(14, 0),
+        duration=60,
+        amount=Decimal('1000.00'),
+    )
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestDailyBookingStats:
+    """Signals keep the rollup identical to a full rebuild"""
+
+    def test_insert_counts_booking(self):
+        make_booking(amount=Decimal('1500.00'))
+        row = DailyBookingStats.objects.get(date=date.today(), kind='SESSION', status='CONFIRMED')
+        assert row.bookings == 1
+        assert row.revenue == Decimal('1500.00')
+        assert row.pending_waivers == 1
+        assert row.created == 1
+
+    def test_update_moves_contribution(self):
+        booking = make_booking()
+        booking.date = date.today() + timedelta(days=3)
+        booking.status = 'CANCELLED'
+        booking.waiver_status = 'SIGNED'
+        booking.save()
+
+        old_row = DailyBookingStats.objects.get(date=date.today(), kind='SESSION', status='CONFIRMED')
+        assert old_row.bookings == 0
+        assert old_row.revenue == 0
+        new_row = DailyBookingStats.objects.get(date=booking.date, kind='SESSION', status='CANCELLED')
+        assert new_row.bookings == 1
+        assert new_row.pending_waivers == 0
+
+    def test_party_and_delete_match_rebuild(self):
+        make_booking(amount=Decimal('900.00'))
+        doomed = make_booking(amount=Decimal('300.00'))
+        PartyBooking.objects.create(
+            name="Party", email="party@example.com", phone="1",
+            date=str(date.today()), time="16:00", package_name="Standard",
+            amount=2500.0,
+        )
+        doomed.delete()
+
+        incremental = rollup_snapshot()
+        rebuild_daily_stats()
+        assert rollup_snapshot() == incremental
+
+    def test_dashboard_stats_reads_rollup(self, client, django_user_model):
+        make_booking(amount=Decimal('1000.00'))
+        make_booking(amount=Decimal('500.00'), status='CANCELLED')
+        user = django_user_model.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', name='Staff'
+        )
+        client.force_login(user)
+
+        response = client.get('/api/v1/core/dashboard/stats/')
+        assert response.status_code == 200
+        data = response.json()
+        assert data['totalBookings'] == 1
+        assert data['bookingsToday'] == 1
+        assert data['todayRevenue'] == 1000.0
+        assert data['thisWeekBookings'] == 1
@@ -0,0 +1,166 @@
+"""
+Tests for cached waiver PDFs and bulk waiver packs
+"""
+import io
+import os
+import re
+import time as time_mod
+import zipfile
+import pytest
+from datetime import date, time
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from apps.bookings import waiver_pdf
+from apps.bookings.models import Booking, PartyBooking, Waiver
+
+DAY = date(2025, 3, 5)
+
+
+@pytest.fixture(autouse=True)
+def pdf_cache(settings, tmp_path):
+    settings.WAIVER_PDF_CACHE_DIR = str(tmp_path / 'pdfs')
+    settings.WAIVER_PDF_WORKERS = 1
+    return tmp_path / 'pdfs'
+
+
+@pytest.fixture
+def staff(staff_client, django_user_model):
+    django_user_model.objects.filter(username='staff').update(is_staff=True)
+    return staff_client
+
+
+def make_day():
+    booking = Booking.objects.create(name="Jumper", email="j@example.com", phone="1", date=DAY,
+                                     time=time(10, 0), duration=60, adults=2, amount=100)
+    party = PartyBooking.objects.create(name="Party", email="p@example.com", phone="1",
+                                        date=str(DAY), time="16:00", package_name="Standard", amount=100)
+    other = Booking.objects.create(name="Other", email="o@example.com", phone="1", date=date(2025, 3, 6),
+                                   time=time(10, 0), duration=60, adults=1, amount=100)
+    waivers = [
+        Waiver.objects.create(name="Adult One", booking=booking),
+        Waiver.objects.create(name="Adult Two", booking=booking),
+        Waiver.objects.create(name="Kid", party_booking=party, participant_type='MINOR'),
+    ]
+    Waiver.objects.create(name="Not Today", booking=other)
+    return booking, party, waivers
+
+
+def page_count(content):
+    return len(re.findall(rb'/Type /Page\b', content))
+
+
+def count_renders(monkeypatch):
+    calls = []
+    original = waiver_pdf.render_pdf
+
+    def render(pages):
+        calls.append(len(pages))
+        return original(pages)
+    monkeypatch.setattr(waiver_pdf, 'render_pdf', render)
+    return calls
+
+
+@pytest.mark.django_db
+class TestWaiverPdfCache:
+
+    def test_download_renders_once_per_version(self, staff, monkeypatch):
+        _, _, waivers = make_day()
+        calls = count_renders(monkeypatch)
+        url = f'/api/v1/bookings/waivers-old/{waivers[0].id}/download_pdf/'
+
+        first = staff.get(url)
+        assert first.status_code == 200
+        assert first.content.startswith(b'%PDF')
+        assert staff.get(url).content == first.content
+        assert calls == [1]
+
+        waivers[0].name = "Adult Renamed"
+        waivers[0].save()
+        assert staff.get(url).content != first.content
+        assert calls == [1, 1]
+
+    def test_process_pool_renders_misses_in_order(self, settings):
+        _, _, waivers = make_day()
+        pages = waiver_pdf.pack_waivers(date=DAY)
+        waiver_pdf.get_pdf(waivers[1])  # one cache hit among the misses
+
+        results = list(waiver_pdf.iter_pdfs(pages, workers=2))
+        assert [data['id'] for data, _ in results] == [w.id for w in waivers]
+        assert all(content.startswith(b'%PDF') and page_count(content) == 1 for _, content in results)
+
+    def test_edits_and_deletes_evict_cached_pdfs(self, staff, pdf_cache, django_capture_on_commit_callbacks):
+        booking, _, waivers = make_day()
+        for waiver in waivers:
+            waiver_pdf.get_pdf(waiver)
+        staff.get(f'/api/v1/bookings/waivers-old/pack/?booking_id={booking.id}&output=pdf')
+        assert list((pdf_cache / 'packs').rglob('*.pdf'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            waivers[0].name = "Adult Renamed"
+            waivers[0].save()
+        assert not (pdf_cache / 'waivers' / str(waivers[0].id)).exists()
+        assert not (pdf_cache / 'packs').exists()
+        # A new version replaces the old file rather than sitting next to it
+        Waiver.objects.filter(pk=waivers[1].pk).update(name="Adult Two Renamed")
+        waivers[1].refresh_from_db()
+        waiver_pdf.get_pdf(waivers[1])
+        assert len(list((pdf_cache / 'waivers' / str(waivers[1].id)).glob('*.pdf'))) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert staff.delete(f'/api/v1/bookings/waivers-old/{waivers[1].id}/').status_code == 204
+        assert not (pdf_cache / 'waivers' / str(waivers[1].id)).exists()
+        assert (pdf_cache / 'waivers' / str(waivers[2].id)).exists()
+
+    def test_prune_removes_old_files(self, pdf_cache):
+        _, _, waivers = make_day()
+        waiver_pdf.get_pdf(waivers[0])
+        waiver_pdf.get_pdf(waivers[1])
+        old = next((pdf_cache / 'waivers' / str(waivers[0].id)).glob('*.pdf'))
+        month_ago = time_mod.time() - 31 * 24 * 3600
+        os.utime(old, (month_ago, month_ago))
+
+        out = io.StringIO()
+        call_command('prune_waiver_pdfs', stdout=out)
+        assert 'Removed 1 ' in out.getvalue()
+        assert not (pdf_cache / 'waivers' / str(waivers[0].id)).exists()
+        assert len(list(pdf_cache.rglob('*.pdf'))) == 1
+
+
+@pytest.mark.django_db
+class TestWaiverPack:
+
+    def test_zip_pack_for_a_day(self, staff):
+        _, _, waivers = make_day()
+        response = staff.get(f'/api/v1/bookings/waivers-old/pack/?date={DAY}')
+        assert response.status_code == 200
+        assert response['Content-Disposition'] == f'attachment; filename="waivers_{DAY}.zip"'
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        assert archive.namelist() == [f'waiver_{w.id}.pdf' for w in waivers]
+        assert all(archive.read(name).startswith(b'%PDF') for name in archive.namelist())
+
+    def test_merged_pack_for_a_booking_is_cached(self, staff, monkeypatch):
+        booking, _, _ = make_day()
+        calls = count_renders(monkeypatch)
+        url = f'/api/v1/bookings/waivers-old/pack/?booking_id={booking.id}&output=pdf'
+
+        response = staff.get(url)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/pdf'
+        assert page_count(response.content) == 2
+        assert staff.get(url).content == response.content
+        assert calls == [2]
+
+    def test_pack_validation(self, staff):
+        make_day()
+        assert staff.get('/api/v1/bookings/waivers-old/pack/').status_code == 400
+        assert staff.get('/api/v1/bookings/waivers-old/pack/?date=2025-02-30').status_code == 400
+        assert staff.get(f'/api/v1/bookings/waivers-old/pack/?date={DAY}&output=tar').status_code == 400
+        assert staff.get('/api/v1/bookings/waivers-old/pack/?date=2024-01-01').status_code == 404
+        assert APIClient().get(f'/api/v1/bookings/waivers-old/pack/?date={DAY}').status_code in (401, 403)
+
+    def test_command_writes_pack(self, tmp_path):
+        _, party, _ = make_day()
+        path = tmp_path / 'party.pdf'
+        call_command('waiver_pack', '--party-booking-id', str(party.id), '--output', 'pdf', '--file', str(path))
+        assert page_count(path.read_bytes()) == 1
@@ -0,0 +1,15 @@
+"""
+Rate limits for the public booking endpoints.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] and are counted
+in the default cache, per user when logged in and per client IP otherwise.
+"""
+from rest_framework.throttling import UserRateThrottle
+
+
+class SlotHoldThrottle(UserRateThrottle):
+    """
+    Holds per client. A hold lasts HOLD_TTL (10 minutes), so an hourly rate
+    also caps how many holds one client can have open at a time.
+    """
+    scope = 'slot_hold'
@@ -5,9 +5,11 @@ from .views import (
     BookingBlockViewSet, PartyBookingViewSet, SessionBookingHistoryViewSet, 
     PartyBookingHistoryViewSet, create_party_booking_view, waiver_list_view, 
     waiver_detail_view, add_party_participants_view, party_booking_detail_view,
-    mark_party_arrived_view, mark_party_not_arrived_view
+    mark_party_arrived_view, mark_party_not_arrived_view, check_in_view
 )
 from .calendar_views import calendar_bookings
+from .availability_views import session_availability, create_slot_hold, release_slot_hold
+from .occupancy_views import occupancy_view, occupancy_stream_view
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet)
@@ -24,6 +26,15 @@ router.register(r'party-booking-history', PartyBookingHistoryViewSet)
 urlpatterns = [
     # Calendar endpoint
     path('calendar/', calendar_bookings, name='calendar-bookings'),
+    # Public slot availability for the booking wizard
+    path('availability/', session_availability, name='session-availability'),
+    path('holds/', create_slot_hold, name='slot-hold-create'),
+    path('holds/<uuid:token>/', release_slot_hold, name='slot-hold-release'),
+    # Gate scanners: check in by ticket UUID / QR code, singly or in batches
+    path('check-in/', check_in_view, name='check-in'),
+    # Staff dashboards: people in the park now, as JSON or a live SSE stream
+    path('occupancy/', occupancy_view, name='occupancy'),
+    path('occupancy/stream/', occupancy_stream_view, name='occupancy-stream'),
     # Custom party booking endpoints (bypasses serializer bug)
     path('party-bookings/', create_party_booking_view, name='party-bookings-list-create'),
     path('party-bookings/<int:id>/', party_booking_detail_view, name='party-booking-detail'),
@@ -33,6 +44,8 @@ urlpatterns = [
     path('party-bookings/ticket/<uuid:uuid>/', PartyBookingViewSet.as_view({'get': 'ticket'}), name='party-booking-ticket'),
     # Custom waiver endpoints (bypasses serializer bug)
     path('waivers/', waiver_list_view, name='waivers-list'),
+    path('waivers/export_csv/', WaiverViewSet.as_view({'get': 'export_csv'}), name='waivers-export-csv'),
+    path('waivers/export_ndjson/', WaiverViewSet.as_view({'get': 'export_ndjson'}), name='waivers-export-ndjson'),
     path('waivers/<int:id>/', waiver_detail_view, name='waiver-detail'),
     path('', include(router.urls)),
 ]
@@ -3,48 +3,63 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Customer, Booking, Waiver, Transaction, BookingBlock, PartyBooking, SessionBookingHistory, PartyBookingHistory
-from .serializers import CustomerSerializer, BookingSerializer, WaiverSerializer, TransactionSerializer, BookingBlockSerializer, PartyBookingSerializer, SessionBookingHistorySerializer, PartyBookingHistorySerializer
+from .serializers import CustomerSerializer, BookingSerializer, WaiverSerializer, TransactionSerializer, BookingBlockSerializer, PartyBookingSerializer, SessionBookingHistorySerializer, PartyBookingHistorySerializer, with_booking_info
 from .permissions import IsStaffUser, IsSuperAdminOnly
+from . import checkin, reservations, waiver_pdf
+from .participants import ingest_party_participants, ParticipantError
+from .search import search
+from .customers import resolve_customer
+from apps.core.jobs import enqueue
+from .exports import (
+    ExportMixin, WAIVER_COLUMNS, BOOKING_COLUMNS, PARTY_BOOKING_COLUMNS,
+    CUSTOMER_COLUMNS, TRANSACTION_COLUMNS
+)
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django.utils import timezone
 from django.db import transaction
 import json
 
-from django.db.models import Sum, Count, Max, Q
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsStaffUser]  # Allow employees to access customers
+    export_columns = CUSTOMER_COLUMNS
+    export_filename = 'customers'
+    # ?ordering= values; anything else keeps the default order
+    orderable_fields = ('booking_count', 'party_count', 'total_spent', 'last_visit', 'name', 'created_at')
+    orderings = {prefix + field for field in orderable_fields for prefix in ('', '-')}
 
     def get_queryset(self):
-        queryset = Customer.objects.annotate(
-            booking_count=Count('bookings'),
-            total_spent=Sum('bookings__amount'),
-            last_visit=Max('bookings__date')
-        )
+        # booking_count, party_count, total_spent and last_visit are stored
+        # columns (see customer_stats.py), so sorting by them uses an index
+        queryset = Customer.objects.all()
         
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search)
-            )
+        query = self.request.query_params.get('search', None)
+        if query:
+            queryset = search(queryset, query)
+            
+        # Ordering, e.g. ?ordering=-total_spent or ?ordering=-last_visit
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering in self.orderings:
+            queryset = queryset.order_by(ordering, '-id')
+        elif query:
+            queryset = queryset.order_by('-search_rank', '-created_at')
             
         return queryset
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
+    export_columns = BOOKING_COLUMNS
+    export_filename = 'session_bookings'
     
     def get_queryset(self):
-        queryset = Booking.objects.all()
+        # Load what BookingSerializer reads per row up front
+        queryset = Booking.objects.select_related('customer').prefetch_related('transactions', 'waivers')
         
         # Filtering
         booking_type = self.request.query_params.get('type', None)
@@ -60,14 +75,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         if date:
             queryset = queryset.filter(date=date)
             
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search) |
-                Q(uuid__icontains=search)
-            )
+        query = self.request.query_params.get('search', None)
+        if query:
+            queryset = search(queryset, query)
         
         # Arrival status filter
         has_arrived = self.request.query_params.get('has_arrived', None)
@@ -81,17 +91,16 @@ class BookingViewSet(viewsets.ModelViewSet):
         ordering = self.request.query_params.get('ordering', None)
         if ordering:
             queryset = queryset.order_by(ordering)
+        elif query:
+            queryset = queryset.order_by('-search_rank', '-created_at') # Best matches first
         else:
             queryset = queryset.order_by('-created_at') # Default to newest first
-        
-        # DEBUG: Print queryset info
-        print(f"[DEBUG] BookingViewSet.get_queryset()")
-        print(f"[DEBUG] Query params: {dict(self.request.query_params)}")
-        print(f"[DEBUG] Queryset count: {queryset.count()}")
-        if queryset.count() > 0:
-            print(f"[DEBUG] First booking: ID={queryset.first().id}, Name={queryset.first().name}")
             
         return queryset
+
+    def get_export_queryset(self):
+        # Export columns are all local fields
+        return super().get_export_queryset().select_related(None).prefetch_related(None)
     
     def get_permissions(self):
         # Allow public access ONLY for create and ticket retrieval
@@ -164,10 +173,30 @@ class BookingViewSet(viewsets.ModelViewSet):
             'booking': serializer.data
         })
 
-class WaiverViewSet(viewsets.ModelViewSet):
+class WaiverViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Waiver.objects.all()
     serializer_class = WaiverSerializer
-    
+    export_columns = WAIVER_COLUMNS
+    export_filename = 'waivers'
+
+    def get_queryset(self):
+        queryset = Waiver.objects.all()
+        if self.action not in ('export_csv', 'export_ndjson'):
+            # Arrival comes from the bookings; the exports only need their ids
+            queryset = with_booking_info(queryset)
+
+        query = self.request.query_params.get('search', None)
+        if query:
+            queryset = search(queryset, query).order_by('-search_rank', '-signed_at')
+
+        return queryset
+
+    def perform_destroy(self, instance):
+        waiver_id = instance.pk
+        instance.delete()
+        # No post_delete receiver for waivers (see signals.py)
+        transaction.on_commit(lambda: waiver_pdf.evict([waiver_id]))
+
     def get_permissions(self):
         # Allow public access for create (when customers sign waivers)
         # Require staff authentication for list/retrieve/update
@@ -202,119 +231,40 @@ class WaiverViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
-        """Generate and download waiver PDF"""
+        """Download a waiver PDF (rendered once per waiver version)"""
         waiver = self.get_object()
         
-        response = HttpResponse(content_type='application/pdf')
+        response = HttpResponse(waiver_pdf.get_pdf(waiver), content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="waiver_{waiver.id}.pdf"'
-        
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Header
-        p.setFont("Helvetica-Bold", 24)
-        p.drawString(1 * inch, height - 1 * inch, "Ninja Inflatable Park")
-        p.setFont("Helvetica", 12)
-        p.drawString(1 * inch, height - 1.3 * inch, "Liability Waiver & Release Form")
-        
-        # Waiver Details
-        y = height - 2 * inch
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(1 * inch, y, "Participant Information")
-        y -= 0.3 * inch
-        
-        p.setFont("Helvetica", 12)
-        p.drawString(1 * inch, y, f"Name: {waiver.name}")
-        y -= 0.25 * inch
-        p.drawString(1 * inch, y, f"Type: {waiver.participant_type}")
-        y -= 0.25 * inch
-        if waiver.dob:
-            p.drawString(1 * inch, y, f"Date of Birth: {waiver.dob}")
-            y -= 0.25 * inch
-        if waiver.email:
-            p.drawString(1 * inch, y, f"Email: {waiver.email}")
-            y -= 0.25 * inch
-        if waiver.phone:
-            p.drawString(1 * inch, y, f"Phone: {waiver.phone}")
-            y -= 0.25 * inch
-            
-        # Booking Info
-        y -= 0.5 * inch
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(1 * inch, y, "Booking Details")
-        y -= 0.3 * inch
-        p.setFont("Helvetica", 12)
-        
-        if waiver.booking:
-            p.drawString(1 * inch, y, f"Booking ID: {waiver.booking.id}")
-            y -= 0.25 * inch
-            p.drawString(1 * inch, y, f"Date: {waiver.booking.date}")
-        elif waiver.party_booking:
-            p.drawString(1 * inch, y, f"Party Booking ID: {waiver.party_booking.id}")
-            y -= 0.25 * inch
-            p.drawString(1 * inch, y, f"Date: {waiver.party_booking.date}")
-            
-        # Agreement
-        y -= 0.5 * inch
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(1 * inch, y, "Agreement")
-        y -= 0.3 * inch
-        p.setFont("Helvetica", 10)
-        text = "By signing this document, I acknowledge that I have read and understood the terms and conditions of the Ninja Inflatable Park liability waiver. I voluntarily assume all risks associated with participation."
-        
-        p.drawString(1 * inch, y, text[:90])
-        p.drawString(1 * inch, y - 15, text[90:])
-        
-        # Signature
-        y -= 1.5 * inch
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(1 * inch, y, "Signed By:")
-        p.line(2 * inch, y, 5 * inch, y)
-        p.drawString(2 * inch, y + 5, waiver.name)
-        
-        y -= 0.5 * inch
-        p.drawString(1 * inch, y, "Date:")
-        p.drawString(2 * inch, y, waiver.signed_at.strftime('%Y-%m-%d %H:%M') if waiver.signed_at else 'N/A')
-        
-        y -= 0.5 * inch
-        p.drawString(1 * inch, y, "IP Address:")
-        p.drawString(2 * inch, y, waiver.ip_address or 'N/A')
-        
-        p.showPage()
-        p.save()
         return response
     
     @action(detail=False, methods=['get'])
-    def export_csv(self, request):
-        """Export all waivers to CSV"""
-        import csv
-        from django.http import HttpResponse
-        
-        waivers = self.get_queryset()
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="waivers.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Name', 'Email', 'Phone', 'Type', 'Signed Date', 'Booking Type', 'Booking ID', 'DOB', 'Emergency Contact'])
-        
-        for waiver in waivers:
-            booking_type = 'Session' if waiver.booking else ('Party' if waiver.party_booking else 'Walk-in')
-            booking_id = waiver.booking.id if waiver.booking else (waiver.party_booking.id if waiver.party_booking else 'N/A')
-            
-            writer.writerow([
-                waiver.id,
-                waiver.name,
-                waiver.email or '',
-                waiver.phone or '',
-                waiver.participant_type,
-                waiver.signed_at.strftime('%Y-%m-%d %H:%M') if waiver.signed_at else '',
-                booking_type,
-                booking_id,
-                waiver.dob.strftime('%Y-%m-%d') if waiver.dob else '',
-                waiver.emergency_contact or ''
-            ])
-        
+    def pack(self, request):
+        """
+        Every waiver for a visit date (?date=YYYY-MM-DD) or a booking
+        (?booking_id= / ?party_booking_id=), as a ZIP (default) or one
+        merged PDF (?output=pdf). Not ?format=, which DRF reserves.
+        """
+        params = request.query_params
+        export_format = params.get('output', 'zip')
+        if export_format not in ('zip', 'pdf'):
+            return Response({'error': 'output must be zip or pdf'}, status=400)
+        date = params.get('date')
+        try:
+            if date and not parse_date(date):
+                raise ValueError('date must be YYYY-MM-DD')
+            pages = waiver_pdf.pack_waivers(date, params.get('booking_id'), params.get('party_booking_id'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if not pages:
+            return Response({'error': 'No waivers found'}, status=404)
+        
+        name = f"waivers_{date or params.get('booking_id') or 'party_' + params.get('party_booking_id')}"
+        if export_format == 'pdf':
+            response = HttpResponse(waiver_pdf.merged_pdf(pages), content_type='application/pdf')
+        else:
+            response = StreamingHttpResponse(waiver_pdf.iter_zip(pages), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
         return response
     
     @action(detail=False, methods=['get'])
@@ -324,9 +274,9 @@ class WaiverViewSet(viewsets.ModelViewSet):
         party_booking_id = request.query_params.get('party_booking_id')
         
         if booking_id:
-            waivers = self.queryset.filter(booking_id=booking_id)
+            waivers = self.get_queryset().filter(booking_id=booking_id)
         elif party_booking_id:
-            waivers = self.queryset.filter(party_booking_id=party_booking_id)
+            waivers = self.get_queryset().filter(party_booking_id=party_booking_id)
         else:
             return Response({'error': 'Please provide booking_id or party_booking_id'}, status=400)
         
@@ -363,19 +313,19 @@ def waiver_list_view(request):
                 'minors': waiver.minors,
                 'adults': waiver.adults,
                 'is_verified': waiver.is_verified,  # Add this field
-                'booking': waiver.booking.id if waiver.booking else None,
-                'party_booking': waiver.party_booking.id if waiver.party_booking else None,
-                'customer': waiver.customer.id if waiver.customer else None,
+                'booking': waiver.booking_id,
+                'party_booking': waiver.party_booking_id,
+                'customer': waiver.customer_id,
                 'created_at': waiver.created_at.isoformat(),
                 'updated_at': waiver.updated_at.isoformat(),
             }
             
-            # Add booking reference
-            if waiver.booking:
-                waiver_data['booking_reference'] = f"Session #{waiver.booking.id}"
+            # Add booking reference (from the ids, so no query per waiver)
+            if waiver.booking_id:
+                waiver_data['booking_reference'] = f"Session #{waiver.booking_id}"
                 waiver_data['booking_type'] = 'SESSION'
-            elif waiver.party_booking:
-                waiver_data['booking_reference'] = f"Party #{waiver.party_booking.id}"
+            elif waiver.party_booking_id:
+                waiver_data['booking_reference'] = f"Party #{waiver.party_booking_id}"
                 waiver_data['booking_type'] = 'PARTY'
             else:
                 waiver_data['booking_reference'] = "Walk-in"
@@ -506,16 +456,39 @@ def waiver_detail_view(request, id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsStaffUser]  # Allow employees to access transactions
+    export_columns = TRANSACTION_COLUMNS
+    export_filename = 'transactions'
+
+    def get_export_queryset(self):
+        return super().get_export_queryset().select_related('booking').order_by('-created_at')
 
 class BookingBlockViewSet(viewsets.ModelViewSet):
     queryset = BookingBlock.objects.all()
     serializer_class = BookingBlockSerializer
     permission_classes = [IsStaffUser]  # Allow employees to manage booking blocks
 
+def _add_participants_response(party_booking, request):
+    """Shared body of both add_participants endpoints"""
+    try:
+        result = ingest_party_participants(
+            party_booking,
+            request.data.get('participants', {}),
+            waiver_signed=request.data.get('waiver_signed', False),
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+    except ParticipantError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'message': 'Participants added successfully',
+        **result,
+    })
+
 # Custom function-based view for party booking creation (bypasses serializer bug)
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])
@@ -550,38 +523,36 @@ def create_party_booking_view(request):
         try:
             data = request.data
             
-            # Create or get customer
-            customer = None
-            if data.get('email'):
-                customer, created = Customer.objects.get_or_create(
-                    email=data['email'],
-                    defaults={
-                        'name': data.get('name', ''),
-                        'phone': data.get('phone', ''),
-                    }
+            # Create party booking, taking its slot in the same transaction
+            with transaction.atomic():
+                reservations.reserve(
+                    reservations.PARTY,
+                    data.get('date'),
+                    data.get('time'),
+                    reservations.quantity_for(reservations.PARTY),
+                    hold_token=data.get('hold_token'),
+                    force=request.user.is_staff,
                 )
-                if not created and not customer.name:
-                    customer.name = data.get('name', '')
-                    customer.phone = data.get('phone', '')
-                    customer.save()
-            
-            # Create party booking
-            booking = PartyBooking.objects.create(
-                name=data.get('name'),
-                email=data.get('email'),
-                phone=data.get('phone'),
-                date=data.get('date'),
-                time=data.get('time'),
-                package_name=data.get('package_name', 'Standard Party'),
-                kids=int(data.get('kids', 0)),
-                adults=int(data.get('adults', 0)),
-                amount=float(data.get('amount', 0)),
-                birthday_child_name=data.get('birthday_child_name'),
-                birthday_child_age=int(data.get('birthday_child_age')) if data.get('birthday_child_age') else None,
-                status=data.get('status', 'PENDING'),
-                customer=customer,
-                waiver_signed=data.get('waiver_signed', False),
-            )
+                # Create or get customer
+                customer = resolve_customer(data.get('email'), data.get('name', ''), data.get('phone', ''))
+                booking = PartyBooking(
+                    name=data.get('name'),
+                    email=data.get('email'),
+                    phone=data.get('phone'),
+                    date=data.get('date'),
+                    time=data.get('time'),
+                    package_name=data.get('package_name', 'Standard Party'),
+                    kids=int(data.get('kids', 0)),
+                    adults=int(data.get('adults', 0)),
+                    amount=float(data.get('amount', 0)),
+                    birthday_child_name=data.get('birthday_child_name'),
+                    birthday_child_age=int(data.get('birthday_child_age')) if data.get('birthday_child_age') else None,
+                    status=data.get('status', 'PENDING'),
+                    customer=customer,
+                    waiver_signed=data.get('waiver_signed', False),
+                )
+                booking._slot_reserved = True
+                booking.save()
             
             return Response({
                 'id': booking.id,
@@ -602,15 +573,22 @@ def create_party_booking_view(request):
                 'updated_at': booking.updated_at.isoformat(),
             }, status=status.HTTP_201_CREATED)
             
+        except reservations.SlotUnavailable as e:
+            return Response({
+                'error': str(e),
+                'detail': 'This party slot is fully booked'
+            }, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({
                 'error': str(e),
                 'detail': 'Failed to create party booking'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class PartyBookingViewSet(viewsets.ModelViewSet):
+class PartyBookingViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = PartyBooking.objects.all()
     serializer_class = PartyBookingSerializer
+    export_columns = PARTY_BOOKING_COLUMNS
+    export_filename = 'party_bookings'
     
     def get_queryset(self):
         queryset = PartyBooking.objects.all()
@@ -626,14 +604,9 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date=date)
         
         # Search filter
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search) |
-                Q(uuid__icontains=search)
-            )
+        query = self.request.query_params.get('search', None)
+        if query:
+            queryset = search(queryset, query)
         
         # Arrival status filter
         has_arrived = self.request.query_params.get('has_arrived', None)
@@ -647,6 +620,8 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
         ordering = self.request.query_params.get('ordering', None)
         if ordering:
             queryset = queryset.order_by(ordering)
+        elif query:
+            queryset = queryset.order_by('-search_rank', '-created_at')
         else:
             queryset = queryset.order_by('-created_at')
         
@@ -667,97 +642,25 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def add_participants(self, request, pk=None):
         """Add participant details to party booking and create individual waivers"""
-        from django.utils import timezone
-        
-        party_booking = self.get_object()
-        participants = request.data.get('participants', {})
-        waiver_signed = request.data.get('waiver_signed', False)
-        ip_address = request.META.get('REMOTE_ADDR')
-        
-        # Save participants data
-        party_booking.participants = participants
-        party_booking.waiver_signed = waiver_signed
-        if waiver_signed:
-            party_booking.waiver_signed_at = timezone.now()
-            party_booking.waiver_ip_address = ip_address
-        party_booking.save()
-        
-        # Delete existing waivers for this party booking to prevent duplicates
-        # This makes the endpoint idempotent - calling it multiple times won't create duplicates
-        Waiver.objects.filter(party_booking=party_booking).delete()
-        
-        # Find the primary adult
-        primary_adult = None
-        additional_adults = []
-        
-        for adult in participants.get('adults', []):
-            if adult.get('is_primary', False):
-                primary_adult = adult
-            else:
-                additional_adults.append(adult)
-        
-        # If no primary adult is marked, use the first adult
-        if not primary_adult and participants.get('adults'):
-            primary_adult = participants['adults'][0]
-            additional_adults = participants['adults'][1:]
-        
-        # Create waiver for primary adult with minors nested
-        if primary_adult:
-            Waiver.objects.create(
-                name=primary_adult.get('name'),
-                email=primary_adult.get('email'),
-                phone=primary_adult.get('phone'),
-                dob=primary_adult.get('dob'),
-                participant_type='ADULT',
-                is_primary_signer=True,
-                party_booking=party_booking,
-                customer=party_booking.customer,
-                ip_address=ip_address,
-                version='1.0',
-                minors=participants.get('minors', []),  # Store minors in JSON field
-                adults=additional_adults  # Store additional adults in JSON field
-            )
-        
-        # Create separate waiver records for additional adults only
-        for adult in additional_adults:
-            Waiver.objects.create(
-                name=adult.get('name'),
-                email=adult.get('email'),
-                phone=adult.get('phone'),
-                dob=adult.get('dob'),
-                participant_type='ADULT',
-                is_primary_signer=False,
-                party_booking=party_booking,
-                customer=party_booking.customer,
-                ip_address=ip_address,
-                version='1.0'
-            )
-        
-        return Response({
-            'success': True,
-            'message': 'Participants added successfully',
-            'waiver_count': len(participants.get('adults', [])) + len(participants.get('minors', []))
-        })
+        return _add_participants_response(self.get_object(), request)
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def resend_confirmation_email(self, request, pk=None):
         """Resend booking confirmation email to customer"""
         party_booking = self.get_object()
         
-        try:
-            # TODO: Implement email sending logic here
-            # For now, just return success
-            # In production, you would use Django's send_mail or your email service
-            
-            return Response({
-                'success': True,
-                'message': f'Confirmation email sent to {party_booking.customer_email}'
-            })
-        except Exception as e:
+        if not party_booking.email:
             return Response({
                 'success': False,
-                'message': f'Failed to send email: {str(e)}'
-            }, status=500)
+                'message': 'This booking has no email address'
+            }, status=400)
+
+        # Sent by the job worker; the request only queues it
+        enqueue('party_booking_confirmation', {'party_booking_id': party_booking.id})
+        return Response({
+            'success': True,
+            'message': f'Confirmation email queued for {party_booking.email}'
+        })
     
     @action(detail=True, methods=['post'], permission_classes=[IsStaffUser])
     def mark_arrived(self, request, pk=None):
@@ -797,77 +700,8 @@ def add_party_participants_view(request, uuid):
     Custom view to add participants to a party booking identified by UUID.
     This bypasses the PartyBookingViewSet lookup which expects integer PKs.
     """
-    from django.utils import timezone
-    
     party_booking = get_object_or_404(PartyBooking, uuid=uuid)
-    participants = request.data.get('participants', {})
-    waiver_signed = request.data.get('waiver_signed', False)
-    ip_address = request.META.get('REMOTE_ADDR')
-    
-    # Save participants data
-    party_booking.participants = participants
-    party_booking.waiver_signed = waiver_signed
-    if waiver_signed:
-        party_booking.waiver_signed_at = timezone.now()
-        party_booking.waiver_ip_address = ip_address
-    party_booking.save()
-    
-    # Delete existing waivers for this party booking to prevent duplicates
-    # This makes the endpoint idempotent - calling it multiple times won't create duplicates
-    Waiver.objects.filter(party_booking=party_booking).delete()
-    
-    # Find the primary adult
-    primary_adult = None
-    additional_adults = []
-    
-    for adult in participants.get('adults', []):
-        if adult.get('is_primary', False):
-            primary_adult = adult
-        else:
-            additional_adults.append(adult)
-    
-    # If no primary adult is marked, use the first adult
-    if not primary_adult and participants.get('adults'):
-        primary_adult = participants['adults'][0]
-        additional_adults = participants['adults'][1:]
-    
-    # Create waiver for primary adult with minors nested
-    if primary_adult:
-        Waiver.objects.create(
-            name=primary_adult.get('name'),
-            email=primary_adult.get('email'),
-            phone=primary_adult.get('phone'),
-            dob=primary_adult.get('dob'),
-            participant_type='ADULT',
-            is_primary_signer=True,
-            party_booking=party_booking,
-            customer=party_booking.customer,
-            ip_address=ip_address,
-            version='1.0',
-            minors=participants.get('minors', []),  # Store minors in JSON field
-            adults=additional_adults  # Store additional adults in JSON field
-        )
-    
-    # Create separate waiver records for additional adults only
-    for adult in additional_adults:
-        Waiver.objects.create(
-            name=adult.get('name'),
-            email=adult.get('email'),
-            phone=adult.get('phone'),
-            dob=adult.get('dob'),
-            participant_type='ADULT',
-            is_primary_signer=False,
-            party_booking=party_booking,
-            customer=party_booking.customer,
-            ip_address=ip_address,
-            version='1.0'
-        )
-    
-    return Response({
-        'success': True,
-        'message': 'Participants added successfully',
-        'waiver_count': len(participants.get('adults', [])) + len(participants.get('minors', []))
-    })
+    return _add_participants_response(party_booking, request)
 
 @api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([permissions.IsAdminUser])
@@ -940,6 +774,29 @@ def party_booking_detail_view(request, id):
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=500)
 
+@api_view(['POST'])
+@permission_classes([IsStaffUser])
+def check_in_view(request):
+    """
+    Gate check-in by scanned ticket (booking UUID, QR code or QR URL).
+    Send {"ticket": "..."} for one scan or {"scans": [{"ticket": "...",
+    "scanned_at": "<ISO time>"}, ...]} for a batch queued by an offline
+    device. See checkin.py.
+    """
+    data = request.data
+    if 'scans' in data:
+        scans = data['scans']
+        if not isinstance(scans, list) or not all(isinstance(scan, dict) for scan in scans):
+            return Response({'error': 'scans must be a list of {"ticket": ...} objects'}, status=400)
+        if len(scans) > checkin.MAX_BATCH:
+            return Response({'error': f'At most {checkin.MAX_BATCH} scans per batch'}, status=400)
+        return Response({'results': checkin.check_in(scans)})
+
+    if not data.get('ticket'):
+        return Response({'error': 'ticket is required'}, status=400)
+    result = checkin.check_in([{'ticket': data['ticket']}])[0]
+    return Response(result, status=404 if result['status'] == checkin.NOT_FOUND else 200)
+
 @api_view(['POST'])
 @permission_classes([IsStaffUser])
 def mark_party_arrived_view(request, pk):
@@ -1020,19 +877,7 @@ class SessionBookingHistoryViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Create or get customer
-                customer = None
-                if history.email:
-                    customer, created = Customer.objects.get_or_create(
-                        email=history.email,
-                        defaults={
-                            'name': history.name,
-                            'phone': history.phone,
-                        }
-                    )
-                    if not created and not customer.name:
-                        customer.name = history.name
-                        customer.phone = history.phone
-                        customer.save()
+                customer = resolve_customer(history.email, history.name, history.phone)
                 
                 # Create new booking from history data
                 booking = Booking.objects.create(
@@ -1122,19 +967,7 @@ class PartyBookingHistoryViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Create or get customer
-                customer = None
-                if history.email:
-                    customer, created = Customer.objects.get_or_create(
-                        email=history.email,
-                        defaults={
-                            'name': history.name,
-                            'phone': history.phone,
-                        }
-                    )
-                    if not created and not customer.name:
-                        customer.name = history.name
-                        customer.phone = history.phone
-                        customer.save()
+                customer = resolve_customer(history.email, history.name, history.phone)
                 
                 # Create new party booking from history data
                 party_booking = PartyBooking.objects.create(
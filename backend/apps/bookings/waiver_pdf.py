@@ -0,0 +1,323 @@
+"""
+Waiver PDFs: single downloads and bulk "waiver packs".
+
+Rendering works on plain dicts (`waiver_data`) so it can run in worker
+processes. Every rendered PDF is stored in WAIVER_PDF_CACHE_DIR under the
+SHA-256 of the data it was drawn from (waiver id, updated_at and the
+booking fields printed on it), so an unchanged waiver is never drawn twice
+and an edit simply produces a new key.
+
+A pack renders the cache misses across a process pool and streams either a
+ZIP of per-waiver PDFs or one merged PDF. No PDF merge library is a
+dependency, so a merged pack cannot reuse the per-waiver files: it is drawn
+in the calling process as one multi-page document and cached under the
+combined key of its waivers. Large packs should use the ZIP output.
+
+The cache lives outside MEDIA_ROOT: waivers hold personal data and must
+only be served through the staff-only endpoints. It is kept small:
+
+- a waiver's PDFs live in waivers/<id>/, and storing a new version
+  removes the older ones;
+- `evict(waiver_ids)` (on waiver save and delete) removes those
+  directories and every cached pack, as packs are not indexed by waiver;
+- `prune(max_age)` (the `prune_waiver_pdfs` command) removes anything
+  older than WAIVER_PDF_CACHE_DAYS, e.g. files of waivers deleted in bulk.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+LAYOUT_VERSION = 1
+AGREEMENT_TEXT = (
+    "By signing this document, I acknowledge that I have read and understood the terms and "
+    "conditions of the Ninja Inflatable Park liability waiver. I voluntarily assume all risks "
+    "associated with participation."
+)
+
+
+def waiver_data(waiver):
+    """Everything printed on a waiver's PDF, as JSON-safe values"""
+    booking = waiver.booking if waiver.booking_id else None
+    party = waiver.party_booking if waiver.party_booking_id else None
+    return {
+        'id': waiver.id,
+        'updated_at': waiver.updated_at.isoformat() if waiver.updated_at else None,
+        'name': waiver.name,
+        'participant_type': waiver.participant_type,
+        'dob': str(waiver.dob) if waiver.dob else None,
+        'email': waiver.email,
+        'phone': waiver.phone,
+        'booking_id': booking.id if booking else None,
+        'party_booking_id': party.id if party else None,
+        'booking_date': str(booking.date if booking else party.date) if (booking or party) else None,
+        'signed_at': waiver.signed_at.strftime('%Y-%m-%d %H:%M') if waiver.signed_at else None,
+        'ip_address': waiver.ip_address,
+    }
+
+
+def cache_key(*items):
+    payload = json.dumps([LAYOUT_VERSION, *items], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def draw_waiver(p, data):
+    """Draw one waiver as the current page of canvas `p`"""
+    width, height = letter
+
+    # Header
+    p.setFont("Helvetica-Bold", 24)
+    p.drawString(1 * inch, height - 1 * inch, "Ninja Inflatable Park")
+    p.setFont("Helvetica", 12)
+    p.drawString(1 * inch, height - 1.3 * inch, "Liability Waiver & Release Form")
+
+    # Waiver Details
+    y = height - 2 * inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1 * inch, y, "Participant Information")
+    y -= 0.3 * inch
+
+    p.setFont("Helvetica", 12)
+    p.drawString(1 * inch, y, f"Name: {data['name']}")
+    y -= 0.25 * inch
+    p.drawString(1 * inch, y, f"Type: {data['participant_type']}")
+    y -= 0.25 * inch
+    for label, field in (("Date of Birth", 'dob'), ("Email", 'email'), ("Phone", 'phone')):
+        if data[field]:
+            p.drawString(1 * inch, y, f"{label}: {data[field]}")
+            y -= 0.25 * inch
+
+    # Booking Info
+    y -= 0.5 * inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1 * inch, y, "Booking Details")
+    y -= 0.3 * inch
+    p.setFont("Helvetica", 12)
+
+    if data['booking_id']:
+        p.drawString(1 * inch, y, f"Booking ID: {data['booking_id']}")
+        y -= 0.25 * inch
+        p.drawString(1 * inch, y, f"Date: {data['booking_date']}")
+    elif data['party_booking_id']:
+        p.drawString(1 * inch, y, f"Party Booking ID: {data['party_booking_id']}")
+        y -= 0.25 * inch
+        p.drawString(1 * inch, y, f"Date: {data['booking_date']}")
+
+    # Agreement
+    y -= 0.5 * inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1 * inch, y, "Agreement")
+    y -= 0.3 * inch
+    p.setFont("Helvetica", 10)
+    p.drawString(1 * inch, y, AGREEMENT_TEXT[:90])
+    p.drawString(1 * inch, y - 15, AGREEMENT_TEXT[90:])
+
+    # Signature
+    y -= 1.5 * inch
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(1 * inch, y, "Signed By:")
+    p.line(2 * inch, y, 5 * inch, y)
+    p.drawString(2 * inch, y + 5, data['name'])
+
+    y -= 0.5 * inch
+    p.drawString(1 * inch, y, "Date:")
+    p.drawString(2 * inch, y, data['signed_at'] or 'N/A')
+
+    y -= 0.5 * inch
+    p.drawString(1 * inch, y, "IP Address:")
+    p.drawString(2 * inch, y, data['ip_address'] or 'N/A')
+
+    p.showPage()
+
+
+def render_pdf(pages):
+    """PDF bytes with one page per waiver dict (runs in worker processes)"""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    for data in pages:
+        draw_waiver(p, data)
+    p.save()
+    return buffer.getvalue()
+
+
+def _waiver_dir(waiver_id):
+    return os.path.join(settings.WAIVER_PDF_CACHE_DIR, 'waivers', str(waiver_id))
+
+
+def _cache_path(key, waiver_id=None):
+    """waivers/<id>/<key>.pdf for one waiver, packs/<key[:2]>/<key>.pdf otherwise"""
+    if waiver_id is not None:
+        return os.path.join(_waiver_dir(waiver_id), f'{key}.pdf')
+    return os.path.join(settings.WAIVER_PDF_CACHE_DIR, 'packs', key[:2], f'{key}.pdf')
+
+
+def cached(key, waiver_id=None):
+    try:
+        with open(_cache_path(key, waiver_id), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def store(key, content, waiver_id=None):
+    path = _cache_path(key, waiver_id)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    if waiver_id is not None:
+        # Older versions of this waiver are never asked for again
+        for name in os.listdir(directory):
+            if name.endswith('.pdf') and name != os.path.basename(path):
+                _remove(os.path.join(directory, name))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict(waiver_ids):
+    """Drop the cached PDFs of these waivers and every cached pack"""
+    for waiver_id in waiver_ids:
+        shutil.rmtree(_waiver_dir(waiver_id), ignore_errors=True)
+    if waiver_ids:
+        shutil.rmtree(os.path.join(settings.WAIVER_PDF_CACHE_DIR, 'packs'), ignore_errors=True)
+
+
+def prune(max_age):
+    """Delete cached PDFs older than `max_age` (a timedelta); returns how many"""
+    cutoff = time.time() - max_age.total_seconds()
+    removed = 0
+    for directory, _, names in os.walk(settings.WAIVER_PDF_CACHE_DIR, topdown=False):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if directory != settings.WAIVER_PDF_CACHE_DIR:
+            try:
+                os.rmdir(directory)  # Only succeeds once empty
+            except OSError:
+                pass
+    return removed
+
+
+def get_pdf(waiver):
+    """One waiver's PDF, rendered at most once per version"""
+    data = waiver_data(waiver)
+    key = cache_key(data)
+    content = cached(key, data['id'])
+    if content is None:
+        content = render_pdf([data])
+        store(key, content, data['id'])
+    return content
+
+
+def iter_pdfs(pages, workers=None):
+    """
+    Yield (data, pdf bytes) for each waiver dict in order, rendering cache
+    misses in a process pool when there is more than one.
+    """
+    workers = workers or settings.WAIVER_PDF_WORKERS
+    keys = [cache_key(data) for data in pages]
+    hits = {key: cached(key, data['id']) for data, key in zip(pages, keys)}
+    misses = [data for data, key in zip(pages, keys) if hits[key] is None]
+
+    rendered = iter(())
+    pool = None
+    if len(misses) > 1 and workers > 1:
+        # spawn: never fork a (possibly threaded) server process
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(misses)), mp_context=multiprocessing.get_context('spawn'))
+        rendered = pool.map(render_pdf, [[data] for data in misses])
+    try:
+        for data, key in zip(pages, keys):
+            content = hits[key]
+            if content is None:
+                content = next(rendered) if pool else render_pdf([data])
+                store(key, content, data['id'])
+            yield data, content
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+
+def merged_pdf(pages):
+    """
+    All waivers as one PDF, cached under the combined key. Drawn in this
+    process without the pool or the per-waiver files (see the module
+    docstring), so its cost grows with the pack on every cache miss.
+    """
+    key = cache_key('pack', [cache_key(data) for data in pages])
+    content = cached(key)
+    if content is None:
+        content = render_pdf(pages)
+        store(key, content)
+    return content
+
+
+class _Sink:
+    """Write-only file whose contents are drained after each ZIP entry."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def pdf_filename(data):
+    return f"waiver_{data['id']}.pdf"
+
+
+def iter_zip(pages, workers=None):
+    """Stream a ZIP of per-waiver PDFs chunk by chunk"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for data, content in iter_pdfs(pages, workers):
+            archive.writestr(pdf_filename(data), content)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def pack_waivers(date=None, booking_id=None, party_booking_id=None):
+    """Waivers for a visit date or a booking, as waiver_data dicts"""
+    from django.db.models import Q
+    from .models import Waiver
+
+    queryset = Waiver.objects.select_related('booking', 'party_booking').order_by('id')
+    if booking_id:
+        queryset = queryset.filter(booking_id=booking_id)
+    elif party_booking_id:
+        queryset = queryset.filter(party_booking_id=party_booking_id)
+    elif date:
+        queryset = queryset.filter(Q(booking__date=date) | Q(party_booking__date=date))
+    else:
+        raise ValueError('Provide a date, booking_id or party_booking_id')
+    return [waiver_data(waiver) for waiver in queryset]
@@ -3,7 +3,7 @@ from .models import (
     Banner, Activity, Faq, SocialLink, GalleryItem,
     StatCard, InstagramReel, MenuSection, GroupPackage, GuidelineCategory, LegalDocument,
     PageSection, PricingPlan, ContactInfo, PartyPackage, TimelineItem, ValueItem, FacilityItem,
-    Page
+    Page, ImageAsset
 )
 
 @admin.register(Banner)
@@ -248,3 +248,10 @@ class FacilityItemAdmin(admin.ModelAdmin):
     list_filter = ['active']
     search_fields = ['title', 'description']
     ordering = ['order']
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'original_url', 'width', 'height', 'size', 'created_at']
+    search_fields = ['original_name', 'original_url', 'content_hash']
+    readonly_fields = ['content_hash', 'variants', 'placeholder', 'created_at']
+    ordering = ['-created_at']
@@ -0,0 +1,125 @@
+"""
+Versioned, cache-backed bundle of public CMS content.
+
+A page load used to call a dozen list endpoints. `get_bundle(page)` returns
+everything active for one page (its Page row, page sections and stat
+cards, plus the site-wide collections) as one pre-serialized JSON blob.
+
+Blobs are cached under the current content version, a counter row in the
+database (ContentVersion) so that every server process sees it. Any CMS
+write bumps the version (see signals.py), so stale bundles are never read
+again and simply age out of the cache. Processes re-read the version at
+most every VERSION_TTL seconds. The version doubles as the ETag.
+"""
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    ContentVersion, Page, Banner, Activity, Faq, SocialLink, GalleryItem, StatCard, InstagramReel,
+    MenuSection, GroupPackage, GuidelineCategory, LegalDocument, PageSection,
+    PricingPlan, ContactInfo, PartyPackage, TimelineItem, ValueItem, FacilityItem,
+)
+from .serializers import (
+    PageSerializer, BannerSerializer, ActivitySerializer, FaqSerializer, SocialLinkSerializer,
+    GalleryItemSerializer, StatCardSerializer, InstagramReelSerializer, MenuSectionSerializer,
+    GroupPackageSerializer, GuidelineCategorySerializer, LegalDocumentSerializer,
+    PageSectionSerializer, PricingPlanSerializer, ContactInfoSerializer, PartyPackageSerializer,
+    TimelineItemSerializer, ValueItemSerializer, FacilityItemSerializer,
+)
+
+BUNDLE_TIMEOUT = 60 * 60 * 24
+VERSION_TTL = 2
+
+# [expires_at, version] of this process's copy of the content version
+_local_version = []
+
+# Bundle key -> (model, serializer, ordering, field holding the page slug)
+COLLECTIONS = {
+    'page_sections': (PageSection, PageSectionSerializer, ['order'], 'page'),
+    'stat_cards': (StatCard, StatCardSerializer, ['order'], 'page'),
+    'banners': (Banner, BannerSerializer, ['order'], None),
+    'activities': (Activity, ActivitySerializer, ['order'], None),
+    'faqs': (Faq, FaqSerializer, ['order'], None),
+    'social_links': (SocialLink, SocialLinkSerializer, ['order'], None),
+    'gallery': (GalleryItem, GalleryItemSerializer, ['order'], None),
+    'instagram_reels': (InstagramReel, InstagramReelSerializer, ['order'], None),
+    'menu_sections': (MenuSection, MenuSectionSerializer, ['order'], None),
+    'group_packages': (GroupPackage, GroupPackageSerializer, ['order'], None),
+    'guideline_categories': (GuidelineCategory, GuidelineCategorySerializer, ['order'], None),
+    'legal_documents': (LegalDocument, LegalDocumentSerializer, ['id'], None),
+    'pricing_plans': (PricingPlan, PricingPlanSerializer, ['type', 'order'], None),
+    'contact_info': (ContactInfo, ContactInfoSerializer, ['category', 'order'], None),
+    'party_packages': (PartyPackage, PartyPackageSerializer, ['order'], None),
+    'timeline_items': (TimelineItem, TimelineItemSerializer, ['order'], None),
+    'value_items': (ValueItem, ValueItemSerializer, ['order'], None),
+    'facility_items': (FacilityItem, FacilityItemSerializer, ['order'], None),
+}
+
+# Models whose writes invalidate every bundle
+CONTENT_MODELS = [Page] + [model for model, _, _, _ in COLLECTIONS.values()]
+
+
+def content_version():
+    """
+    Current content version. Read from the database at most once per
+    VERSION_TTL seconds per process, so other processes see a bump within
+    that window without a shared cache.
+    """
+    now = time.monotonic()
+    if _local_version and _local_version[0] > now:
+        return _local_version[1]
+    version = ContentVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        version = ContentVersion.objects.get_or_create(pk=1)[0].version
+    _local_version[:] = [now + VERSION_TTL, version]
+    return version
+
+
+def bump_content_version():
+    """Invalidate every cached bundle (visible to others once committed)."""
+    _local_version.clear()
+    bumped = ContentVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    if not bumped:
+        ContentVersion.objects.get_or_create(pk=1)
+    transaction.on_commit(_local_version.clear)
+
+
+def clear_local_version():
+    """Forget the per-process copy of the version (used by tests)."""
+    _local_version.clear()
+
+
+def build_bundle(page):
+    """Serialize all active content for `page` into a dict."""
+    page_row = Page.objects.filter(slug=page, active=True).first()
+    bundle = {
+        'page': page,
+        'meta': PageSerializer(page_row).data if page_row else None,
+    }
+    for key, (model, serializer_class, ordering, page_field) in COLLECTIONS.items():
+        queryset = model.objects.filter(active=True).order_by(*ordering)
+        if page_field:
+            queryset = queryset.filter(**{page_field: page})
+        bundle[key] = serializer_class(queryset, many=True).data
+    return bundle
+
+
+def bundle_etag(version):
+    return f'"cms-{version}"'
+
+
+def get_bundle(page):
+    """Return (etag, json bytes) for `page`, building it on a cache miss."""
+    version = content_version()
+    key = f'cms:bundle:{version}:{page}'
+    body = cache.get(key)
+    if body is None:
+        body = json.dumps(build_bundle(page), cls=DjangoJSONEncoder).encode()
+        cache.set(key, body, BUNDLE_TIMEOUT)
+    return bundle_etag(version), body
@@ -0,0 +1,72 @@
+"""
+HTTP conditional GET for CMS viewsets.
+
+The validator for a list or detail response is Max(updated_at) and the row
+count of the filtered queryset, plus the CMS content version (see
+bundle.py). Computing it is one aggregate query; when the client already
+holds that representation the view answers 304 without fetching rows or
+running the serializer.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .bundle import content_version
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified validators and Cache-Control headers to
+    `list` and `retrieve`, answering If-None-Match / If-Modified-Since
+    with 304. Set `cache_max_age` per viewset.
+    """
+    cache_max_age = 60
+    validator_field = 'updated_at'
+
+    def get_validator(self, queryset):
+        stats = queryset.order_by().aggregate(last_modified=Max(self.validator_field), count=Count('pk'))
+        last_modified = stats['last_modified']
+        raw = f"{self.request.get_full_path()}|{content_version()}|{stats['count']}|{last_modified and last_modified.isoformat()}"
+        etag = f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+        return etag, last_modified
+
+    def _not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if if_modified_since and last_modified:
+            return int(last_modified.timestamp()) <= if_modified_since
+        return False
+
+    def _set_cache_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        if self.request.user.is_authenticated:
+            # Staff see their own edits straight away
+            response['Cache-Control'] = 'private, no-cache'
+        else:
+            response['Cache-Control'] = f'public, max-age={self.cache_max_age}'
+        response['Vary'] = 'Authorization, Cookie'
+        return response
+
+    def _conditional(self, queryset, render, request, *args, **kwargs):
+        etag, last_modified = self.get_validator(queryset)
+        if self._not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render(request, *args, **kwargs)
+        return self._set_cache_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return self._conditional(queryset, super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,62 @@
+"""
+Two-level cache for the booking config singletons.
+
+`get_config()` on SessionBookingConfig / PartyBookingConfig used to run
+get_or_create(id=1) on every call. Reads now come from a per-process copy
+that lives for LOCAL_TTL seconds and only fall through to the database
+when it expires. With a shared cache (CACHE_URL) a second level sits in
+between, so a process refreshing its copy rarely needs the database.
+post_save / post_delete (signals.py) clear both levels once the write
+commits; other processes pick the change up when their local copy expires,
+at most LOCAL_TTL seconds later.
+
+A per-process cache (the LocMem default) is never used as the second
+level: an invalidation there would not reach the other processes.
+"""
+import copy
+import time
+
+from django.core.cache import cache
+
+from apps.core.caching import cache_is_shared
+
+LOCAL_TTL = 30
+SHARED_TIMEOUT = 60 * 60
+
+_local = {}
+
+
+def _key(model):
+    return f'cms:config:{model._meta.label_lower}'
+
+
+def get_cached_config(model):
+    """Return a private copy of `model`'s singleton row (id=1)."""
+    key = _key(model)
+    now = time.monotonic()
+    hit = _local.get(key)
+    if hit and hit[0] > now:
+        return copy.copy(hit[1])
+
+    shared = cache_is_shared()
+    config = cache.get(key) if shared else None
+    if config is None:
+        config = model.objects.filter(id=1).first()
+        if config is None:
+            config, _ = model.objects.get_or_create(id=1)
+        if shared:
+            cache.set(key, config, SHARED_TIMEOUT)
+    _local[key] = (now + LOCAL_TTL, config)
+    return copy.copy(config)
+
+
+def invalidate_config(model):
+    key = _key(model)
+    _local.pop(key, None)
+    if cache_is_shared():
+        cache.delete(key)
+
+
+def clear_local_configs():
+    """Drop every per-process copy (used by tests)."""
+    _local.clear()
@@ -0,0 +1,196 @@
+"""
+Image derivatives for CMS uploads.
+
+`ingest_image()` stores an upload once per SHA-256 of its bytes (a repeat
+upload returns the existing ImageAsset) and renders resized copies in the
+formats in settings.CMS_IMAGE_FORMATS at each of VARIANT_WIDTHS no wider
+than the original, plus a tiny blurred placeholder. Files live under
+uploads/<hash[:2]>/ and uploads/variants/<hash>/, so names never collide.
+
+Variants are rendered at upload time when CMS_IMAGE_EAGER_VARIANTS is on;
+otherwise the upload queues an `image_variants` job and the original is
+served until it finishes. Assets registered before variants existed are
+queued by the `queue_image_variants` command. Serving an image never
+queues anything, and an asset whose job failed for good is only queued
+again on request (`--retry-failed`).
+
+Stored image URLs may be absolute (http://host/media/x.jpg), rooted
+(/media/x.jpg) or relative to MEDIA_ROOT (x.jpg, as `normalize_images`
+writes them); `media_path()` maps all three to the rooted form that
+ImageAsset.original_url holds.
+"""
+import base64
+import hashlib
+import io
+import logging
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from PIL import Image, ImageFilter, ImageOps, features
+
+from apps.core.jobs import enqueue
+from apps.core.models import Job
+from .models import ImageAsset
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = 'image_variants'
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+PLACEHOLDER_WIDTH = 16
+QUALITY = {'webp': 80, 'avif': 60}
+MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+
+
+class ImageError(ValueError):
+    pass
+
+
+def output_formats():
+    """Configured variant formats the installed Pillow can encode"""
+    wanted = getattr(settings, 'CMS_IMAGE_FORMATS', ['webp'])
+    return [fmt for fmt in wanted if fmt in QUALITY and features.check(fmt)]
+
+
+def _open(content):
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except Exception as e:
+        raise ImageError(f'Not a readable image: {e}') from e
+    if image.format not in MIME_TYPES:
+        raise ImageError(f'Unsupported image format: {image.format}')
+    return image
+
+
+def _prepare(image):
+    """Apply EXIF rotation and drop palette/CMYK modes the encoders dislike"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def render_variants(content, content_hash):
+    """Write resized variants of `content`; returns (variants, placeholder)"""
+    image = _prepare(_open(content))
+    widths = [width for width in VARIANT_WIDTHS if width < image.width] + [min(image.width, VARIANT_WIDTHS[-1])]
+    variants = []
+    for fmt in output_formats():
+        for width in sorted(set(widths)):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            data = _encode(resized, fmt, quality=QUALITY[fmt])
+            path = f'uploads/variants/{content_hash}/{width}.{fmt}'
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            path = default_storage.save(path, ContentFile(data))
+            variants.append({
+                'format': fmt, 'width': width, 'height': height,
+                'url': default_storage.url(path), 'bytes': len(data),
+            })
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(_encode(tiny, 'webp', quality=30)).decode()
+    return variants, placeholder
+
+
+def ingest_image(content, name='', eager=None):
+    """
+    Store an uploaded image. Returns (asset, created); an identical earlier
+    upload is returned as-is instead of being stored again.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    existing = ImageAsset.objects.filter(content_hash=content_hash).first()
+    if existing:
+        if not existing.variants:
+            queue_variants(existing)
+        return existing, False
+
+    image = _open(content)
+    content_type = MIME_TYPES[image.format]
+    path = f'uploads/{content_hash[:2]}/{content_hash}.{EXTENSIONS[content_type]}'
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(content))
+    width, height = ImageOps.exif_transpose(image).size
+
+    variants, placeholder = [], ''
+    if getattr(settings, 'CMS_IMAGE_EAGER_VARIANTS', True) if eager is None else eager:
+        variants, placeholder = render_variants(content, content_hash)
+
+    try:
+        with transaction.atomic():
+            asset = ImageAsset.objects.create(
+                content_hash=content_hash, original_url=default_storage.url(path), original_name=name[:255],
+                content_type=content_type, width=width, height=height, size=len(content),
+                variants=variants, placeholder=placeholder,
+            )
+    except IntegrityError:
+        # Same bytes uploaded concurrently; both wrote identical files
+        return ImageAsset.objects.get(content_hash=content_hash), False
+    if not asset.variants:
+        queue_variants(asset)
+    return asset, True
+
+
+def generate_variants(asset):
+    """Render (or re-render) the variants of a stored asset"""
+    path = urlparse(asset.original_url).path
+    media_url = settings.MEDIA_URL.rstrip('/') + '/'
+    with default_storage.open(path[len(media_url):] if path.startswith(media_url) else path, 'rb') as f:
+        content = f.read()
+    asset.variants, asset.placeholder = render_variants(content, asset.content_hash)
+    asset.save(update_fields=['variants', 'placeholder'])
+    from .bundle import bump_content_version
+    # Cached bundles hold the old (variant-less) representation
+    bump_content_version()
+    return asset
+
+
+def queue_variants(asset, retry_failed=False):
+    """
+    Queue variant rendering for `asset` unless it is already queued or, without
+    `retry_failed`, an earlier job gave up on it. Returns whether it queued.
+    """
+    statuses = ['PENDING', 'RUNNING'] if retry_failed else ['PENDING', 'RUNNING', 'FAILED']
+    if Job.objects.filter(kind=JOB_KIND, status__in=statuses, payload__asset_id=asset.pk).exists():
+        return False
+    enqueue(JOB_KIND, {'asset_id': asset.pk})
+    return True
+
+
+def media_path(url):
+    """Rooted media path (/media/...) of a stored image URL, absolute or relative"""
+    if not url:
+        return ''
+    path = urlparse(url).path
+    if path and not path.startswith('/'):
+        path = urlparse(settings.MEDIA_URL).path.rstrip('/') + '/' + path
+    return path
+
+
+def srcset(variants, fmt):
+    return ', '.join(f"{variant['url']} {variant['width']}w" for variant in variants if variant['format'] == fmt)
+
+
+def responsive_image(asset):
+    """The srcset metadata serializers emit for one asset"""
+    formats = list(dict.fromkeys(variant['format'] for variant in asset.variants))
+    return {
+        'width': asset.width,
+        'height': asset.height,
+        'placeholder': asset.placeholder or None,
+        'srcset': srcset(asset.variants, 'webp') or None,
+        'sources': [{'type': f'image/{fmt}', 'srcset': srcset(asset.variants, fmt)} for fmt in formats],
+    }
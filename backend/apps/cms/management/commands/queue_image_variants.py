@@ -0,0 +1,42 @@
+"""
+Django management command to queue variant rendering for image assets that
+have none, e.g. those registered before variants existed or uploaded with
+CMS_IMAGE_EAGER_VARIANTS off before their job ran.
+
+Assets whose job already failed for good are skipped unless --retry-failed
+is given. The `run_jobs` worker renders the queued jobs.
+
+Usage:
+    python manage.py queue_image_variants                  # Queue every asset without variants
+    python manage.py queue_image_variants --retry-failed   # Also retry assets whose job failed
+    python manage.py queue_image_variants --now            # Render here instead of queueing
+"""
+from django.core.management.base import BaseCommand
+
+from apps.cms.images import ImageError, generate_variants, queue_variants
+from apps.cms.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = 'Queue variant rendering for image assets without variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Queue assets whose earlier job failed too')
+        parser.add_argument('--now', action='store_true', help='Render the variants in this process')
+
+    def handle(self, *args, **options):
+        assets = ImageAsset.objects.filter(variants=[]).order_by('pk')
+        done = failed = 0
+        for asset in assets.iterator():
+            if options['now']:
+                try:
+                    generate_variants(asset)
+                except (ImageError, OSError) as e:
+                    failed += 1
+                    self.stderr.write(f'Asset {asset.pk}: {e}')
+                    continue
+                done += 1
+            elif queue_variants(asset, retry_failed=options['retry_failed']):
+                done += 1
+        action = 'Rendered' if options['now'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(f'{action} variants for {done} assets, {failed} failed'))
@@ -0,0 +1,58 @@
+"""
+Django management command to (re)fetch Instagram reel thumbnails in bulk.
+
+Downloads run in a thread pool; database writes happen afterwards on the
+main thread in one transaction.
+
+Usage:
+    python manage.py refresh_reel_thumbnails              # Reels that need a local thumbnail
+    python manage.py refresh_reel_thumbnails --all        # Every reel, ignoring the cache
+    python manage.py refresh_reel_thumbnails --workers 16 --endpoint http://localhost:8081/oembed/
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from apps.cms.models import InstagramReel
+from apps.cms.thumbnails import ThumbnailFetcher, ThumbnailFetchError, needs_fetch, save_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Fetch Instagram reel thumbnails in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refetch every reel, not only those needing it')
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these reel ids')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel downloads')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds')
+        parser.add_argument('--endpoint', help='oEmbed endpoint (defaults to INSTAGRAM_OEMBED_ENDPOINT)')
+
+    def handle(self, *args, **options):
+        reels = InstagramReel.objects.exclude(reel_url='').only('reel_url', 'thumbnail_url')
+        if options['ids']:
+            reels = reels.filter(pk__in=options['ids'])
+        reels = [reel for reel in reels if options['all'] or needs_fetch(reel.thumbnail_url)]
+        if not reels:
+            self.stdout.write('No reels need a thumbnail')
+            return
+
+        fetcher = ThumbnailFetcher(endpoint=options['endpoint'], timeout=options['timeout'])
+        results = {}
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(fetcher.fetch, reel.reel_url, force=options['all']): reel
+                for reel in reels
+            }
+            for future in as_completed(futures):
+                reel = futures[future]
+                try:
+                    results[reel.pk] = (reel.reel_url, future.result())
+                except ThumbnailFetchError as e:
+                    failed += 1
+                    self.stderr.write(f'Reel {reel.pk}: {e}')
+
+        updated = save_thumbnails(results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fetched {len(results)} of {len(reels)} thumbnails, updated {updated} reels, {failed} failed'
+        ))
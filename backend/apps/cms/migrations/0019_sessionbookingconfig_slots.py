@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0018_freeentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionbookingconfig',
+            name='closing_time',
+            field=models.TimeField(default=datetime.time(21, 0), help_text='Time the last session must end by'),
+        ),
+        migrations.AddField(
+            model_name='sessionbookingconfig',
+            name='opening_time',
+            field=models.TimeField(default=datetime.time(10, 0), help_text='Start time of the first session slot'),
+        ),
+        migrations.AddField(
+            model_name='sessionbookingconfig',
+            name='slot_capacity',
+            field=models.IntegerField(default=100, help_text='Maximum jumpers (adults + kids) per slot'),
+        ),
+    ]
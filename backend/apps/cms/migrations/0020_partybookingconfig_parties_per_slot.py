@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0019_sessionbookingconfig_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partybookingconfig',
+            name='parties_per_slot',
+            field=models.IntegerField(default=1, help_text='Number of parties that can be booked into the same time slot'),
+        ),
+    ]
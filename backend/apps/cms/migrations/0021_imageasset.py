@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0020_partybookingconfig_parties_per_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the original bytes', max_length=64, unique=True)),
+                ('original_url', models.CharField(db_index=True, help_text='Media URL of the original', max_length=700)),
+                ('original_name', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(max_length=50)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField(help_text='Original size in bytes')),
+                ('variants', models.JSONField(blank=True, default=list, help_text='[{format, width, height, url, bytes}]')),
+                ('placeholder', models.TextField(blank=True, help_text='Tiny blurred data: URI shown while loading')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+def lift_default_limit(apps, schema_editor):
+    # 0020 gave every venue the default of one party per slot
+    apps.get_model('cms', 'PartyBookingConfig').objects.filter(parties_per_slot=1).update(parties_per_slot=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0022_contentversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='partybookingconfig',
+            name='parties_per_slot',
+            field=models.PositiveIntegerField(blank=True, default=None, help_text='Number of parties that can be booked into the same time slot (empty for no limit)', null=True),
+        ),
+        migrations.RunPython(lift_default_limit, migrations.RunPython.noop),
+    ]
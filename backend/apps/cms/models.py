@@ -1,3 +1,5 @@
+import datetime
+
 from django.db import models
 
 class Page(models.Model):
@@ -449,7 +451,12 @@ class SessionBookingConfig(models.Model):
     duration_minutes = models.IntegerField(default=60, help_text="Session duration in minutes")
     duration_label = models.CharField(max_length=100, default="60 Minutes", help_text="Display label for duration")
     duration_description = models.CharField(max_length=200, default="Standard Session", help_text="Duration description")
-    
+
+    # Slot Configuration
+    opening_time = models.TimeField(default=datetime.time(10, 0), help_text="Start time of the first session slot")
+    closing_time = models.TimeField(default=datetime.time(21, 0), help_text="Time the last session must end by")
+    slot_capacity = models.IntegerField(default=100, help_text="Maximum jumpers (adults + kids) per slot")
+
     # Meta
     active = models.BooleanField(default=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -464,11 +471,9 @@ class SessionBookingConfig(models.Model):
     
     @classmethod
     def get_config(cls):
-        """Get or create singleton config"""
-        config, created = cls.objects.get_or_create(id=1)
-        if created:
-            config.save()  # Ensure defaults are saved
-        return config
+        """Get or create singleton config (cached, see config_cache.py)"""
+        from .config_cache import get_cached_config
+        return get_cached_config(cls)
 
 
 class PartyBookingConfig(models.Model):
@@ -546,6 +551,12 @@ class PartyBookingConfig(models.Model):
         blank=True,
         help_text="List of available time slots (e.g., ['12:00 PM', '2:00 PM', '4:00 PM', '6:00 PM'])"
     )
+    parties_per_slot = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        default=None,
+        help_text="Number of parties that can be booked into the same time slot (empty for no limit)"
+    )
     
     # Duration & Labels
     duration_label = models.CharField(
@@ -581,9 +592,44 @@ class PartyBookingConfig(models.Model):
     
     @classmethod
     def get_config(cls):
-        """Get or create singleton config"""
-        config, created = cls.objects.get_or_create(id=1)
-        if created:
-            config.save()  # Ensure defaults are saved
-        return config
+        """Get or create singleton config (cached, see config_cache.py)"""
+        from .config_cache import get_cached_config
+        return get_cached_config(cls)
+
+
+
+class ImageAsset(models.Model):
+    """
+    An uploaded image, stored once per content hash, with its resized
+    variants (see images.py). CMS serializers look assets up by URL to
+    emit srcset.
+    """
+    content_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the original bytes")
+    original_url = models.CharField(max_length=700, db_index=True, help_text="Media URL of the original")
+    original_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=50)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField(help_text="Original size in bytes")
+    variants = models.JSONField(default=list, blank=True, help_text="[{format, width, height, url, bytes}]")
+    placeholder = models.TextField(blank=True, help_text="Tiny blurred data: URI shown while loading")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.original_name or self.content_hash
 
+
+class ContentVersion(models.Model):
+    """
+    Single row (id=1) counting changes to public CMS content. The cached
+    bundles and ETags are keyed on it (see bundle.py); keeping it in the
+    database makes a bump visible to every server process.
+    """
+    version = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Content version {self.version}"
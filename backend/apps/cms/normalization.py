@@ -0,0 +1,246 @@
+"""
+Image URL normalization engine (used by the `normalize_images` command).
+
+Rewrites absolute media URLs (http://host/media/x.jpg, /media/x.jpg) to
+paths relative to MEDIA_ROOT. Each model is walked in primary-key order in
+batches of `batch_size`; a batch's files are checked and SHA-256 hashed in
+a thread pool, then the batch is written with one bulk_update in its own
+short transaction. After every batch the position is saved to a checkpoint
+file, so an interrupted run continues where it stopped with resume=True.
+
+bulk_update skips signals, so updated_at is set explicitly and the CMS
+content version is bumped once at the end.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .bundle import bump_content_version
+from .models import (
+    Activity, Banner, Testimonial, GalleryItem, InstagramReel,
+    PageSection, PartyPackage, FacilityItem
+)
+
+# Model -> (single URL fields, JSON list-of-URL fields)
+TARGETS = [
+    (Activity, ['image_url'], ['gallery']),
+    (Banner, ['image_url'], []),
+    (Testimonial, ['image_url', 'thumbnail_url'], []),
+    (GalleryItem, ['image_url'], []),
+    (InstagramReel, ['thumbnail_url'], []),
+    (PageSection, ['image_url'], []),
+    (PartyPackage, ['image_url'], []),
+    (FacilityItem, ['image_url'], []),
+]
+
+URL_PATTERNS = [
+    re.compile(r'https?://[^/]+/media/(.+)'),  # http://domain/media/path
+    re.compile(r'^/media/(.+)'),               # /media/path
+]
+HASH_CHUNK = 1024 * 1024
+
+
+def should_normalize(url):
+    """Check if URL needs normalization"""
+    return bool(url) and bool(re.match(r'(https?://|/media/)', url))
+
+
+def normalize_url(url):
+    """
+    Convert absolute URL to relative path.
+
+    Examples:
+        http://localhost:8080/media/uploads/img.jpg -> uploads/img.jpg
+        /media/uploads/img.jpg -> uploads/img.jpg
+        uploads/img.jpg -> uploads/img.jpg (no change)
+    """
+    if not url:
+        return url
+    for pattern in URL_PATTERNS:
+        match = pattern.match(url)
+        if match:
+            return match.group(1)
+    # Already relative or an external URL
+    return url
+
+
+def inspect_file(relative_path):
+    """(exists, sha256) for a path under MEDIA_ROOT"""
+    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    if not relative_path or not os.path.isfile(full_path):
+        return False, None
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return True, digest.hexdigest()
+
+
+def _write_json(path, data):
+    """Replace `path` atomically so a crash never leaves half a file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class Normalizer:
+    def __init__(self, batch_size=500, workers=8, dry_run=False, checkpoint_path=None, resume=False, log=None):
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.dry_run = dry_run
+        self.checkpoint_path = checkpoint_path
+        self.log = log or (lambda message: None)
+        self.changes = []
+        self.missing_files = []
+        self.errors = []
+        self.files = {}
+        self.checkpoint = {'models': {}}
+        if resume and checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as f:
+                self.checkpoint = json.load(f)
+        self.report = {'models': {}}
+
+    def run(self):
+        started = time.perf_counter()
+        self.report['started_at'] = timezone.now().isoformat()
+        self.report['mode'] = 'DRY RUN' if self.dry_run else 'LIVE'
+        self.report['resumed_from'] = dict(self.checkpoint['models']) or None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for model, url_fields, list_fields in TARGETS:
+                self.normalize_model(pool, model, url_fields, list_fields)
+
+        if self.changes and not self.dry_run:
+            bump_content_version()
+        if self.checkpoint_path and not self.dry_run and not self.errors and os.path.exists(self.checkpoint_path):
+            # Finished cleanly; the next run starts from scratch
+            os.remove(self.checkpoint_path)
+
+        self.report.update({
+            'finished_at': timezone.now().isoformat(),
+            'seconds': round(time.perf_counter() - started, 3),
+            'total_changes': len(self.changes),
+            'missing_files': self.missing_files,
+            'duplicates': self.duplicates(),
+            'errors': self.errors,
+            'changes': self.changes,
+        })
+        return self.report
+
+    def _save_checkpoint(self, name, state):
+        if self.checkpoint_path and not self.dry_run:
+            self.checkpoint['models'][name] = state
+            _write_json(self.checkpoint_path, self.checkpoint)
+
+    def normalize_model(self, pool, model, url_fields, list_fields):
+        name = model.__name__
+        state = self.checkpoint['models'].get(name, {})
+        stats = {'scanned': 0, 'changed': 0, 'missing': 0, 'batches': 0, 'seconds': 0.0}
+        self.report['models'][name] = stats
+        if state.get('done'):
+            stats['skipped'] = True
+            return
+
+        started = time.perf_counter()
+        has_updated_at = any(field.name == 'updated_at' for field in model._meta.fields)
+        last_pk = state.get('last_pk', 0)
+        queryset = model.objects.order_by('pk').only('pk', *url_fields, *list_fields)
+        self.log(f'Processing {name}...')
+
+        failed = False
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:self.batch_size])
+            if not batch:
+                break
+            try:
+                self._normalize_batch(pool, name, batch, url_fields, list_fields, has_updated_at, stats)
+            except Exception as e:
+                # Earlier batches are committed; a resumed run retries from here
+                self.errors.append(f'{name} after #{last_pk}: {e}')
+                failed = True
+                break
+            last_pk = batch[-1].pk
+            stats['scanned'] += len(batch)
+            stats['batches'] += 1
+            self._save_checkpoint(name, {'last_pk': last_pk})
+
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        if not failed:
+            self._save_checkpoint(name, {'last_pk': last_pk, 'done': True})
+        self.log(f'  {name}: {stats["changed"]} of {stats["scanned"]} changed in {stats["seconds"]}s')
+
+    def _normalize_batch(self, pool, name, batch, url_fields, list_fields, has_updated_at, stats):
+        pending = []  # (obj, field, old, new) for single URL fields
+        changed_lists = {}  # (obj, field) -> (old list, new list)
+        for obj in batch:
+            for field in url_fields:
+                old = getattr(obj, field)
+                if should_normalize(old) and normalize_url(old) != old:
+                    pending.append((obj, field, old, normalize_url(old)))
+            for field in list_fields:
+                old_list = getattr(obj, field) or []
+                new_list = [normalize_url(url) if should_normalize(url) else url for url in old_list]
+                if new_list != old_list:
+                    changed_lists[(obj, field)] = (old_list, new_list)
+
+        paths = {new for _, _, _, new in pending}
+        for old_list, new_list in changed_lists.values():
+            paths.update(new for old, new in zip(old_list, new_list) if old != new)
+        unseen = [path for path in paths if path not in self.files]
+        self.files.update(zip(unseen, pool.map(inspect_file, unseen)))
+
+        dirty, fields = {}, set()
+        for obj, field, old, new in pending:
+            setattr(obj, field, new)
+            self._log_change(name, field, obj.pk, old, new, stats)
+            dirty[obj.pk] = obj
+            fields.add(field)
+        for (obj, field), (old_list, new_list) in changed_lists.items():
+            for old, new in zip(old_list, new_list):
+                if old != new:
+                    self._log_change(name, field, obj.pk, old, new, stats)
+            setattr(obj, field, new_list)
+            dirty[obj.pk] = obj
+            fields.add(field)
+        stats['changed'] += len(dirty)
+
+        if dirty and not self.dry_run:
+            if has_updated_at:
+                now = timezone.now()
+                for obj in dirty.values():
+                    obj.updated_at = now
+                fields.add('updated_at')
+            with transaction.atomic():
+                type(batch[0]).objects.bulk_update(list(dirty.values()), sorted(fields))
+
+    def _log_change(self, name, field, record_id, old, new, stats):
+        exists, sha256 = self.files.get(new, (False, None))
+        self.changes.append({
+            'model': name, 'field': field, 'id': record_id,
+            'old': old, 'new': new, 'exists': exists, 'sha256': sha256,
+        })
+        if not exists:
+            stats['missing'] += 1
+            self.missing_files.append({'model': name, 'id': record_id, 'field': field, 'path': new})
+
+    def duplicates(self):
+        """Content hashes referenced under more than one path"""
+        by_hash = {}
+        for path, (exists, sha256) in self.files.items():
+            if exists:
+                by_hash.setdefault(sha256, []).append(path)
+        return {sha256: sorted(paths) for sha256, paths in by_hash.items() if len(paths) > 1}
+
+
+def write_report(path, report):
+    _write_json(path, report)
@@ -1,10 +1,42 @@
+from django.db.models import QuerySet
 from rest_framework import serializers
 from .models import (
     Banner, Activity, Faq, SocialLink, GalleryItem,
     StatCard, InstagramReel, MenuSection, GroupPackage, GuidelineCategory, LegalDocument,
     PageSection, PricingPlan, ContactInfo, PartyPackage, TimelineItem, ValueItem, FacilityItem,
-    Page, ContactMessage, FreeEntry, SessionBookingConfig, PartyBookingConfig
+    Page, ContactMessage, FreeEntry, SessionBookingConfig, PartyBookingConfig, ImageAsset
 )
+from .images import media_path, responsive_image
+
+
+class ResponsiveImageMixin(serializers.Serializer):
+    """
+    Adds `image` with srcset / placeholder metadata for `image_url` when it
+    points at an uploaded ImageAsset (null otherwise). Assets for a whole
+    list are loaded in one query. Assets still waiting for their variants
+    serve the original; rendering is queued by the upload, not here.
+    """
+    image = serializers.SerializerMethodField()
+
+    def _image_assets(self):
+        assets = self.context.get('_image_assets')
+        if assets is None:
+            instances = self.root.instance
+            if not isinstance(instances, (list, tuple, QuerySet)):
+                instances = [instances] if instances is not None else []
+            paths = {media_path(getattr(obj, 'image_url', None)) for obj in instances} - {''}
+            assets = {
+                media_path(asset.original_url): asset
+                for asset in ImageAsset.objects.filter(original_url__in=paths)
+            }
+            self.context['_image_assets'] = assets
+        return assets
+
+    def get_image(self, obj):
+        asset = self._image_assets().get(media_path(obj.image_url))
+        if asset is None:
+            return None
+        return responsive_image(asset)
 
 
 class PageSerializer(serializers.ModelSerializer):
@@ -12,12 +44,12 @@ class PageSerializer(serializers.ModelSerializer):
         model = Page
         fields = '__all__'
 
-class BannerSerializer(serializers.ModelSerializer):
+class BannerSerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     class Meta:
         model = Banner
         fields = '__all__'
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     class Meta:
         model = Activity
         fields = '__all__'
@@ -32,7 +64,7 @@ class SocialLinkSerializer(serializers.ModelSerializer):
         model = SocialLink
         fields = '__all__'
 
-class GalleryItemSerializer(serializers.ModelSerializer):
+class GalleryItemSerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     class Meta:
         model = GalleryItem
         fields = '__all__'
@@ -67,7 +99,7 @@ class LegalDocumentSerializer(serializers.ModelSerializer):
         model = LegalDocument
         fields = '__all__'
 
-class PageSectionSerializer(serializers.ModelSerializer):
+class PageSectionSerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     # Override URL fields to allow blank values and relative URLs
     image_url = serializers.CharField(max_length=500, required=False, allow_blank=True, allow_null=True)
     video_url = serializers.CharField(max_length=500, required=False, allow_blank=True, allow_null=True)
@@ -87,7 +119,7 @@ class ContactInfoSerializer(serializers.ModelSerializer):
         model = ContactInfo
         fields = '__all__'
 
-class PartyPackageSerializer(serializers.ModelSerializer):
+class PartyPackageSerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     class Meta:
         model = PartyPackage
         fields = '__all__'
@@ -102,7 +134,7 @@ class ValueItemSerializer(serializers.ModelSerializer):
         model = ValueItem
         fields = '__all__'
 
-class FacilityItemSerializer(serializers.ModelSerializer):
+class FacilityItemSerializer(ResponsiveImageMixin, serializers.ModelSerializer):
     class Meta:
         model = FacilityItem
         fields = '__all__'
@@ -1,88 +1,47 @@
 """
 Signals for CMS app
-Auto-fetch and save Instagram reel thumbnails locally when saving
+Queue a background fetch of Instagram reel thumbnails when saving,
+bump the public content bundle version on every content write,
+and drop cached booking configs when they change
 """
-import requests
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import InstagramReel
+from .models import InstagramReel, SessionBookingConfig, PartyBookingConfig
+from .bundle import CONTENT_MODELS, bump_content_version
+from .config_cache import invalidate_config
+from .thumbnails import needs_fetch, queue_thumbnail_fetch
+from django.db import transaction
 import logging
-import os
 
 logger = logging.getLogger(__name__)
 
 
-@receiver(pre_save, sender=InstagramReel)
-def fetch_instagram_thumbnail(sender, instance, **kwargs):
+@receiver(post_save, sender=InstagramReel)
+def queue_instagram_thumbnail(sender, instance, **kwargs):
     """
-    Automatically fetch thumbnail from Instagram oEmbed API and save it locally.
-    This ensures thumbnails work reliably without Instagram's hotlinking restrictions.
+    Queue a background fetch of the reel's thumbnail from Instagram's oEmbed
+    API when it has none or points at Instagram (which blocks hotlinking).
+    The save itself never waits on Instagram; see thumbnails.py.
     """
-    # Only fetch if reel_url is provided and thumbnail_url is empty or looks like an Instagram URL
-    if not instance.reel_url:
-        return
-    
-    # Check if we need to fetch (empty thumbnail or Instagram URL that won't work)
-    needs_fetch = (
-        not instance.thumbnail_url or 
-        '/media/?size=' in instance.thumbnail_url or
-        instance.thumbnail_url.startswith('https://www.instagram.com/reel/') or
-        instance.thumbnail_url.startswith('https://instagram.fb') or
-        instance.thumbnail_url.startswith('https://scontent')
-    )
-    
-    if not needs_fetch:
-        return
-    
-    try:
-        # Use Instagram's oEmbed API to get reel metadata
-        oembed_url = f"https://www.instagram.com/api/v1/oembed/?url={instance.reel_url}"
-        
-        logger.info(f"Fetching Instagram thumbnail for: {instance.reel_url}")
-        response = requests.get(oembed_url, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Extract thumbnail URL from oEmbed response
-            if 'thumbnail_url' in data:
-                thumbnail_url = data['thumbnail_url']
-                logger.info(f"Found thumbnail URL: {thumbnail_url}")
-                
-                # Download the thumbnail image
-                img_response = requests.get(thumbnail_url, timeout=10)
-                
-                if img_response.status_code == 200:
-                    # Generate filename from reel URL - sanitize for filesystem
-                    reel_id = instance.reel_url.rstrip('/').split('/')[-1]
-                    # Remove any characters that might be invalid for filenames
-                    safe_reel_id = "".join(c for c in reel_id if c.isalnum() or c in ('-', '_'))
-                    filename = f"{safe_reel_id}_thumbnail.jpg"
-                    
-                    # Ensure the uploads/reels directory exists
-                    from django.conf import settings
-                    reels_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', 'reels')
-                    os.makedirs(reels_dir, exist_ok=True)
-                    
-                    # Save the file
-                    file_path = os.path.join(reels_dir, filename)
-                    with open(file_path, 'wb') as f:
-                        f.write(img_response.content)
-                    
-                    # Update thumbnail_url to point to local file
-                    instance.thumbnail_url = f"/media/uploads/reels/{filename}"
-                    logger.info(f"Successfully saved thumbnail locally: {instance.thumbnail_url}")
-                else:
-                    logger.error(f"Failed to download thumbnail image. Status: {img_response.status_code}")
-            else:
-                logger.warning(f"No thumbnail_url in oEmbed response for {instance.reel_url}")
-        else:
-            logger.error(f"Failed to fetch Instagram oEmbed data. Status: {response.status_code}")
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching Instagram thumbnail: {str(e)}")
-        # Don't raise exception - allow save to continue even if fetch fails
-    except Exception as e:
-        logger.error(f"Unexpected error fetching Instagram thumbnail: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+    if instance.reel_url and needs_fetch(instance.thumbnail_url):
+        queue_thumbnail_fetch(instance)
+
+
+def bump_bundle_version(sender, **kwargs):
+    """Any change to public content invalidates the cached bundles"""
+    bump_content_version()
+
+
+for content_model in CONTENT_MODELS:
+    post_save.connect(bump_bundle_version, sender=content_model, dispatch_uid=f'cms-bundle-save-{content_model.__name__}')
+    post_delete.connect(bump_bundle_version, sender=content_model, dispatch_uid=f'cms-bundle-delete-{content_model.__name__}')
+
+
+@receiver(post_save, sender=SessionBookingConfig)
+@receiver(post_save, sender=PartyBookingConfig)
+@receiver(post_delete, sender=SessionBookingConfig)
+@receiver(post_delete, sender=PartyBookingConfig)
+def invalidate_booking_config(sender, **kwargs):
+    """Clear the cached singleton now and again once the write commits"""
+    invalidate_config(sender)
+    transaction.on_commit(lambda: invalidate_config(sender))
@@ -0,0 +1,24 @@
+"""
+Background job handlers for the CMS (run by `run_jobs`)
+"""
+from apps.core.jobs import handler
+from .images import JOB_KIND as IMAGE_JOB_KIND, generate_variants
+from .models import ImageAsset, InstagramReel
+from .thumbnails import JOB_KIND as THUMBNAIL_JOB_KIND, get_fetcher, needs_fetch, save_thumbnails
+
+
+@handler(THUMBNAIL_JOB_KIND)
+def fetch_reel_thumbnail(payload, mail_connection=None):
+    reel = InstagramReel.objects.filter(pk=payload['reel_id']).only('reel_url', 'thumbnail_url').first()
+    if not reel or not reel.reel_url or not needs_fetch(reel.thumbnail_url):
+        return
+    # ThumbnailFetchError propagates so the job is retried with backoff
+    local_url = get_fetcher().fetch(reel.reel_url)
+    save_thumbnails({reel.pk: (reel.reel_url, local_url)})
+
+
+@handler(IMAGE_JOB_KIND)
+def render_image_variants(payload, mail_connection=None):
+    asset = ImageAsset.objects.filter(pk=payload['asset_id']).first()
+    if asset and not asset.variants:
+        generate_variants(asset)
@@ -0,0 +1,67 @@
+"""
+Tests for the cached public CMS bundle
+"""
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.cms.bundle import clear_local_version
+from apps.cms.models import Banner, ContentVersion, PageSection, StatCard
+
+
+@pytest.mark.django_db
+class TestContentBundle:
+
+    def setup_method(self):
+        cache.clear()
+
+    def test_bundle_is_cached_and_page_scoped(self):
+        Banner.objects.create(title="Summer", image_url="https://example.com/a.jpg")
+        Banner.objects.create(title="Hidden", image_url="https://example.com/b.jpg", active=False)
+        PageSection.objects.create(page='about', section_key='hero', title="About us")
+        PageSection.objects.create(page='home', section_key='hero', title="Welcome")
+        StatCard.objects.create(label="Jumpers", value="5,000+", unit="Happy Jumpers", icon="Users", page='about')
+
+        client = APIClient()
+        first = client.get('/api/v1/cms/bundle/', {'page': 'about'})
+        assert first.status_code == 200
+        data = first.json()
+        assert [b['title'] for b in data['banners']] == ['Summer']
+        assert [s['title'] for s in data['page_sections']] == ['About us']
+        assert len(data['stat_cards']) == 1
+
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get('/api/v1/cms/bundle/', {'page': 'about'})
+        assert second.content == first.content
+        assert len(queries) == 0
+
+    def test_etag_and_invalidation(self):
+        banner = Banner.objects.create(title="Summer", image_url="https://example.com/a.jpg")
+        client = APIClient()
+        etag = client.get('/api/v1/cms/bundle/', {'page': 'home'})['ETag']
+
+        response = client.get('/api/v1/cms/bundle/', {'page': 'home'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        banner.title = "Winter"
+        banner.save()
+        response = client.get('/api/v1/cms/bundle/', {'page': 'home'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['banners'][0]['title'] == 'Winter'
+
+    def test_version_is_shared_through_the_database(self):
+        client = APIClient()
+        etag = client.get('/api/v1/cms/bundle/', {'page': 'home'})['ETag']
+
+        # Another process bumps the version; its cache is not ours
+        ContentVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        cache.clear()
+        assert client.get('/api/v1/cms/bundle/', {'page': 'home'})['ETag'] == etag
+        clear_local_version()  # VERSION_TTL elapsed
+        assert client.get('/api/v1/cms/bundle/', {'page': 'home'})['ETag'] != etag
+
+    def test_rejects_bad_slug(self):
+        assert APIClient().get('/api/v1/cms/bundle/', {'page': '../x y'}).status_code == 400
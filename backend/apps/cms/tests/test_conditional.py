@@ -0,0 +1,48 @@
+"""
+Tests for conditional GET on CMS viewsets
+"""
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.cms.models import Faq
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def setup_method(self):
+        cache.clear()
+
+    def test_list_answers_304_with_one_query(self):
+        Faq.objects.create(question="Socks?", answer="Yes")
+        client = APIClient()
+        first = client.get('/api/v1/cms/faqs/')
+        assert first.status_code == 200
+        assert first['Cache-Control'].startswith('public')
+        assert 'Last-Modified' in first
+
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get('/api/v1/cms/faqs/', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert second.status_code == 304
+        assert len(queries) == 1
+
+        by_date = client.get('/api/v1/cms/faqs/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        assert by_date.status_code == 304
+
+    def test_changes_and_deletes_invalidate(self):
+        faq = Faq.objects.create(question="Socks?", answer="Yes")
+        other = Faq.objects.create(question="Food?", answer="No")
+        client = APIClient()
+        etag = client.get('/api/v1/cms/faqs/')['ETag']
+
+        other.delete()
+        assert client.get('/api/v1/cms/faqs/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        detail = client.get(f'/api/v1/cms/faqs/{faq.pk}/')
+        faq.answer = "Grip socks only"
+        faq.save()
+        response = client.get(f'/api/v1/cms/faqs/{faq.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        assert response.status_code == 200
+        assert response.data['answer'] == "Grip socks only"
@@ -0,0 +1,52 @@
+"""
+Tests for the cached booking config singletons
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from apps.cms import config_cache
+from apps.cms.config_cache import clear_local_configs
+from apps.cms.models import SessionBookingConfig, PartyBookingConfig
+
+
+@pytest.mark.django_db
+class TestConfigCache:
+
+    def test_repeat_reads_skip_the_database(self):
+        SessionBookingConfig.get_config()
+        PartyBookingConfig.get_config()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(10):
+                config = SessionBookingConfig.get_config()
+                PartyBookingConfig.get_config()
+        assert config.adult_price == 899
+        assert len(queries) == 0
+
+    def test_save_invalidates(self):
+        config = SessionBookingConfig.get_config()
+        config.adult_price = 999
+        config.save()
+        assert SessionBookingConfig.get_config().adult_price == 999
+
+    def test_per_process_cache_is_not_a_second_level(self):
+        SessionBookingConfig.get_config()
+        assert cache.get('cms:config:cms.sessionbookingconfig') is None
+
+        # Another process saved a new price: this one sees it once its copy expires
+        SessionBookingConfig.objects.filter(id=1).update(adult_price=1099)
+        clear_local_configs()
+        assert SessionBookingConfig.get_config().adult_price == 1099
+
+    def test_shared_cache_is_a_second_level(self, monkeypatch):
+        monkeypatch.setattr(config_cache, 'cache_is_shared', lambda: True)
+        SessionBookingConfig.get_config()
+        clear_local_configs()
+        with CaptureQueriesContext(connection) as queries:
+            SessionBookingConfig.get_config()
+        assert len(queries) == 0
+
+    def test_callers_get_private_copies(self):
+        config = PartyBookingConfig.get_config()
+        config.participant_price = 1
+        assert PartyBookingConfig.get_config().participant_price != 1
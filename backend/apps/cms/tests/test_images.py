@@ -0,0 +1,142 @@
+"""
+Tests for CMS image uploads, derivatives and srcset metadata
+"""
+import io
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.cms.images import ingest_image
+from apps.cms.models import Banner, ImageAsset
+from apps.core import jobs
+from apps.core.models import Job
+from apps.core.querycount import track_queries
+
+
+def jpeg(width=2000, height=1000, color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.CMS_IMAGE_FORMATS = ['webp']
+    return tmp_path
+
+
+@pytest.fixture
+def admin_client(django_user_model):
+    admin = django_user_model.objects.create_user(
+        username='admin', email='admin@example.com', password='pass', name='Admin', is_staff=True
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+    return client
+
+
+def upload(client, content, name='hero.jpg'):
+    return client.post('/api/v1/cms/upload/', {'file': SimpleUploadedFile(name, content, 'image/jpeg')},
+                       format='multipart')
+
+
+@pytest.mark.django_db
+class TestCmsImages:
+
+    def test_upload_renders_variants_and_dedupes(self, media, admin_client):
+        content = jpeg()
+        first = upload(admin_client, content)
+        assert first.status_code == 201
+        data = first.json()
+        assert [variant['width'] for variant in data['variants']] == [320, 640, 1024, 1600]
+        assert all(variant['format'] == 'webp' for variant in data['variants'])
+        assert data['srcset'].endswith('1600w')
+        assert data['placeholder'].startswith('data:image/webp;base64,')
+        assert (data['width'], data['height']) == (2000, 1000)
+
+        again = upload(admin_client, content, name='copy.jpg')
+        assert again.status_code == 200
+        assert again.json()['deduplicated'] is True
+        assert again.json()['url'] == data['url']
+        assert ImageAsset.objects.count() == 1
+        originals = [path for path in media.rglob('*.jpg')]
+        assert len(originals) == 1
+
+    def test_small_images_are_not_upscaled(self, media):
+        asset, _ = ingest_image(jpeg(500, 250), 'small.jpg')
+        assert [variant['width'] for variant in asset.variants] == [320, 500]
+
+    def test_rejects_non_images(self, media, admin_client):
+        response = upload(admin_client, b'not really a jpeg')
+        assert response.status_code == 400
+
+    def test_serializers_emit_srcset_with_one_lookup(self, media, admin_client):
+        urls = []
+        for n in range(4):
+            urls.append(upload(admin_client, jpeg(color=(n * 40, 0, 0))).json()['url'])
+        for n, url in enumerate(urls):
+            Banner.objects.create(title=f'B{n}', image_url=url)
+        Banner.objects.create(title='External', image_url='https://example.com/x.jpg')
+
+        client = APIClient()
+        client.get('/api/v1/cms/banners/')
+        with track_queries() as stats:
+            response = client.get('/api/v1/cms/banners/')
+        banners = response.json()
+        banners = banners['results'] if isinstance(banners, dict) else banners
+        images = {banner['title']: banner['image'] for banner in banners}
+        assert images['External'] is None
+        assert all(images[f'B{n}']['srcset'] for n in range(4))
+        # Validator aggregate, rows, one ImageAsset lookup
+        assert stats.count <= 3
+
+    def test_lazy_variants_are_queued_on_upload(self, media):
+        asset, _ = ingest_image(jpeg(), 'lazy.jpg', eager=False)
+        assert Job.objects.filter(kind='image_variants').count() == 1
+        Banner.objects.create(title='Lazy', image_url=asset.original_url)
+        client = APIClient()
+        with track_queries() as stats:
+            banner = client.get('/api/v1/cms/banners/').json()
+        # Serving the original writes nothing
+        assert not any('INSERT' in sql or 'UPDATE' in sql for sql in stats.statements)
+        banner = (banner['results'] if isinstance(banner, dict) else banner)[0]
+        assert banner['image']['srcset'] is None
+
+        assert jobs.run_batch() == (1, 0)
+        asset.refresh_from_db()
+        assert len(asset.variants) == 4
+        banner = client.get('/api/v1/cms/banners/').json()
+        banner = (banner['results'] if isinstance(banner, dict) else banner)[0]
+        assert banner['image']['srcset']
+
+    def test_failed_assets_are_queued_again_only_on_request(self, media):
+        asset, _ = ingest_image(jpeg(), 'broken.jpg', eager=False)
+        Job.objects.filter(kind='image_variants').update(status='FAILED')
+        ingest_image(jpeg(), 'broken-again.jpg', eager=False)
+        call_command('queue_image_variants', stdout=StringIO())
+        assert Job.objects.filter(kind='image_variants').count() == 1
+
+        call_command('queue_image_variants', '--retry-failed', stdout=StringIO())
+        assert Job.objects.filter(kind='image_variants', status='PENDING').count() == 1
+
+    def test_backfill_command_renders_old_assets(self, media):
+        asset, _ = ingest_image(jpeg(), 'old.jpg', eager=False)
+        Job.objects.all().delete()
+        call_command('queue_image_variants', '--now', stdout=StringIO())
+        asset.refresh_from_db()
+        assert len(asset.variants) == 4
+
+    def test_normalized_urls_still_get_a_srcset(self, media, admin_client):
+        url = upload(admin_client, jpeg()).json()['url']
+        Banner.objects.create(title='Hero', image_url=url)
+        call_command('normalize_images', '--checkpoint', str(media / 'checkpoint.json'),
+                     '--report', str(media / 'report.json'), stdout=StringIO())
+        banner = Banner.objects.get()
+        assert banner.image_url.startswith('uploads/')
+
+        data = APIClient().get('/api/v1/cms/banners/').json()
+        data = (data['results'] if isinstance(data, dict) else data)[0]
+        assert data['image']['srcset'].endswith('1600w')
@@ -0,0 +1,88 @@
+"""
+Tests for the batched, resumable normalize_images command
+"""
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from apps.cms import normalization
+from apps.cms.models import Activity, Banner
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    (tmp_path / 'media' / 'uploads').mkdir(parents=True)
+    for name, content in [('a.jpg', b'same'), ('b.jpg', b'same'), ('c.jpg', b'other')]:
+        (tmp_path / 'media' / 'uploads' / name).write_bytes(content)
+    return tmp_path
+
+
+def run(tmp_path, *args):
+    call_command(
+        'normalize_images', '--batch-size', '2', '--workers', '4',
+        '--checkpoint', str(tmp_path / 'checkpoint.json'), '--report', str(tmp_path / 'report.json'),
+        *args, stdout=StringIO(),
+    )
+    return json.loads((tmp_path / 'report.json').read_text())
+
+
+@pytest.mark.django_db
+class TestNormalizeImages:
+
+    def test_normalizes_in_batches_with_report(self, media):
+        for name in ['a', 'b', 'c', 'missing', 'a']:
+            Banner.objects.create(title=name, image_url=f'http://localhost:8000/media/uploads/{name}.jpg')
+        Banner.objects.create(title='external', image_url='https://cdn.example.com/x.jpg')
+        Activity.objects.create(name='Jump', slug='jump', short_description='s', description='d',
+                                image_url='/media/uploads/c.jpg', gallery=['/media/uploads/a.jpg', 'uploads/b.jpg'])
+
+        report = run(media)
+        assert set(Banner.objects.values_list('image_url', flat=True)) == {
+            'uploads/a.jpg', 'uploads/b.jpg', 'uploads/c.jpg', 'uploads/missing.jpg', 'https://cdn.example.com/x.jpg'
+        }
+        activity = Activity.objects.get()
+        assert activity.image_url == 'uploads/c.jpg'
+        assert activity.gallery == ['uploads/a.jpg', 'uploads/b.jpg']
+
+        banners = report['models']['Banner']
+        assert (banners['scanned'], banners['changed'], banners['missing'], banners['batches']) == (6, 5, 1, 3)
+        assert 'seconds' in banners
+        assert report['total_changes'] == 7
+        assert [missing['path'] for missing in report['missing_files']] == ['uploads/missing.jpg']
+        assert list(report['duplicates'].values()) == [['uploads/a.jpg', 'uploads/b.jpg']]
+        # Finished cleanly, so no checkpoint is left behind
+        assert not (media / 'checkpoint.json').exists()
+
+    def test_dry_run_changes_nothing(self, media):
+        Banner.objects.create(title='a', image_url='http://localhost:8000/media/uploads/a.jpg')
+        report = run(media, '--dry-run')
+        assert report['total_changes'] == 1
+        assert Banner.objects.get().image_url == 'http://localhost:8000/media/uploads/a.jpg'
+
+    def test_interrupted_run_resumes_from_checkpoint(self, media, monkeypatch):
+        banners = [Banner.objects.create(title=str(n), image_url=f'/media/uploads/{n}.jpg') for n in range(5)]
+        original = normalization.Normalizer._normalize_batch
+        seen = []
+
+        def flaky(self, pool, name, batch, *args):
+            if name == 'Banner':
+                seen.append([obj.pk for obj in batch])
+                if len(seen) == 2:
+                    raise RuntimeError('connection lost')
+            return original(self, pool, name, batch, *args)
+
+        monkeypatch.setattr(normalization.Normalizer, '_normalize_batch', flaky)
+        report = run(media)
+        assert report['errors']
+        checkpoint = json.loads((media / 'checkpoint.json').read_text())
+        assert checkpoint['models']['Banner'] == {'last_pk': banners[1].pk}
+        assert Banner.objects.filter(image_url__startswith='/media/').count() == 3
+
+        report = run(media, '--resume')
+        assert report['errors'] == []
+        # Only the rows after the checkpoint were read again
+        assert seen[2][0] == banners[2].pk
+        assert report['models']['Banner']['changed'] == 3
+        assert not Banner.objects.filter(image_url__startswith='/media/').exists()
+        assert not (media / 'checkpoint.json').exists()
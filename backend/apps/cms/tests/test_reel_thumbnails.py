@@ -0,0 +1,110 @@
+"""
+Tests for background Instagram thumbnail fetching against a local oEmbed stub
+"""
+import json
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+from django.core.management import call_command
+from apps.cms.models import InstagramReel
+from apps.cms.thumbnails import JOB_KIND, ThumbnailFetcher
+from apps.core import jobs
+from apps.core.models import Job
+
+IMAGE = b'\xff\xd8\xff\xe0fake-jpeg-bytes'
+
+
+class StubInstagram(BaseHTTPRequestHandler):
+    hits = []
+    delay = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/oembed/':
+            self.hits.append(parse_qs(url.query)['url'][0])
+            time.sleep(self.delay)
+            body = json.dumps({'thumbnail_url': f'http://{self.headers["Host"]}/thumb.jpg'}).encode()
+            content_type = 'application/json'
+        elif url.path == '/thumb.jpg':
+            body, content_type = IMAGE, 'image/jpeg'
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def oembed(settings, tmp_path):
+    StubInstagram.hits = []
+    StubInstagram.delay = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubInstagram)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.INSTAGRAM_OEMBED_ENDPOINT = f'http://127.0.0.1:{server.server_port}/oembed/'
+    yield settings.INSTAGRAM_OEMBED_ENDPOINT
+    server.shutdown()
+    server.server_close()
+
+
+def make_reel(n, thumbnail_url=''):
+    return InstagramReel.objects.create(
+        title=f'Reel {n}', reel_url=f'https://www.instagram.com/reel/abc{n}/', thumbnail_url=thumbnail_url
+    )
+
+
+@pytest.mark.django_db
+class TestReelThumbnails:
+
+    def test_save_queues_one_job_and_worker_stores_by_hash(self, oembed, tmp_path):
+        reel = make_reel(1)
+        reel.title = 'Renamed'
+        reel.save()
+        assert StubInstagram.hits == []
+        assert Job.objects.filter(kind=JOB_KIND).count() == 1
+
+        assert jobs.run_batch() == (1, 0)
+        reel.refresh_from_db()
+        assert reel.thumbnail_url.startswith('/media/uploads/reels/')
+        assert reel.thumbnail_url.endswith('.jpg')
+        stored = list((tmp_path / 'uploads' / 'reels').iterdir())
+        assert [path.read_bytes() for path in stored] == [IMAGE]
+
+    def test_local_thumbnails_are_left_alone(self, oembed):
+        make_reel(1, thumbnail_url='/images/instagram/reel-1.jpg')
+        assert not Job.objects.filter(kind=JOB_KIND).exists()
+
+    def test_concurrent_fetches_share_one_request(self, oembed):
+        StubInstagram.delay = 0.2
+        fetcher = ThumbnailFetcher(endpoint=oembed)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            urls = list(pool.map(lambda _: fetcher.fetch('https://www.instagram.com/reel/same/'), range(5)))
+        assert len(set(urls)) == 1
+        assert len(StubInstagram.hits) == 1
+        # Cached afterwards
+        fetcher.fetch('https://www.instagram.com/reel/same/')
+        assert len(StubInstagram.hits) == 1
+
+    def test_bulk_refresh_command(self, oembed, tmp_path):
+        reels = [make_reel(n) for n in range(6)]
+        make_reel(99, thumbnail_url='/images/instagram/reel-1.jpg')
+        out = StringIO()
+        call_command('refresh_reel_thumbnails', '--workers', '4', stdout=out, stderr=StringIO())
+        assert 'updated 6 reels' in out.getvalue()
+        assert len(StubInstagram.hits) == 6
+        urls = set(InstagramReel.objects.filter(pk__in=[reel.pk for reel in reels]).values_list('thumbnail_url', flat=True))
+        # Same image bytes, one file
+        assert len(urls) == 1
+        assert len(list((tmp_path / 'uploads' / 'reels').iterdir())) == 1
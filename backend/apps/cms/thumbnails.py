@@ -0,0 +1,174 @@
+"""
+Instagram reel thumbnails.
+
+Saving an InstagramReel never touches the network: the post_save signal
+queues an `instagram_thumbnail` job (see apps/core/jobs.py) and the worker
+calls ThumbnailFetcher, which asks the oEmbed endpoint for the thumbnail
+URL, downloads the image and stores it under MEDIA_ROOT named by the
+SHA-256 of its bytes. Identical images share one file and rewriting an
+existing file is skipped. The reel URL -> local path mapping is kept in
+Django's cache so refreshing an unchanged reel costs no HTTP requests.
+
+Concurrent fetches of the same reel inside a process share a single
+request; across processes the queue only holds one pending job per reel.
+
+The oEmbed endpoint comes from settings.INSTAGRAM_OEMBED_ENDPOINT or the
+`endpoint` argument, so tests and the refresh command can point it at a
+local stub.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.jobs import enqueue
+from apps.core.models import Job
+from .bundle import bump_content_version
+from .models import InstagramReel
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = 'instagram_thumbnail'
+DEFAULT_OEMBED_ENDPOINT = 'https://www.instagram.com/api/v1/oembed/'
+REELS_DIR = os.path.join('uploads', 'reels')
+CACHE_PREFIX = 'cms:reel-thumbnail:'
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+
+
+class ThumbnailFetchError(Exception):
+    pass
+
+
+def needs_fetch(thumbnail_url):
+    """Empty thumbnails and Instagram-hosted ones (which refuse hotlinking) need a local copy"""
+    return (
+        not thumbnail_url or
+        '/media/?size=' in thumbnail_url or
+        thumbnail_url.startswith('https://www.instagram.com/reel/') or
+        thumbnail_url.startswith('https://instagram.fb') or
+        thumbnail_url.startswith('https://scontent')
+    )
+
+
+def _cache_key(reel_url):
+    return CACHE_PREFIX + hashlib.sha1(reel_url.encode()).hexdigest()
+
+
+class ThumbnailFetcher:
+    """Fetches reel thumbnails into a content-addressed store under MEDIA_ROOT"""
+
+    def __init__(self, endpoint=None, timeout=10, media_root=None, media_url=None):
+        self.endpoint = endpoint or getattr(settings, 'INSTAGRAM_OEMBED_ENDPOINT', DEFAULT_OEMBED_ENDPOINT)
+        self.timeout = timeout
+        self.media_root = media_root or settings.MEDIA_ROOT
+        self.media_url = media_url or settings.MEDIA_URL
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def fetch(self, reel_url, force=False):
+        """Return the local URL of the reel's thumbnail, downloading it if needed"""
+        if not force:
+            cached = cache.get(_cache_key(reel_url))
+            if cached and os.path.exists(self._path_for_url(cached)):
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(reel_url)
+            owner = future is None
+            if owner:
+                future = self._inflight[reel_url] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            local_url = self._download(reel_url)
+            cache.set(_cache_key(reel_url), local_url, CACHE_TIMEOUT)
+            future.set_result(local_url)
+            return local_url
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[reel_url]
+
+    def _download(self, reel_url):
+        try:
+            response = requests.get(self.endpoint, params={'url': reel_url}, timeout=self.timeout)
+            response.raise_for_status()
+            thumbnail_url = response.json().get('thumbnail_url')
+            if not thumbnail_url:
+                raise ThumbnailFetchError(f'No thumbnail_url in oEmbed response for {reel_url}')
+            image = requests.get(thumbnail_url, timeout=self.timeout)
+            image.raise_for_status()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise ThumbnailFetchError(f'Fetching thumbnail for {reel_url} failed: {e}') from e
+
+        content_type = image.headers.get('Content-Type', '').split(';')[0].strip()
+        return self.store(image.content, EXTENSIONS.get(content_type, '.jpg'))
+
+    def store(self, content, extension='.jpg'):
+        """Write `content` under its hash (once) and return its media URL"""
+        filename = hashlib.sha256(content).hexdigest() + extension
+        directory = os.path.join(self.media_root, REELS_DIR)
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so readers never see a half-written image
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return f"{self.media_url.rstrip('/')}/{REELS_DIR.replace(os.sep, '/')}/{filename}"
+
+    def _path_for_url(self, local_url):
+        relative = local_url[len(self.media_url.rstrip('/')):].lstrip('/')
+        return os.path.join(self.media_root, *relative.split('/'))
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Process-wide fetcher, so in-flight dedupe covers every caller"""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        endpoint = getattr(settings, 'INSTAGRAM_OEMBED_ENDPOINT', DEFAULT_OEMBED_ENDPOINT)
+        if _default_fetcher is None or _default_fetcher.endpoint != endpoint or _default_fetcher.media_root != settings.MEDIA_ROOT:
+            _default_fetcher = ThumbnailFetcher(endpoint=endpoint)
+        return _default_fetcher
+
+
+def queue_thumbnail_fetch(reel):
+    """Queue a fetch for `reel` unless one is already waiting"""
+    pending = Job.objects.filter(kind=JOB_KIND, status__in=['PENDING', 'RUNNING'], payload__reel_id=reel.pk)
+    if not pending.exists():
+        enqueue(JOB_KIND, {'reel_id': reel.pk})
+
+
+def save_thumbnails(results):
+    """
+    Point reels at their fetched thumbnails. `results` maps reel id to
+    (reel_url, local_url); a reel whose URL changed meanwhile is left alone.
+    Uses update() so the write does not queue another fetch.
+    """
+    now = timezone.now()
+    updated = 0
+    with transaction.atomic():
+        for reel_id, (reel_url, local_url) in results.items():
+            updated += InstagramReel.objects.filter(pk=reel_id, reel_url=reel_url).update(
+                thumbnail_url=local_url, updated_at=now
+            )
+    if updated:
+        bump_content_version()
+    return updated
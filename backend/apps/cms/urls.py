@@ -6,7 +6,7 @@ from .views import (
     GuidelineCategoryViewSet, LegalDocumentViewSet,
     PageSectionViewSet, PricingPlanViewSet, ContactInfoViewSet, PartyPackageViewSet,
     TimelineItemViewSet, ValueItemViewSet, FacilityItemViewSet,
-    PageViewSet, UploadView, ReorderView, ContactMessageViewSet, FreeEntryViewSet, SessionBookingConfigViewSet, PartyBookingConfigViewSet
+    PageViewSet, UploadView, ReorderView, ContentBundleView, ContactMessageViewSet, FreeEntryViewSet, SessionBookingConfigViewSet, PartyBookingConfigViewSet
 )
 
 router = DefaultRouter()
@@ -38,4 +38,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('upload/', UploadView.as_view(), name='cms-upload'),
     path('reorder/', ReorderView.as_view(), name='cms-reorder'),
+    path('bundle/', ContentBundleView.as_view(), name='cms-bundle'),
 ]
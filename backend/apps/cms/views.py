@@ -3,7 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
 from apps.bookings.permissions import IsStaffUser
+from .bundle import get_bundle, bump_content_version
+from .conditional import ConditionalGetMixin
+from .images import ImageError, ingest_image, responsive_image
+import re
 from .models import (
     Banner, Activity, Faq, SocialLink, GalleryItem,
     StatCard, InstagramReel, MenuSection, GroupPackage, GuidelineCategory, LegalDocument,
@@ -20,7 +27,7 @@ from .serializers import (
     PageSerializer, ContactMessageSerializer, FreeEntrySerializer, SessionBookingConfigSerializer, PartyBookingConfigSerializer
 )
 
-class BaseCmsViewSet(viewsets.ModelViewSet):
+class BaseCmsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     def get_permissions(self):
         # Allow public read access, require staff authentication for write operations
         if self.action in ['list', 'retrieve']:
@@ -246,6 +253,29 @@ class PartyBookingConfigViewSet(BaseCmsViewSet):
         serializer = self.get_serializer(config)
         return Response(serializer.data)
 
+class ContentBundleView(APIView):
+    """
+    All active public content for one page in a single response.
+    GET /api/v1/cms/bundle/?page=<slug>. Answers If-None-Match with 304.
+    """
+    permission_classes = [permissions.AllowAny]
+    PAGE_PATTERN = re.compile(r'^[\w-]{1,100}$')
+
+    def get(self, request, *args, **kwargs):
+        page = request.query_params.get('page', 'home')
+        if not self.PAGE_PATTERN.match(page):
+            return Response({'error': 'Invalid page'}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag, body = get_bundle(page)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        # Always revalidate; the ETag makes that a cheap 304
+        response['Cache-Control'] = 'public, no-cache'
+        return response
+
 class UploadView(APIView):
     """
     Handle file uploads for CMS images.
@@ -293,40 +323,27 @@ class UploadView(APIView):
             )
         
         try:
-            # Save file using Django's default storage
-            from django.core.files.storage import default_storage
-            from django.core.files.base import ContentFile
-            import uuid
-            from datetime import datetime
-            
-            # Generate unique filename to prevent overwrites
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_id = str(uuid.uuid4())[:8]
-            safe_filename = f"{timestamp}_{unique_id}_{file_obj.name}"
-            
-            # Save to uploads directory
-            path = default_storage.save(
-                f"uploads/{safe_filename}", 
-                ContentFile(file_obj.read())
-            )
-            
-            # Generate absolute URL
-            relative_url = default_storage.url(path)
-            full_url = request.build_absolute_uri(relative_url)
-            
-            return Response({
-                'url': full_url,
-                'filename': file_obj.name,
-                'size': file_obj.size,
-                'path': path
-            }, status=status.HTTP_201_CREATED)
-            
+            # Stored once per content hash, with resized WebP variants (see images.py)
+            asset, created = ingest_image(file_obj.read(), file_obj.name)
+        except ImageError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
-                {'error': f'Upload failed: {str(e)}'}, 
+                {'error': f'Upload failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        return Response({
+            'url': request.build_absolute_uri(asset.original_url),
+            'filename': file_obj.name,
+            'size': file_obj.size,
+            'path': asset.original_url[len(settings.MEDIA_URL):],
+            'hash': asset.content_hash,
+            'deduplicated': not created,
+            'variants': asset.variants,
+            **responsive_image(asset),
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 class ReorderView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
@@ -370,6 +387,9 @@ class ReorderView(APIView):
             item_id = item.get('id')
             order = item.get('order')
             if item_id is not None and order is not None:
-                ModelClass.objects.filter(id=item_id).update(order=order)
+                ModelClass.objects.filter(id=item_id).update(order=order, updated_at=timezone.now())
+
+        # queryset.update() skips signals, so invalidate the bundles here
+        bump_content_version()
 
         return Response({'success': True})
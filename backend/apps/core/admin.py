@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, GlobalSettings
+from .models import User, GlobalSettings, Job
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -15,3 +15,11 @@ class GlobalSettingsAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # Only allow one settings instance
         return not GlobalSettings.objects.exists()
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['kind', 'last_error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_at', 'locked_by']
+    ordering = ['-created_at']
@@ -0,0 +1,43 @@
+"""
+Whether Django's default cache is shared between server processes.
+
+Without CACHE_URL the default cache is LocMemCache, private to each
+process: a value deleted or bumped there is only gone in that process.
+Code that relies on cross-process invalidation checks `cache_is_shared()`
+and falls back to the database or short-lived entries otherwise.
+
+`bump_marker` and `read_markers` are that database fallback for change
+notification: a bump writes one ChangeMarker row, and a process that
+wants to know whether anything moved reads the rows it follows by
+primary key instead of re-running the query it is watching.
+"""
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared(alias='default'):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def bump_marker(name):
+    from .models import ChangeMarker
+
+    if ChangeMarker.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            ChangeMarker.objects.create(name=name, version=1)
+    except IntegrityError:
+        # Another writer created the row first
+        ChangeMarker.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def read_markers(names):
+    """{name: version} for the given markers; missing ones are 0"""
+    from .models import ChangeMarker
+
+    versions = dict(ChangeMarker.objects.filter(name__in=names).values_list('name', 'version'))
+    return {name: versions.get(name, 0) for name in names}
@@ -0,0 +1,136 @@
+"""
+Database-backed job queue.
+
+`enqueue()` inserts a Job row inside the caller's transaction, so a job
+exists only if the booking (or whatever caused it) was committed, and the
+request never waits on SMTP or notification fan-out. The `run_jobs`
+command claims due jobs in batches, runs the registered handler and
+retries failures with exponential backoff until max_attempts.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database has
+it (PostgreSQL) and a conditional UPDATE on status elsewhere, so several
+workers can run side by side without running a job twice. Jobs left
+RUNNING by a crashed worker are put back after STALE_AFTER.
+"""
+import logging
+import socket
+import os
+from datetime import timedelta
+
+from django.core import mail
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+STALE_AFTER = timedelta(minutes=15)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register a function as the handler for jobs of `kind`."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, delay=None, run_at=None, max_attempts=5):
+    """Queue a job. Call inside the transaction that made it necessary."""
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        run_at=run_at or timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def release_stale(now=None):
+    """Put jobs abandoned by a crashed worker back in the queue."""
+    now = now or timezone.now()
+    return Job.objects.filter(status='RUNNING', locked_at__lt=now - STALE_AFTER).update(
+        status='PENDING', locked_at=None, locked_by=None
+    )
+
+
+def claim(batch_size=DEFAULT_BATCH_SIZE, worker=None, now=None):
+    """Mark up to `batch_size` due jobs as RUNNING for this worker and return them."""
+    now = now or timezone.now()
+    worker = worker or worker_name()
+    due = Job.objects.filter(status='PENDING', run_at__lte=now).order_by('run_at', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+            Job.objects.filter(id__in=ids).update(status='RUNNING', locked_at=now, locked_by=worker)
+    else:
+        ids = []
+        for job_id in due.values_list('id', flat=True)[:batch_size]:
+            # Only one worker's UPDATE can see the row still PENDING
+            if Job.objects.filter(id=job_id, status='PENDING').update(
+                status='RUNNING', locked_at=now, locked_by=worker
+            ):
+                ids.append(job_id)
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def run_job(job, mail_connection=None):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    func = HANDLERS.get(job.kind)
+    job.attempts += 1
+    try:
+        if func is None:
+            raise LookupError(f'No handler registered for job kind "{job.kind}"')
+        func(job.payload, mail_connection=mail_connection)
+    except Exception as e:
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            job.status = 'FAILED'
+            job.finished_at = timezone.now()
+            logger.error(f'Job {job.kind} #{job.id} failed permanently: {job.last_error}')
+        else:
+            job.status = 'PENDING'
+            job.run_at = timezone.now() + backoff(job.attempts)
+            logger.warning(f'Job {job.kind} #{job.id} failed (attempt {job.attempts}), retrying at {job.run_at}')
+        job.locked_at = job.locked_by = None
+        job.save(update_fields=['attempts', 'status', 'run_at', 'last_error', 'finished_at', 'locked_at', 'locked_by'])
+        return False
+
+    job.status = 'DONE'
+    job.finished_at = timezone.now()
+    job.last_error = None
+    job.save(update_fields=['attempts', 'status', 'finished_at', 'last_error'])
+    return True
+
+
+def run_batch(batch_size=DEFAULT_BATCH_SIZE, worker=None):
+    """Claim and run one batch, sharing a single mail connection. Returns (ok, failed)."""
+    autodiscover_modules('tasks')  # Registers the handlers in each app's tasks.py
+
+    release_stale()
+    jobs = claim(batch_size, worker)
+    if not jobs:
+        return 0, 0
+    ok = failed = 0
+    with mail.get_connection() as mail_connection:
+        for job in jobs:
+            if run_job(job, mail_connection):
+                ok += 1
+            else:
+                failed += 1
+    return ok, failed
@@ -0,0 +1,40 @@
+"""
+Delete (optionally archiving) old staff notifications in batches so the
+table and its indexes stay small.
+
+Usage:
+    python manage.py prune_notifications
+    python manage.py prune_notifications --days 30 --archive notifications-2026.ndjson
+    python manage.py prune_notifications --dry-run
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.notifications import PRUNE_BATCH_SIZE, RETENTION_DAYS, prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS, help='Keep notifications this many days')
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE, help='Rows deleted per transaction')
+        parser.add_argument('--archive', help='Append the deleted rows to this NDJSON file first')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many would be deleted')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = prune_notifications(before, dry_run=True)
+            self.stdout.write(self.style.WARNING(f'{count} notifications are older than {options["days"]} days'))
+            return
+
+        archive = open(options['archive'], 'a', encoding='utf-8') if options['archive'] else None
+        try:
+            deleted = prune_notifications(before, batch_size=options['batch_size'], archive=archive)
+        finally:
+            if archive:
+                archive.close()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} notifications'))
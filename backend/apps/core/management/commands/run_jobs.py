@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.jobs import DEFAULT_BATCH_SIZE, run_batch, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (emails, reminders, notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Jobs claimed per batch')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        total_ok = total_failed = 0
+        self.stdout.write(f'Job worker {worker} started')
+        try:
+            while True:
+                ok, failed = run_batch(options['batch_size'], worker)
+                total_ok += ok
+                total_failed += failed
+                if ok or failed:
+                    self.stdout.write(f'Ran {ok + failed} jobs ({failed} failed)')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_ok} succeeded, {total_failed} failed'))
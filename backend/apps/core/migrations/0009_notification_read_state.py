@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min, Q
+
+
+def copy_global_read_state(apps, schema_editor):
+    """Start every staff user from the old shared is_read flags"""
+    Notification = apps.get_model('core', 'Notification')
+    NotificationReadState = apps.get_model('core', 'NotificationReadState')
+    User = apps.get_model('core', 'User')
+
+    bounds = Notification.objects.aggregate(first_unread=Min('id', filter=Q(is_read=False)), newest=Max('id'))
+    if bounds['first_unread'] is None:
+        read_through = bounds['newest'] or 0
+    else:
+        read_through = bounds['first_unread'] - 1
+    read_ids = list(
+        Notification.objects.filter(id__gt=read_through, is_read=True).order_by('id').values_list('id', flat=True)
+    )
+    users = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True))
+    NotificationReadState.objects.bulk_create(
+        [NotificationReadState(user=user, read_through=read_through, read_ids=read_ids) for user in users],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_notification_unread_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_through', models.BigIntegerField(default=0)),
+                ('read_ids', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Notification Read State',
+                'verbose_name_plural': 'Notification Read States',
+            },
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_read_state', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_global_read_state, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_unread_idx',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='is_read',
+        ),
+    ]
@@ -90,8 +90,7 @@ class Notification(models.Model):
     title = models.CharField(max_length=255)
     message = models.TextField()
     link = models.CharField(max_length=500, null=True, blank=True)
-    is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     # Optional: Link to specific objects
     booking_id = models.IntegerField(null=True, blank=True)
@@ -106,3 +105,72 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.type}: {self.title}"
 
+
+class NotificationReadState(models.Model):
+    """
+    What one user has read: every notification with id <= read_through,
+    plus the ids in read_ids above it (see notifications.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_read_state')
+    read_through = models.BigIntegerField(default=0)
+    read_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Notification Read State"
+        verbose_name_plural = "Notification Read States"
+
+    def __str__(self):
+        return f"{self.user} read through #{self.read_through}"
+
+
+class ChangeMarker(models.Model):
+    """
+    Named counter bumped when something changes, so that server processes
+    without a shared cache can notice by reading one row (see caching.py).
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Change Marker"
+        verbose_name_plural = "Change Markers"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+
+class Job(models.Model):
+    """
+    Database-backed background job. Rows are written in the same
+    transaction as the change that caused them and picked up by the
+    `run_jobs` worker command (see jobs.py).
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),  # For claiming due jobs
+        ]
+        ordering = ['run_at']
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
@@ -0,0 +1,275 @@
+"""
+Per-user read state, cached unread counts and change versions for staff
+notifications.
+
+Each user has one NotificationReadState row: a high-water mark
+`read_through` (every notification with a lower or equal id is read) and
+`read_ids`, the notifications above it that were read out of order.
+Reading a notification adds its id to that set and then advances the mark
+over every id it now covers, so the set stays small; reading everything
+just moves the mark to the newest id. No per-notification read rows are
+stored and `mark_all_read` writes a single row.
+
+Unread counts are cached per user under the current version, which has
+two parts: a global one bumped when notifications are created, edited or
+deleted, and one per user bumped when that user reads. A user's count is
+recomputed (an id range scan above their mark) at most once per version.
+
+`wait_for_change(since, user_id)` blocks until the version moves past
+`since`. Notifications are written by the `run_jobs` worker, so with a
+shared cache (CACHE_URL) it checks only the cache and clients
+long-polling the `notifications/wait/` endpoint cost no queries between
+events. With the per-process default cache the worker's bumps never reach
+the web processes, so every change also bumps a ChangeMarker row (one
+for the notifications, one per user for reads) and waiting reads the two
+markers by primary key every LOCAL_CHECK_SECONDS, bumping this process's
+versions when they moved; other requests in the process then see the new
+counts, and the rest converge within COUNT_TIMEOUT.
+
+`prune_notifications` (the `prune_notifications` command) deletes old
+notifications in batches, optionally archiving them to NDJSON first, and
+moves every read mark up past the deleted range so read_ids never refers
+to rows that are gone.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .caching import bump_marker, cache_is_shared, read_markers
+
+VERSION_KEY = 'notifications:version'
+MARKER = 'notifications'
+COUNT_TIMEOUT = 60
+WAIT_SECONDS = 25
+MAX_WAIT_SECONDS = 60
+CHECK_SECONDS = 1
+# Between database checks when the cache is not shared
+LOCAL_CHECK_SECONDS = 5
+RETENTION_DAYS = 90
+PRUNE_BATCH_SIZE = 1000
+
+
+def _user_version_key(user_id):
+    return f'notifications:user-version:{user_id}'
+
+
+def _count_key(user_id):
+    return f'notifications:unread-count:{user_id}'
+
+
+def _user_marker(user_id):
+    return f'notifications:user:{user_id}'
+
+
+def _seen_key(marker):
+    return f'notifications:seen:{marker}'
+
+
+def _seed(key):
+    """Value of a version key, seeded from the clock if the cache lost it."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing; a clock seed is newer than any old version
+        cache.set(key, time.time_ns(), None)
+
+
+def _join(global_version, user_version):
+    return f'{global_version}.{user_version}'
+
+
+def current_version(user_id):
+    return _join(_seed(VERSION_KEY), _seed(_user_version_key(user_id)))
+
+
+def _changed(version_key, marker):
+    _bump(version_key)
+    if not cache_is_shared():
+        # Tell the other processes (see _sync_from_database)
+        bump_marker(marker)
+
+
+def notifications_changed():
+    """Invalidate every user's count once the transaction commits."""
+    transaction.on_commit(lambda: _changed(VERSION_KEY, MARKER))
+
+
+def _reads_changed(user_id):
+    transaction.on_commit(lambda: _changed(_user_version_key(user_id), _user_marker(user_id)))
+
+
+def read_state(user, lock=False):
+    from .models import NotificationReadState
+
+    state, _ = NotificationReadState.objects.get_or_create(user=user)
+    if lock:
+        state = NotificationReadState.objects.select_for_update().get(pk=state.pk)
+    return state
+
+
+def is_read(state, notification_id):
+    return notification_id <= state.read_through or notification_id in state.read_ids
+
+
+def unread_queryset(state):
+    from .models import Notification
+
+    return Notification.objects.filter(id__gt=state.read_through).exclude(id__in=state.read_ids)
+
+
+def unread_count(user):
+    """Number of notifications `user` has not read, counted once per version."""
+    version = current_version(user.id)
+    cached = cache.get(_count_key(user.id))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    count = unread_queryset(read_state(user)).count()
+    cache.set(_count_key(user.id), (version, count), COUNT_TIMEOUT)
+    return count
+
+
+def _compact(state):
+    """Advance read_through over the ids now covered by read_ids."""
+    from .models import Notification
+
+    if not state.read_ids:
+        return
+    read = set(state.read_ids)
+    newest = max(read)
+    # Lowest notification in the range that is still unread; gaps left by
+    # deleted notifications are skipped
+    first_unread = (
+        Notification.objects.filter(id__gt=state.read_through, id__lte=newest)
+        .exclude(id__in=read).order_by('id').values_list('id', flat=True).first()
+    )
+    state.read_through = newest if first_unread is None else max(state.read_through, first_unread - 1)
+    state.read_ids = sorted(i for i in read if i > state.read_through)
+
+
+def mark_read(user, notification_ids):
+    """Mark notifications read for `user`; returns how many were unread."""
+    with transaction.atomic():
+        state = read_state(user, lock=True)
+        new = {i for i in notification_ids if not is_read(state, i)}
+        if not new:
+            return 0
+        state.read_ids = sorted(set(state.read_ids) | new)
+        _compact(state)
+        state.save(update_fields=['read_through', 'read_ids', 'updated_at'])
+        _reads_changed(user.id)
+    return len(new)
+
+
+def mark_all_read(user):
+    """Mark every current notification read for `user` with one row write."""
+    from .models import Notification
+
+    with transaction.atomic():
+        state = read_state(user, lock=True)
+        newest = Notification.objects.aggregate(newest=Max('id'))['newest'] or 0
+        state.read_through = max(state.read_through, newest)
+        state.read_ids = [i for i in state.read_ids if i > state.read_through]
+        state.save(update_fields=['read_through', 'read_ids', 'updated_at'])
+        _reads_changed(user.id)
+
+
+def unread_state(user):
+    return {'version': current_version(user.id), 'count': unread_count(user)}
+
+
+def _sync_from_database(user_id):
+    """
+    Bump this process's versions if another process changed the
+    notifications or `user_id`'s reads since this one last looked.
+    """
+    followed = {MARKER: VERSION_KEY, _user_marker(user_id): _user_version_key(user_id)}
+    for marker, version in read_markers(list(followed)).items():
+        if cache.get(_seen_key(marker)) != version:
+            cache.set(_seen_key(marker), version, None)
+            _bump(followed[marker])
+
+
+async def wait_for_change(since, user_id, timeout=WAIT_SECONDS, check=CHECK_SECONDS,
+                          local_check=LOCAL_CHECK_SECONDS):
+    """
+    Return once `user_id`'s version differs from `since` or `timeout`
+    seconds have passed. Without a shared cache the change markers are
+    read on the first check and then every `local_check` seconds (see
+    _sync_from_database).
+    """
+    keys = [VERSION_KEY, _user_version_key(user_id)]
+    shared = cache_is_shared()
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + timeout
+    synced_at = None
+    while loop.time() < ends_at:
+        if not shared and (synced_at is None or loop.time() - synced_at >= local_check):
+            synced_at = loop.time()
+            await sync_to_async(_sync_from_database)(user_id)
+        versions = await cache.aget_many(keys)
+        if len(versions) < len(keys) or _join(*(versions[key] for key in keys)) != str(since):
+            return
+        await asyncio.sleep(check)
+
+
+def _advance_read_states(floor):
+    """Move read marks up to just below the oldest remaining notification."""
+    from .models import NotificationReadState
+
+    stale = list(NotificationReadState.objects.filter(read_through__lt=floor - 1))
+    for state in stale:
+        state.read_through = floor - 1
+        state.read_ids = [i for i in state.read_ids if i > state.read_through]
+    NotificationReadState.objects.bulk_update(stale, ['read_through', 'read_ids'], batch_size=500)
+    return len(stale)
+
+
+def prune_notifications(before, batch_size=PRUNE_BATCH_SIZE, archive=None, dry_run=False):
+    """
+    Delete notifications created before `before`, oldest first, in batches
+    of `batch_size`. Rows are written to the `archive` text file as NDJSON
+    before they are deleted. Returns the number of notifications removed
+    (or that would be, with dry_run).
+    """
+    from .models import Notification
+
+    old = Notification.objects.filter(created_at__lt=before)
+    if dry_run:
+        return old.count()
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(old.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            batch = Notification.objects.filter(id__in=ids)
+            if archive is not None:
+                for row in batch.order_by('id').values():
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            # Nothing references notifications: one DELETE, without the
+            # per-row post_delete receiver, and one version bump per batch
+            batch._raw_delete(batch.db)
+            notifications_changed()
+        deleted += len(ids)
+
+        newest_deleted = ids[-1]
+
+    if deleted:
+        floor = Notification.objects.aggregate(floor=Min('id'))['floor']
+        _advance_read_states(newest_deleted + 1 if floor is None else floor)
+    return deleted
@@ -0,0 +1,150 @@
+"""
+SQL query instrumentation.
+
+`track_queries()` records every statement run while it is active (count,
+total time and repeated statements), so it works with DEBUG off. A single
+execute wrapper is installed on each database connection as it is created
+and reports to the trackers held in a ContextVar; asgiref copies the
+context into sync_to_async threads, so queries an async view runs there
+are still counted. QueryCountMiddleware wraps each request in it (sync or
+async), writes one structured log line per request and, when
+QUERY_COUNT_HEADER is on, adds X-Query-Count / X-Query-Time-Ms headers.
+`assert_query_budget()` turns the same data into a test assertion.
+
+Queries run while a StreamingHttpResponse is consumed happen after the
+middleware returns and are not counted.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Trackers active in the current context, innermost last
+_active = ContextVar('query_trackers', default=())
+
+
+class QueryStats:
+    def __init__(self, label=None):
+        self.label = label
+        self.statements = []
+        self.total_time = 0.0
+
+    def record(self, sql, elapsed):
+        self.total_time += elapsed
+        self.statements.append(sql)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_ms(self):
+        return round(self.total_time * 1000, 2)
+
+    @property
+    def duplicates(self):
+        """Statements (with placeholders) that ran more than once, with their counts"""
+        return {sql: seen for sql, seen in Counter(self.statements).items() if seen > 1}
+
+    def as_dict(self):
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'time_ms': self.total_ms,
+            'duplicates': len(self.duplicates),
+        }
+
+
+def _execute(execute, sql, params, many, context):
+    trackers = _active.get()
+    if not trackers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for stats in trackers:
+            stats.record(sql, elapsed)
+
+
+def _install(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+connection_created.connect(_install)
+
+
+@contextmanager
+def track_queries(label=None):
+    """Record every query run on any database connection inside the block."""
+    stats = QueryStats(label)
+    # Connections opened before this module was imported
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_query_budget(budget, label=None):
+    """Fail if the block runs more than `budget` queries, listing repeats."""
+    with track_queries(label) as stats:
+        yield stats
+    if stats.count > budget:
+        repeated = '\n'.join(f'  {seen}x {sql}' for sql, seen in stats.duplicates.items())
+        raise AssertionError(
+            f"{label or 'Block'} ran {stats.count} queries, budget is {budget}"
+            + (f"\nRepeated statements:\n{repeated}" if repeated else '')
+        )
+
+
+class QueryCountMiddleware:
+    """Log query count, time and duplicates for every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'QUERY_COUNT_HEADER', False)
+        self.warn_threshold = getattr(settings, 'QUERY_COUNT_WARN_THRESHOLD', 50)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        stats.label = match.view_name if match else request.path
+        record = dict(stats.as_dict(), method=request.method, path=request.path, status=response.status_code)
+        level = logging.WARNING if stats.count > self.warn_threshold else logging.INFO
+        logger.log(level, json.dumps(record), extra={'query_stats': record})
+
+        if self.header:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time-Ms'] = str(stats.total_ms)
+        return response
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import User, GlobalSettings, Logo, Notification
+from .notifications import is_read
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -53,6 +54,7 @@ class LogoSerializer(serializers.ModelSerializer):
         return None
 
 class NotificationSerializer(serializers.ModelSerializer):
+    is_read = serializers.SerializerMethodField()
     time_ago = serializers.SerializerMethodField()
     
     class Meta:
@@ -62,6 +64,11 @@ class NotificationSerializer(serializers.ModelSerializer):
                   'contact_message_id']
         read_only_fields = ['created_at']
     
+    def get_is_read(self, obj):
+        """Read by the requesting user (per-user state, see notifications.py)"""
+        state = self.context.get('read_state')
+        return state is not None and is_read(state, obj.id)
+    
     def get_time_ago(self, obj):
         diff = timezone.now() - obj.created_at
         
@@ -1,31 +1,49 @@
-from django.db.models.signals import post_save
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from apps.bookings.models import Booking, PartyBooking
+from . import notifications
+from .jobs import enqueue
 from .models import Notification
 
+# Give customers a couple of hours to sign before reminding them
+WAIVER_REMINDER_DELAY = timedelta(hours=2)
+
 @receiver(post_save, sender=Booking)
 def create_booking_notification(sender, instance, created, **kwargs):
-    """Create notification when a new booking is created"""
+    """Queue the staff notification, confirmation email and waiver reminder for a new booking"""
     if created:
-        Notification.objects.create(
-            type='BOOKING',
-            title='New Session Booking',
-            message=f'New booking from {instance.name} for {instance.date}',
-            link=f'/admin/bookings/{instance.id}',
-            booking_id=instance.id
-        )
+        enqueue('notification', {
+            'type': 'BOOKING',
+            'title': 'New Session Booking',
+            'message': f'New booking from {instance.name} for {instance.date}',
+            'link': f'/admin/bookings/{instance.id}',
+            'booking_id': instance.id,
+        })
+        enqueue('booking_confirmation', {'booking_id': instance.id})
+        enqueue('waiver_reminder', {'booking_id': instance.id}, delay=WAIVER_REMINDER_DELAY)
 
 @receiver(post_save, sender=PartyBooking)
 def create_party_booking_notification(sender, instance, created, **kwargs):
-    """Create notification when a new party booking is created"""
+    """Queue the staff notification and waiver reminder for a new party booking"""
     if created:
-        Notification.objects.create(
-            type='PARTY_BOOKING',
-            title='New Party Booking',
-            message=f'New party booking from {instance.name} for {instance.date}',
-            link=f'/admin/party-bookings/{instance.id}',
-            party_booking_id=instance.id
-        )
+        enqueue('notification', {
+            'type': 'PARTY_BOOKING',
+            'title': 'New Party Booking',
+            'message': f'New party booking from {instance.name} for {instance.date}',
+            'link': f'/admin/party-bookings/{instance.id}',
+            'party_booking_id': instance.id,
+        })
+        enqueue('party_booking_confirmation', {'party_booking_id': instance.id})
+        enqueue('waiver_reminder', {'party_booking_id': instance.id}, delay=WAIVER_REMINDER_DELAY)
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_unread_counts(sender, instance, raw=False, **kwargs):
+    """Every user's unread count may have changed"""
+    if not raw:
+        notifications.notifications_changed()
 
 # Check if ContactMessage model exists before creating signal
 try:
@@ -33,17 +51,17 @@ try:
     
     @receiver(post_save, sender=ContactMessage)
     def create_contact_message_notification(sender, instance, created, **kwargs):
-        """Create notification when a new contact message is received"""
+        """Queue a notification when a new contact message is received"""
         if created:
             # Truncate message for notification preview
             message_preview = instance.message[:50] + '...' if len(instance.message) > 50 else instance.message
-            Notification.objects.create(
-                type='CONTACT_MESSAGE',
-                title='New Contact Message',
-                message=f'Message from {instance.name} ({instance.email}): {message_preview}',
-                link=f'/admin/cms/contact-messages/{instance.id}',
-                contact_message_id=instance.id
-            )
+            enqueue('notification', {
+                'type': 'CONTACT_MESSAGE',
+                'title': 'New Contact Message',
+                'message': f'Message from {instance.name} ({instance.email}): {message_preview}',
+                'link': f'/admin/cms/contact-messages/{instance.id}',
+                'contact_message_id': instance.id,
+            })
 except ImportError:
     # ContactMessage model doesn't exist yet
     pass
@@ -0,0 +1,80 @@
+"""
+Background job handlers: booking emails and staff notifications.
+Queued from signals and views with jobs.enqueue(), run by `run_jobs`.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from apps.bookings.models import Booking, PartyBooking
+from .jobs import handler
+from .models import GlobalSettings, Notification
+
+
+def _park_name():
+    settings_row = GlobalSettings.objects.only('park_name').first()
+    return settings_row.park_name if settings_row else 'Ninja Inflatable Park'
+
+
+def _send(subject, body, to, mail_connection=None):
+    EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [to], connection=mail_connection).send()
+
+
+@handler('notification')
+def create_notification(payload, mail_connection=None):
+    """Write a staff Notification row; payload holds the model fields"""
+    Notification.objects.create(**payload)
+
+
+@handler('booking_confirmation')
+def send_booking_confirmation(payload, mail_connection=None):
+    booking = Booking.objects.filter(pk=payload['booking_id']).first()
+    if not booking or not booking.email:
+        return
+    park = _park_name()
+    body = (
+        f"Hi {booking.name},\n\n"
+        f"Your session at {park} is booked for {booking.date:%d %b %Y} at {booking.time:%H:%M} "
+        f"({booking.duration} minutes) for {booking.adults} adults, {booking.kids} kids "
+        f"and {booking.spectators} spectators.\n"
+        f"Amount: ₹{booking.amount}\n\n"
+        f"Your ticket: {settings.FRONTEND_URL}/tickets/{booking.uuid}\n"
+    )
+    _send(f"Booking confirmed - {park}", body, booking.email, mail_connection)
+
+
+@handler('party_booking_confirmation')
+def send_party_booking_confirmation(payload, mail_connection=None):
+    booking = PartyBooking.objects.filter(pk=payload['party_booking_id']).first()
+    if not booking or not booking.email:
+        return
+    park = _park_name()
+    child = f" for {booking.birthday_child_name}" if booking.birthday_child_name else ''
+    body = (
+        f"Hi {booking.name},\n\n"
+        f"Your {booking.package_name} party{child} at {park} is booked for "
+        f"{booking.date:%d %b %Y} at {booking.time:%H:%M}.\n"
+        f"Guests: {booking.kids} kids, {booking.adults} adults\n"
+        f"Amount: ₹{booking.amount}\n\n"
+        f"Booking reference: {booking.uuid}\n"
+    )
+    _send(f"Party booking confirmed - {park}", body, booking.email, mail_connection)
+
+
+@handler('waiver_reminder')
+def send_waiver_reminder(payload, mail_connection=None):
+    """Remind the booker to sign, unless the waiver was signed in the meantime"""
+    if payload.get('party_booking_id'):
+        booking = PartyBooking.objects.filter(pk=payload['party_booking_id']).first()
+        pending = booking and not booking.waiver_signed and booking.status != 'CANCELLED'
+    else:
+        booking = Booking.objects.filter(pk=payload.get('booking_id')).first()
+        pending = booking and booking.waiver_status == 'PENDING' and booking.booking_status != 'CANCELLED'
+    if not pending or not booking.email or booking.waivers.exists():
+        return
+    park = _park_name()
+    body = (
+        f"Hi {booking.name},\n\n"
+        f"Please sign the safety waiver before your visit to {park} on {booking.date:%d %b %Y}.\n"
+        f"Sign here: {settings.FRONTEND_URL}/waiver\n"
+    )
+    _send(f"Please sign your waiver - {park}", body, booking.email, mail_connection)
@@ -0,0 +1,107 @@
+"""
+Tests for the background job queue and the booking email handlers
+"""
+import pytest
+from io import StringIO
+from datetime import date, time, timedelta
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+from apps.bookings.models import Booking, PartyBooking
+from apps.core import jobs
+from apps.core.models import Job, Notification
+
+DAY = date.today() + timedelta(days=3)
+
+
+def make_booking(**overrides):
+    data = dict(name="Jumper", email="jumper@example.com", phone="1", date=DAY,
+                time=time(10, 0), duration=60, adults=2, amount=100)
+    data.update(overrides)
+    return Booking.objects.create(**data)
+
+
+@pytest.fixture
+def flaky_handler():
+    calls = []
+
+    @jobs.handler('test_flaky')
+    def flaky(payload, mail_connection=None):
+        calls.append(payload)
+        raise RuntimeError('smtp down')
+
+    yield calls
+    jobs.HANDLERS.pop('test_flaky', None)
+
+
+@pytest.mark.django_db
+class TestJobs:
+
+    def test_booking_queues_jobs_instead_of_sending(self):
+        booking = make_booking()
+        assert mail.outbox == []
+        assert not Notification.objects.exists()
+        kinds = dict(Job.objects.values_list('kind', 'run_at'))
+        assert set(kinds) == {'notification', 'booking_confirmation', 'waiver_reminder'}
+        # The reminder waits; the rest is due straight away
+        assert kinds['waiver_reminder'] > timezone.now() + timedelta(hours=1)
+        assert jobs.run_batch() == (2, 0)
+
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['jumper@example.com']
+        assert str(booking.uuid) in mail.outbox[0].body
+        assert Notification.objects.get().booking_id == booking.id
+        assert Job.objects.filter(status='DONE').count() == 2
+        assert Job.objects.get(kind='waiver_reminder').status == 'PENDING'
+
+    def test_waiver_reminder_skipped_once_signed(self):
+        booking = make_booking()
+        Job.objects.filter(kind='waiver_reminder').update(run_at=timezone.now())
+        Booking.objects.filter(pk=booking.pk).update(waiver_status='SIGNED')
+        jobs.run_batch()
+        assert [message.subject.startswith('Booking confirmed') for message in mail.outbox] == [True]
+        assert Job.objects.get(kind='waiver_reminder').status == 'DONE'
+
+    def test_failed_job_backs_off_then_fails(self, flaky_handler):
+        job = jobs.enqueue('test_flaky', {'n': 1}, max_attempts=2)
+        assert jobs.run_batch() == (0, 1)
+        job.refresh_from_db()
+        assert job.status == 'PENDING'
+        assert job.attempts == 1
+        assert 'smtp down' in job.last_error
+        assert job.run_at >= timezone.now() + jobs.backoff(1) - timedelta(seconds=5)
+        # Not due again yet
+        assert jobs.run_batch() == (0, 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        assert jobs.run_batch() == (0, 1)
+        job.refresh_from_db()
+        assert job.status == 'FAILED'
+        assert len(flaky_handler) == 2
+
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        for n in range(3):
+            jobs.enqueue('notification', {'type': 'BOOKING', 'title': f'n{n}', 'message': 'm'})
+        first = jobs.claim(batch_size=2, worker='a')
+        second = jobs.claim(batch_size=5, worker='b')
+        assert len(first) == 2 and len(second) == 1
+        assert not {job.id for job in first} & {job.id for job in second}
+
+    def test_run_jobs_command_and_resend(self, client, django_user_model):
+        party = PartyBooking.objects.create(
+            name="Host", email="host@example.com", phone="1", date=DAY, time=time(12, 0),
+            package_name="Mega", kids=10, adults=2, amount=5000,
+        )
+        call_command('run_jobs', '--once', stdout=StringIO())
+        assert [message.to for message in mail.outbox] == [['host@example.com']]
+
+        admin = django_user_model.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', name='Admin', is_staff=True
+        )
+        client.force_login(admin)
+        response = client.post(f'/api/v1/bookings/party-bookings-old/{party.id}/resend_confirmation_email/')
+        assert response.status_code == 200
+        assert 'host@example.com' in response.json()['message']
+        assert len(mail.outbox) == 1
+        call_command('run_jobs', '--once', stdout=StringIO())
+        assert len(mail.outbox) == 2
@@ -0,0 +1,201 @@
+"""
+Tests for per-user notification read state, cached unread counts, the
+long-poll endpoint and retention
+"""
+import io
+import json
+import threading
+import pytest
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.core import notifications
+from apps.core.caching import bump_marker, read_markers
+from apps.core.models import Notification, NotificationReadState
+from apps.core.querycount import track_queries
+
+BASE = '/api/v1/core/notifications/'
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    return django_capture_on_commit_callbacks
+
+
+def notify(commit, title='New Booking'):
+    with commit(execute=True):
+        return Notification.objects.create(type='BOOKING', title=title, message='m')
+
+
+@pytest.fixture
+def other_client(django_user_model):
+    client = APIClient()
+    client.force_login(django_user_model.objects.create_user(
+        username='other', email='other@example.com', password='pass', name='Other'))
+    return client
+
+
+@pytest.mark.django_db
+class TestReadState:
+
+    def test_reads_are_per_user(self, staff_client, other_client, commit):
+        first, second, third = (notify(commit, f'n{i}') for i in range(3))
+        with commit(execute=True):
+            assert staff_client.post(f'{BASE}{second.id}/mark_read/').json()['is_read']
+
+        mine = {row['id']: row['is_read'] for row in staff_client.get(BASE).json()}
+        assert mine == {first.id: False, second.id: True, third.id: False}
+        assert [row['id'] for row in staff_client.get(f'{BASE}unread/').json()] == [third.id, first.id]
+        assert staff_client.get(f'{BASE}unread_count/').json()['count'] == 2
+        assert other_client.get(f'{BASE}unread_count/').json()['count'] == 3
+
+        with commit(execute=True):
+            other_client.post(f'{BASE}mark_all_read/')
+        assert other_client.get(f'{BASE}unread_count/').json()['count'] == 0
+        assert staff_client.get(f'{BASE}unread_count/').json()['count'] == 2
+
+    def test_cursor_absorbs_the_exception_set(self, django_user_model, commit):
+        user = django_user_model.objects.create_user(username='u', email='u@example.com', password='pass')
+        ids = [notify(commit, f'n{i}').id for i in range(5)]
+        Notification.objects.filter(id=ids[2]).delete()
+
+        notifications.mark_read(user, [ids[1], ids[3]])
+        state = NotificationReadState.objects.get(user=user)
+        assert (state.read_through, state.read_ids) == (ids[0] - 1, [ids[1], ids[3]])
+
+        # Reading the first one covers everything up to the last unread; the
+        # deleted id in between is skipped
+        notifications.mark_read(user, [ids[0]])
+        state.refresh_from_db()
+        assert (state.read_through, state.read_ids) == (ids[3], [])
+        assert notifications.mark_read(user, ids[:4]) == 0
+
+        notifications.mark_all_read(user)
+        state.refresh_from_db()
+        assert (state.read_through, state.read_ids) == (ids[4], [])
+
+    def test_count_is_cached_per_version(self, staff_client, commit):
+        notify(commit)
+        first = staff_client.get(f'{BASE}unread_count/').json()
+        assert first['count'] == 1
+        with track_queries() as tracked:
+            assert staff_client.get(f'{BASE}unread_count/').json() == first
+        assert not any('core_notification"' in sql for sql in tracked.statements)
+
+        notify(commit)
+        second = staff_client.get(f'{BASE}unread_count/').json()
+        assert second['count'] == 2 and second['version'] != first['version']
+
+    def test_staff_only(self, django_user_model):
+        assert APIClient().get(f'{BASE}unread_count/').status_code in (401, 403)
+        assert APIClient().get(f'{BASE}wait/').status_code == 401
+        customer = APIClient()
+        customer.force_login(django_user_model.objects.create_user(
+            username='visitor', email='v@example.com', password='pass', role='CUSTOMER'))
+        assert customer.get(f'{BASE}wait/').status_code == 403
+
+
+@pytest.mark.django_db
+class TestWait:
+
+    def test_returns_at_once_without_since_or_after_a_change(self, staff_client, commit):
+        first = staff_client.get(f'{BASE}wait/').json()
+        assert first['count'] == 0
+
+        notify(commit)
+        changed = staff_client.get(f'{BASE}wait/', {'since': first['version'], 'timeout': 5}).json()
+        assert changed['count'] == 1 and changed['version'] != first['version']
+        assert staff_client.get(f'{BASE}wait/', {'timeout': 'soon'}).status_code == 400
+
+    def test_own_reads_change_only_own_version(self, staff_client, other_client, commit):
+        notification = notify(commit)
+        others = other_client.get(f'{BASE}wait/').json()['version']
+        mine = staff_client.get(f'{BASE}wait/').json()['version']
+        with commit(execute=True):
+            staff_client.post(f'{BASE}{notification.id}/mark_read/')
+        assert staff_client.get(f'{BASE}wait/').json()['version'] != mine
+        assert other_client.get(f'{BASE}wait/').json()['version'] == others
+
+    def test_times_out_without_queries(self, monkeypatch):
+        monkeypatch.setattr(notifications, 'cache_is_shared', lambda: True)
+        user_id = 1
+        since = notifications.current_version(user_id)
+        with track_queries() as tracked:
+            async_to_sync(notifications.wait_for_change)(since, user_id, timeout=0.05, check=0.01)
+        assert tracked.count == 0
+
+    def test_wakes_up_on_a_new_notification(self, monkeypatch):
+        monkeypatch.setattr(notifications, 'cache_is_shared', lambda: True)
+        since = notifications.current_version(1)
+        timer = threading.Timer(0.05, notifications._bump, args=(notifications.VERSION_KEY,))
+        timer.start()
+        async_to_sync(notifications.wait_for_change)(since, 1, timeout=5, check=0.01)
+        timer.join()
+        assert notifications.current_version(1) != since
+
+    def test_sees_other_processes_through_change_markers(self, staff_client):
+        staff_client.get(f'{BASE}wait/')
+        user_id = NotificationReadState.objects.get().user_id
+        wait = async_to_sync(notifications.wait_for_change)
+        # The first check in a process records the markers
+        wait('', user_id, timeout=0.01, check=0.01, local_check=0.01)
+        since = notifications.current_version(user_id)
+        with track_queries() as tracked:
+            wait(since, user_id, timeout=0.2, check=0.01, local_check=0.1)
+        assert notifications.current_version(user_id) == since
+        # One primary-key read of the markers per local_check, not per check
+        assert 1 <= tracked.count <= 3
+
+        # Written by the worker: only its marker bump reaches this process
+        Notification.objects.create(type='BOOKING', title='From the worker', message='m')
+        bump_marker(notifications.MARKER)
+        wait(since, user_id, timeout=5, check=0.01, local_check=0.01)
+        assert notifications.current_version(user_id) != since
+        assert staff_client.get(f'{BASE}unread_count/').json()['count'] == 1
+
+    def test_changes_bump_markers_only_without_a_shared_cache(self, django_user_model, commit, monkeypatch):
+        user = django_user_model.objects.create_user(username='u', email='u@example.com', password='pass')
+        notification = notify(commit)
+        with commit(execute=True):
+            notifications.mark_read(user, [notification.id])
+        markers = [notifications.MARKER, notifications._user_marker(user.id)]
+        assert read_markers(markers) == dict.fromkeys(markers, 1)
+
+        monkeypatch.setattr(notifications, 'cache_is_shared', lambda: True)
+        notify(commit)
+        assert read_markers(markers) == dict.fromkeys(markers, 1)
+
+
+@pytest.mark.django_db
+class TestRetention:
+
+    def test_prunes_in_batches_and_moves_read_marks(self, django_user_model, commit, tmp_path):
+        user = django_user_model.objects.create_user(username='u', email='u@example.com', password='pass')
+        ids = [notify(commit, f'n{i}').id for i in range(6)]
+        Notification.objects.filter(id__in=ids[:4]).update(created_at=timezone.now() - timedelta(days=100))
+        notifications.mark_read(user, [ids[1], ids[5]])
+
+        out = io.StringIO()
+        call_command('prune_notifications', '--dry-run', stdout=out)
+        assert '4 notifications' in out.getvalue()
+
+        archive = tmp_path / 'archive.ndjson'
+        call_command('prune_notifications', '--batch-size', '2', '--archive', str(archive), stdout=out)
+        assert list(Notification.objects.values_list('id', flat=True).order_by('id')) == ids[4:]
+        assert [json.loads(line)['title'] for line in archive.read_text().splitlines()] == ['n0', 'n1', 'n2', 'n3']
+
+        state = NotificationReadState.objects.get(user=user)
+        assert (state.read_through, state.read_ids) == (ids[3], [ids[5]])
+        assert notifications.unread_count(user) == 1
+
+    def test_prune_deletes_and_invalidates_once_per_batch(self, commit):
+        for i in range(5):
+            notify(commit, f'n{i}')
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=100))
+        with commit() as callbacks, track_queries() as tracked:
+            deleted = notifications.prune_notifications(timezone.now(), batch_size=2)
+        assert deleted == 5 and not Notification.objects.exists()
+        assert len(callbacks) == 3
+        assert len([sql for sql in tracked.statements if sql.startswith('DELETE')]) == 3
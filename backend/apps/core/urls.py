@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, GlobalSettingsViewSet, DashboardViewSet, LogoViewSet, NotificationViewSet
+from .views import (
+    UserViewSet, GlobalSettingsViewSet, DashboardViewSet, LogoViewSet, NotificationViewSet,
+    notification_wait_view,
+)
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -10,6 +13,8 @@ router.register(r'notifications', NotificationViewSet)
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
+    # Long-poll instead of polling notifications/unread_count/
+    path('notifications/wait/', notification_wait_view, name='notifications-wait'),
     path('', include(router.urls)),
 ]
 
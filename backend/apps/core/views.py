@@ -1,15 +1,20 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg, Q
 from datetime import timedelta
 
+from . import notifications
 from .models import User, GlobalSettings, Logo, Notification
 from .serializers import UserSerializer, GlobalSettingsSerializer, LogoSerializer, NotificationSerializer
 
-from apps.bookings.models import Booking, Waiver, Customer, PartyBooking
+from apps.bookings.models import Booking, Waiver, Customer, PartyBooking, DailyBookingStats
 from apps.bookings.serializers import BookingSerializer, PartyBookingSerializer
+from apps.bookings.feed import booking_feed, decode_cursor, InvalidCursor, DEFAULT_PAGE_SIZE
+from apps.bookings.permissions import IsStaffUser, authenticate_staff
 from apps.shop.models import Voucher
 from apps.cms.models import Activity, Faq, Banner
 
@@ -100,41 +105,70 @@ class LogoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 class NotificationViewSet(viewsets.ModelViewSet):
+    """Staff notifications; read state is per user (see notifications.py)"""
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
-    permission_classes = [permissions.AllowAny]  # TODO: Change to IsAdminUser in production
+    permission_classes = [IsStaffUser]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['read_state'] = notifications.read_state(self.request.user)
+        return context
     
     @action(detail=False, methods=['get'])
     def unread(self, request):
         """Get unread notifications"""
-        unread = Notification.objects.filter(is_read=False)
-        serializer = self.get_serializer(unread, many=True)
+        context = self.get_serializer_context()
+        unread = notifications.unread_queryset(context['read_state'])
+        serializer = self.get_serializer(unread, many=True, context=context)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        """Get count of unread notifications"""
-        count = Notification.objects.filter(is_read=False).count()
-        return Response({'count': count})
+        """Get count of unread notifications (cached, see notifications.py)"""
+        return Response(notifications.unread_state(request.user))
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark notification as read"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notifications.mark_read(request.user, [notification.id])
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        Notification.objects.filter(is_read=False).update(is_read=True)
+        notifications.mark_all_read(request.user)
         return Response({'status': 'success', 'message': 'All notifications marked as read'})
 
 
+async def notification_wait_view(request):
+    """
+    Long-poll for notification changes: returns {version, count} for the
+    requesting user as soon as their version differs from ?since=
+    (immediately without it), or after ?timeout= seconds (default 25) with
+    the same version. With a shared cache waiting reads only the cache;
+    see notifications.wait_for_change.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    user, status = await sync_to_async(authenticate_staff)(request)
+    if status:
+        message = 'Authentication required' if status == 401 else 'Permission denied'
+        return JsonResponse({'error': message}, status=status)
+    since = request.GET.get('since')
+    try:
+        timeout = min(float(request.GET.get('timeout', notifications.WAIT_SECONDS)), notifications.MAX_WAIT_SECONDS)
+    except ValueError:
+        return JsonResponse({'error': 'timeout must be a number of seconds'}, status=400)
+    if since:
+        await notifications.wait_for_change(since, user.id, timeout=timeout)
+    response = JsonResponse(await sync_to_async(notifications.unread_state)(user))
+    response['Cache-Control'] = 'no-store'
+    return response
+
 
-from apps.bookings.permissions import IsStaffUser
 
 class DashboardViewSet(viewsets.ViewSet):
     permission_classes = [IsStaffUser]  # Allow employees to access dashboard
@@ -144,15 +178,37 @@ class DashboardViewSet(viewsets.ViewSet):
         today = timezone.now().date()
         first_day_of_month = today.replace(day=1)
 
+        yesterday = today - timedelta(days=1)
+        week_ago = today - timedelta(days=7)
+        two_weeks_ago = today - timedelta(days=14)
+
+        # Booking counters come from the DailyBookingStats rollup rather than
+        # scanning Booking/PartyBooking (see apps/bookings/stats.py)
+        rollup = DailyBookingStats.objects.exclude(status='CANCELLED')
+        totals = {
+            row['kind']: row
+            for row in rollup.order_by().values('kind').annotate(
+                total=Sum('bookings'),
+                revenue=Sum('revenue'),
+                pending_waivers=Sum('pending_waivers'),
+                today=Sum('bookings', filter=Q(date=today)),
+                this_week=Sum('created', filter=Q(date__gte=week_ago)),
+                last_week=Sum('created', filter=Q(date__gte=two_weeks_ago, date__lt=week_ago)),
+            )
+        }
+
+        def total_for(kind, field):
+            return (totals.get(kind) or {}).get(field) or 0
+
         # Session Bookings (Standard Booking model)
-        session_bookings_today = Booking.objects.filter(date=today).exclude(status='CANCELLED').count()
-        total_session_bookings = Booking.objects.exclude(status='CANCELLED').count()
-        session_revenue = Booking.objects.exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
+        session_bookings_today = total_for('SESSION', 'today')
+        total_session_bookings = total_for('SESSION', 'total')
+        session_revenue = total_for('SESSION', 'revenue')
 
         # Party Bookings (New PartyBooking model)
-        party_bookings_today = PartyBooking.objects.filter(date=today).exclude(status='CANCELLED').count()
-        total_party_bookings = PartyBooking.objects.exclude(status='CANCELLED').count()
-        party_revenue = PartyBooking.objects.exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
+        party_bookings_today = total_for('PARTY', 'today')
+        total_party_bookings = total_for('PARTY', 'total')
+        party_revenue = total_for('PARTY', 'revenue')
 
         # Aggregated Stats
         bookings_today = session_bookings_today + party_bookings_today
@@ -160,9 +216,7 @@ class DashboardViewSet(viewsets.ViewSet):
         total_revenue = session_revenue + party_revenue
 
         # Waivers
-        pending_waivers = Booking.objects.filter(waiver_status='PENDING').exclude(status='CANCELLED').count()
-        pending_party_waivers = PartyBooking.objects.filter(waiver_signed=False).exclude(status='CANCELLED').count()
-        total_pending_waivers = pending_waivers + pending_party_waivers
+        total_pending_waivers = total_for('SESSION', 'pending_waivers') + total_for('PARTY', 'pending_waivers')
 
         total_waivers = Waiver.objects.count()
         signed_waivers = total_waivers 
@@ -205,25 +259,37 @@ class DashboardViewSet(viewsets.ViewSet):
         )[:5]
 
         # Revenue Chart (last 7 days)
+        daily_revenue = dict(
+            rollup.filter(date__gte=today - timedelta(days=6), date__lte=today)
+            .order_by()
+            .values('date')
+            .annotate(total=Sum('revenue'))
+            .values_list('date', 'total')
+        )
         monthly_revenue = []
         for i in range(6, -1, -1):
             d = today - timedelta(days=i)
-            day_session_revenue = Booking.objects.filter(date=d).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-            day_party_revenue = PartyBooking.objects.filter(date=d).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-            
             monthly_revenue.append({
                 "name": d.strftime('%a'),
-                "total": float(day_session_revenue + day_party_revenue)  # Convert Decimal to float
+                "total": float(daily_revenue.get(d) or 0)  # Convert Decimal to float
             })
 
         # Customers
-        total_customers = Customer.objects.count()
-        new_customers_month = Customer.objects.filter(created_at__gte=first_day_of_month).count()
-        repeat_customers = Customer.objects.annotate(booking_count=Count('bookings')).filter(booking_count__gt=1).count()
+        customer_counts = Customer.objects.aggregate(
+            total=Count('id'),
+            new_month=Count('id', filter=Q(created_at__gte=first_day_of_month)),
+        )
+        total_customers = customer_counts['total']
+        new_customers_month = customer_counts['new_month']
+        repeat_customers = Customer.objects.filter(booking_count__gt=1).count()
 
         # Vouchers
-        active_vouchers = Voucher.objects.filter(is_active=True).count()
-        total_voucher_redemptions = Voucher.objects.aggregate(Sum('used_count'))['used_count__sum'] or 0
+        voucher_counts = Voucher.objects.aggregate(
+            active=Count('id', filter=Q(is_active=True)),
+            redemptions=Sum('used_count'),
+        )
+        active_vouchers = voucher_counts['active']
+        total_voucher_redemptions = voucher_counts['redemptions'] or 0
 
         # Content
         total_activities = Activity.objects.filter(active=True).count()
@@ -248,27 +314,14 @@ class DashboardViewSet(viewsets.ViewSet):
             latest_message_preview = f"{latest_message.name}: {latest_message.message[:50]}..." if len(latest_message.message) > 50 else f"{latest_message.name}: {latest_message.message}"
         
         # Today's Revenue
-        today_session_revenue = Booking.objects.filter(date=today).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        today_party_revenue = PartyBooking.objects.filter(date=today).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        today_revenue = today_session_revenue + today_party_revenue
+        today_revenue = daily_revenue.get(today) or 0
         
         # Yesterday's Revenue for comparison
-        yesterday = today - timedelta(days=1)
-        yesterday_session_revenue = Booking.objects.filter(date=yesterday).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        yesterday_party_revenue = PartyBooking.objects.filter(date=yesterday).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        yesterday_revenue = yesterday_session_revenue + yesterday_party_revenue
+        yesterday_revenue = daily_revenue.get(yesterday) or 0
         
-        # Booking Trend (This week vs Last week)
-        week_ago = today - timedelta(days=7)
-        two_weeks_ago = today - timedelta(days=14)
-        
-        this_week_session = Booking.objects.filter(created_at__gte=week_ago).exclude(status='CANCELLED').count()
-        this_week_party = PartyBooking.objects.filter(created_at__gte=week_ago).exclude(status='CANCELLED').count()
-        this_week_bookings = this_week_session + this_week_party
-        
-        last_week_session = Booking.objects.filter(created_at__gte=two_weeks_ago, created_at__lt=week_ago).exclude(status='CANCELLED').count()
-        last_week_party = PartyBooking.objects.filter(created_at__gte=two_weeks_ago, created_at__lt=week_ago).exclude(status='CANCELLED').count()
-        last_week_bookings = last_week_session + last_week_party
+        # Booking Trend (This week vs Last week), by booking creation date
+        this_week_bookings = total_for('SESSION', 'this_week') + total_for('PARTY', 'this_week')
+        last_week_bookings = total_for('SESSION', 'last_week') + total_for('PARTY', 'last_week')
         
         # Calculate growth percentage
         booking_growth = 0
@@ -311,105 +364,38 @@ class DashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def all_bookings(self, request):
         """
-        Unified endpoint that returns both session and party bookings combined with customer data
+        Unified endpoint that returns both session and party bookings combined with customer data.
+        Results are newest first and cursor-paginated: pass the returned `next`
+        value back as ?cursor= to get the following page (?limit= sets the page
+        size, at most 200). `next` is null on the last page. `count` is the
+        number of results in this page, not the total; no total is computed.
         """
         booking_type = request.query_params.get('type', None)
         status = request.query_params.get('status', None)
         search = request.query_params.get('search', None)
-        
-        all_bookings_data = []
+        cursor = request.query_params.get('cursor', None)
+        limit = request.query_params.get('limit', DEFAULT_PAGE_SIZE)
         
         try:
-            # Fetch session bookings
-            if booking_type != 'party':
-                session_bookings = Booking.objects.select_related('customer').all()
-                if status:
-                    session_bookings = session_bookings.filter(booking_status=status)
-                if search:
-                    session_bookings = session_bookings.filter(
-                        Q(name__icontains=search) | Q(email__icontains=search)
-                    )
-                
-                for booking in session_bookings:
-                    try:
-                        all_bookings_data.append({
-                            'id': booking.id,
-                            'uuid': str(booking.uuid),
-                            'type': 'SESSION',
-                            'name': booking.name,
-                            'email': booking.email,
-                            'phone': booking.phone,
-                            'date': str(booking.date) if booking.date else None,
-                            'time': str(booking.time) if booking.time else None,
-                            'duration': booking.duration,
-                            'adults': booking.adults,
-                            'kids': booking.kids,
-                            'spectators': booking.spectators,
-                            'amount': float(booking.amount) if booking.amount else 0,
-                            'booking_status': booking.booking_status,
-                            'payment_status': booking.payment_status,
-                            'waiver_status': booking.waiver_status,
-                            'created_at': booking.created_at.isoformat() if booking.created_at else None,
-                            'customer': {
-                                'id': booking.customer.id if booking.customer else None,
-                                'name': booking.customer.name if booking.customer else booking.name,
-                                'email': booking.customer.email if booking.customer else booking.email,
-                                'phone': booking.customer.phone if booking.customer else booking.phone,
-                            } if booking.customer or booking.name else None
-                        })
-                    except Exception as e:
-                        print(f"Error serializing session booking {booking.id}: {e}")
-            
-            # Fetch party bookings
-            if booking_type != 'session':
-                party_bookings = PartyBooking.objects.select_related('customer').all()
-                if status:
-                    party_bookings = party_bookings.filter(status=status)
-                if search:
-                    party_bookings = party_bookings.filter(
-                        Q(name__icontains=search) | Q(email__icontains=search)
-                    )
-                
-                for booking in party_bookings:
-                    try:
-                        all_bookings_data.append({
-                            'id': booking.id,
-                            'uuid': str(booking.uuid),
-                            'type': 'PARTY',
-                            'name': booking.name,
-                            'email': booking.email,
-                            'phone': booking.phone,
-                            'date': str(booking.date) if booking.date else None,
-                            'time': str(booking.time) if booking.time else None,
-                            'duration': 120,  # Default party duration
-                            'adults': booking.adults,
-                            'kids': booking.kids,
-                            'spectators': 0,  # Not tracked for party bookings
-                            'amount': float(booking.amount) if booking.amount else 0,
-                            'booking_status': booking.status,
-                            'payment_status': 'PENDING',  # Not tracked separately for party bookings
-                            'waiver_status': 'SIGNED' if booking.waiver_signed else 'PENDING',
-                            'created_at': booking.created_at.isoformat() if booking.created_at else None,
-                            'birthday_child_name': booking.birthday_child_name,
-                            'birthday_child_age': booking.birthday_child_age,
-                            'package_name': booking.package_name,
-                            'customer': {
-                                'id': booking.customer.id if booking.customer else None,
-                                'name': booking.customer.name if booking.customer else booking.name,
-                                'email': booking.customer.email if booking.customer else booking.email,
-                                'phone': booking.customer.phone if booking.customer else booking.phone,
-                            } if booking.customer or booking.name else None
-                        })
-                    except Exception as e:
-                        print(f"Error serializing party booking {booking.id}: {e}")
-            
-            # Sort by created_at (most recent first)
-            all_bookings_data.sort(key=lambda x: x['created_at'] or '', reverse=True)
-            
-            return Response({
-                'count': len(all_bookings_data),
-                'results': all_bookings_data
-            })
-        except Exception as e:
-            print(f"Error in all_bookings: {e}")
-            return Response({'error': str(e)}, status=500)
+            limit = int(limit)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=400)
+
+        results, next_cursor = booking_feed(
+            booking_type=booking_type,
+            status=status,
+            search=search,
+            cursor=cursor,
+            limit=limit,
+        )
+        
+        return Response({
+            'count': len(results),
+            'next': next_cursor,
+            'results': results
+        })
@@ -0,0 +1,25 @@
+import pytest
+from django.core.cache import cache
+from apps.cms.bundle import clear_local_version
+from apps.cms.config_cache import clear_local_configs
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Database rollbacks between tests do not reach the caches"""
+    cache.clear()
+    clear_local_configs()
+    clear_local_version()
+    yield
+    cache.clear()
+    clear_local_configs()
+    clear_local_version()
+
+
+@pytest.fixture
+def staff_client(client, django_user_model):
+    user = django_user_model.objects.create_user(
+        username='staff', email='staff@example.com', password='pass', name='Staff'
+    )
+    client.force_login(user)
+    return client
@@ -76,8 +76,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.querycount.QueryCountMiddleware',  # Per-request SQL query stats
+    'apps.bookings.customers.CustomerMemoMiddleware',  # Resolve each customer once per request
 ]
 
+# Expose X-Query-Count / X-Query-Time-Ms response headers (on by default in DEBUG)
+QUERY_COUNT_HEADER = get_env_bool('QUERY_COUNT_HEADER', DEBUG)
+# Requests running more queries than this are logged at WARNING
+QUERY_COUNT_WARN_THRESHOLD = int(os.getenv('QUERY_COUNT_WARN_THRESHOLD', '50'))
+
 ROOT_URLCONF = 'ninja_backend.urls'
 
 TEMPLATES = [
@@ -128,6 +135,22 @@ else:
     }
 
 
+# Shared cache for all web and worker processes (e.g. redis://host:6379/0, needs the
+# redis package); without it each process keeps its own in-memory cache
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+
+# Search backend: 'auto' uses pg_trgm on PostgreSQL and a token table elsewhere
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -182,6 +205,10 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',  # Fallback to header-based
         'rest_framework.authentication.SessionAuthentication',
     ),
+    # Only for views that opt in with throttle_classes
+    'DEFAULT_THROTTLE_RATES': {
+        'slot_hold': '10/hour',
+    },
 }
 
 SIMPLE_JWT = {
@@ -211,3 +238,27 @@ CORS_ALLOW_CREDENTIALS = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Email (sent by the `run_jobs` worker, never inside a request)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = get_env_bool('EMAIL_USE_TLS', True)
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Ninja Inflatable Park <no-reply@ninjainflatablepark.com>')
+
+# Base URL of the public site, used for links in emails
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+
+# Instagram oEmbed endpoint used to fetch reel thumbnails (override to point at a stub)
+INSTAGRAM_OEMBED_ENDPOINT = os.getenv('INSTAGRAM_OEMBED_ENDPOINT', 'https://www.instagram.com/api/v1/oembed/')
+
+# CMS image variants: formats to render (webp, avif) and whether to render at upload time
+CMS_IMAGE_FORMATS = get_env_list('CMS_IMAGE_FORMATS', 'webp')
+CMS_IMAGE_EAGER_VARIANTS = get_env_bool('CMS_IMAGE_EAGER_VARIANTS', True)
+
+# Rendered waiver PDFs (personal data: keep outside MEDIA_ROOT) and pack render processes
+WAIVER_PDF_CACHE_DIR = os.getenv('WAIVER_PDF_CACHE_DIR', os.path.join(BASE_DIR, 'waiver_pdf_cache'))
+WAIVER_PDF_WORKERS = int(os.getenv('WAIVER_PDF_WORKERS', '4'))
+WAIVER_PDF_CACHE_DAYS = int(os.getenv('WAIVER_PDF_CACHE_DAYS', '30'))
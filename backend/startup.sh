@@ -7,5 +7,17 @@ python manage.py migrate
 # Collect static files
 python manage.py collectstatic --noinput
 
-# Start Gunicorn server
-gunicorn ninja_backend.wsgi:application --bind=0.0.0.0:8000 --workers=4 --timeout=120
+# Start the background job worker (emails, reminders, notifications queued
+# by apps/core/jobs.py); without it those jobs stay PENDING. The loop
+# restarts it if it exits.
+(
+    while true; do
+        python manage.py run_jobs
+        echo "run_jobs exited with status $?, restarting in 5s" >&2
+        sleep 5
+    done
+) &
+
+# Start Gunicorn with Uvicorn workers: the ASGI app serves the streaming
+# (Server-Sent Events) endpoints without tying up a worker per client
+gunicorn ninja_backend.asgi:application -k uvicorn.workers.UvicornWorker --bind=0.0.0.0:8000 --workers=4 --timeout=120
@@ -2,7 +2,7 @@
 
 import { Bell, Search, User } from "lucide-react";
 import { useState, useEffect } from "react";
-import { getUnreadNotifications, getUnreadCount, markAsRead, markAllAsRead, type Notification } from "@/app/actions/notifications";
+import { getUnreadNotifications, getUnreadCount, markAsRead, markAllAsRead, waitForNotifications, type Notification } from "@/app/actions/notifications";
 import Link from "next/link";
 
 interface AdminHeaderProps {
@@ -18,32 +18,45 @@ export function AdminHeader({ title, user }: AdminHeaderProps) {
     const [showNotifications, setShowNotifications] = useState(false);
     const [notifications, setNotifications] = useState<Notification[]>([]);
     const [unreadCount, setUnreadCount] = useState(0);
-    const [isLoading, setIsLoading] = useState(false);
+    const [isLoading, setIsLoading] = useState(true);
 
     // Fetch notifications
     const fetchNotifications = async () => {
-        setIsLoading(true);
         const [unread, count] = await Promise.all([
             getUnreadNotifications(),
             getUnreadCount()
         ]);
         setNotifications(unread);
         setUnreadCount(count);
-        setIsLoading(false);
     };
 
-    // Initial fetch
+    // Long-poll for changes; the list is only refetched when the version moves
     useEffect(() => {
-        fetchNotifications();
-    }, []);
-
-    // Poll for new notifications every 30 seconds
-    useEffect(() => {
-        const interval = setInterval(() => {
-            fetchNotifications();
-        }, 30000); // 30 seconds
-
-        return () => clearInterval(interval);
+        let active = true;
+        const follow = async () => {
+            let version: string | undefined;
+            while (active) {
+                const state = await waitForNotifications(version);
+                if (!active) return;
+                if (!state) {
+                    // Backend unreachable or session expired: retry later
+                    await new Promise((resolve) => setTimeout(resolve, 30000));
+                    continue;
+                }
+                setUnreadCount(state.count);
+                if (state.version !== version) {
+                    version = state.version;
+                    const unread = await getUnreadNotifications();
+                    if (!active) return;
+                    setNotifications(unread);
+                    setIsLoading(false);
+                }
+            }
+        };
+        follow();
+        return () => {
+            active = false;
+        };
     }, []);
 
     const handleMarkAsRead = async (id: number) => {
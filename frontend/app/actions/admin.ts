@@ -162,16 +162,26 @@ export async function getAllBookings(filter?: { type?: string; status?: string;
         if (filter?.type) params.append("type", filter.type);
         if (filter?.status) params.append("status", filter.status);
         if (filter?.search) params.append("search", filter.search);
-
-        const res = await fetchAPI(`/core/dashboard/all_bookings/?${params.toString()}`);
-
-        if (!res || !res.ok) {
-            console.error('Failed to fetch bookings:', res?.status, res?.statusText);
-            return [];
-        }
-
-        const data = await res.json();
-        return data.results || [];
+        params.append("limit", "200");
+
+        // The endpoint is cursor-paginated (newest first, `count` is the size
+        // of that page only): follow `next` until the last page
+        const bookings: any[] = [];
+        let cursor: string | null = null;
+        do {
+            if (cursor) params.set("cursor", cursor);
+            const res = await fetchAPI(`/core/dashboard/all_bookings/?${params.toString()}`);
+
+            if (!res || !res.ok) {
+                console.error('Failed to fetch bookings:', res?.status, res?.statusText);
+                return bookings;
+            }
+
+            const data = await res.json();
+            bookings.push(...(data.results || []));
+            cursor = data.next || null;
+        } while (cursor);
+        return bookings;
     } catch (error) {
         console.error('Error fetching all bookings:', error);
         return [];
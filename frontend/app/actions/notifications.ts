@@ -51,6 +51,24 @@ export async function getUnreadCount(): Promise<number> {
     }
 }
 
+export interface NotificationState {
+    version: string;
+    count: number;
+}
+
+// Long-polls until the unread state differs from `since` (at once without it)
+export async function waitForNotifications(since?: string): Promise<NotificationState | null> {
+    try {
+        const query = since ? `?since=${encodeURIComponent(since)}` : '';
+        const res = await fetchAPI(`/core/notifications/wait/${query}`);
+        if (!res || !res.ok) return null;
+        return await res.json();
+    } catch (error) {
+        console.error('Error waiting for notifications:', error);
+        return null;
+    }
+}
+
 export async function markAsRead(id: number) {
     try {
         const res = await fetchAPI(`/core/notifications/${id}/mark_read/`, {